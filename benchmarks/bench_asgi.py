@@ -0,0 +1,165 @@
+"""
+Load test: the same endpoints served over WSGI (gunicorn) and ASGI (uvicorn).
+
+Starts each server in turn against the configured database, drives it with
+concurrent keep-alive clients and reports requests/s with p50/p99 latency.
+Needs `pip install gunicorn uvicorn` and a migrated database; the detail
+page is only tested when the database has an upcoming IPO.
+
+    python benchmarks/bench_asgi.py --clients 200 --requests 25 --workers 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ipo_predictor.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from ipo_app.models import IPO  # noqa: E402
+
+PREDICT_BODY = json.dumps({
+    'qib_subscription': 85.2, 'hni_subscription': 120.5, 'retail_subscription': 14.1,
+    'issue_size': 1250, 'issue_price': 420, 'gmp': 55,
+}).encode()
+
+
+def server_command(kind, port, workers, threads):
+    if kind == 'wsgi':
+        return [
+            sys.executable, '-m', 'gunicorn', 'ipo_predictor.wsgi:application', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), '--worker-class', 'gthread', '--threads', str(threads), '--log-level', 'warning',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'ipo_predictor.asgi:application', '--host', '127.0.0.1', '--port', str(port),
+        '--workers', str(workers), '--log-level', 'warning', '--no-access-log',
+    ]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server did not listen on port {port} within {timeout}s')
+
+
+def build_request(method, path, body=b''):
+    head = f'{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: keep-alive\r\n'
+    if body:
+        head += f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+    return head.encode() + b'\r\n' + body
+
+
+async def read_response(reader):
+    """Status code and whether the server keeps the connection open"""
+    status = int((await reader.readline()).split()[1])
+    length, keep_alive = None, True
+    while True:
+        line = (await reader.readline()).strip().lower()
+        if not line:
+            break
+        name, _, value = line.partition(b':')
+        if name == b'content-length':
+            length = int(value)
+        elif name == b'connection' and value.strip() == b'close':
+            keep_alive = False
+    if length is None:
+        await reader.read()
+        keep_alive = False
+    else:
+        await reader.readexactly(length)
+    return status, keep_alive
+
+
+async def client(port, request, count, latencies, errors):
+    reader = writer = None
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError):
+            errors.append(1)
+            writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status >= 400:
+            errors.append(status)
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def drive(port, request, clients, count):
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, request, count, latencies, errors) for _ in range(clients)))
+    return time.perf_counter() - start, np.array(latencies), len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=25, help='requests per client')
+    parser.add_argument('--workers', type=int, default=2, help='server processes')
+    parser.add_argument('--threads', type=int, default=8, help='threads per gunicorn worker')
+    parser.add_argument('--cache', default='dummy://', help='IPO_CACHE_URL for the servers (dummy:// measures the views)')
+    parser.add_argument('--servers', default='wsgi,asgi')
+    args = parser.parse_args()
+
+    endpoints = {
+        'predict': build_request('POST', '/api/predict/', PREDICT_BODY),
+        'upcoming': build_request('GET', '/ipo/upcomming'),
+    }
+    company_id = IPO.objects.filter(status='upcoming').exclude(company_id='').values_list('company_id', flat=True).first()
+    if company_id:
+        endpoints['detail'] = build_request('GET', f'/ipo/{company_id}/')
+
+    env = dict(os.environ, IPO_CACHE_URL=args.cache, PYTHONPATH=ROOT)
+    print(f"clients={args.clients} requests/client={args.requests} workers={args.workers} cache={args.cache}")
+    print(f"{'server':<6} {'endpoint':<10} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for kind in args.servers.split(','):
+        port = free_port()
+        process = subprocess.Popen(server_command(kind, port, args.workers, args.threads), cwd=ROOT, env=env)
+        try:
+            wait_for_port(port, process)
+            for name, request in endpoints.items():
+                asyncio.run(drive(port, request, min(args.clients, 10), 2))  # warm up every worker
+                elapsed, latencies, errors = asyncio.run(drive(port, request, args.clients, args.requests))
+                p50, p99 = np.percentile(latencies, [50, 99]) * 1000 if len(latencies) else (float('nan'),) * 2
+                print(f"{kind:<6} {name:<10} {len(latencies) / elapsed:9,.0f} {p50:9.1f} {p99:9.1f} {errors:7}")
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Concurrent single-row predictions: one model call each vs micro-batched
+by ipo_app.batching, with a gradient-boosting model like the one served.
+
+    python benchmarks/bench_batching.py --requests 20000 --concurrency 1000
+"""
+import argparse
+import asyncio
+import os
+import pickle
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ipo_predictor.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.conf import settings  # noqa: E402
+from sklearn.ensemble import GradientBoostingRegressor  # noqa: E402
+
+from ipo_app import prediction  # noqa: E402
+from ipo_app.batching import PredictionBatcher  # noqa: E402
+from ipo_app.features import FEATURE_FIELDS  # noqa: E402
+from ipo_app.model_registry import registry  # noqa: E402
+
+CONFIGS = [(16, 2), (64, 2), (256, 5)]  # (max batch, max wait ms)
+
+
+def train_model(path, rng):
+    X = rng.lognormal(2, 1, (2000, len(FEATURE_FIELDS)))
+    y = X[:, 0] * 0.3 + X[:, 5] * 0.4 + rng.normal(0, 5, len(X))
+    with open(path, 'wb') as f:
+        pickle.dump(GradientBoostingRegressor(random_state=0).fit(X, y), f)
+
+
+async def run(predict, rows, concurrency):
+    """rows/s and per-request latencies with `concurrency` callers each predicting its share in turn"""
+    latencies = []
+
+    async def caller(share):
+        for row in share:
+            start = time.perf_counter()
+            await predict(row)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(caller(rows[i::concurrency]) for i in range(concurrency)))
+    return len(rows) / (time.perf_counter() - start), np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    directory = tempfile.mkdtemp()
+    settings.IPO_MODEL_PATH = os.path.join(directory, 'model.pkl')
+    train_model(settings.IPO_MODEL_PATH, rng)
+    rows = rng.lognormal(2, 1, (args.requests, len(FEATURE_FIELDS)))
+    registry.reload()
+
+    calls = []
+    score_matrix = prediction.score_matrix
+
+    def counted(features):
+        calls.append(len(features))
+        return score_matrix(features)
+
+    prediction.score_matrix = counted
+
+    async def unbatched(row):
+        return await prediction.ascore_matrix(row[np.newaxis])
+
+    print(f"requests={args.requests} concurrency={args.concurrency} model={registry.version} "
+          f"executor threads={settings.IPO_PREDICT_WORKERS}")
+    print(f"{'mode':<22} {'rows/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'model calls':>12} {'mean batch':>11}")
+    modes = [('one call per request', unbatched)] + [
+        (f'batch {size:>3} / {wait} ms', PredictionBatcher(max_batch=size, max_wait=wait / 1000, max_queue=args.requests).predict)
+        for size, wait in CONFIGS
+    ]
+    try:
+        for name, predict in modes:
+            calls.clear()
+            throughput, latencies = asyncio.run(run(predict, rows, args.concurrency))
+            p50, p99 = np.percentile(latencies, [50, 99])
+            print(f"{name:<22} {throughput:9,.0f} {p50:8.1f} {p99:8.1f} {len(calls):12,} {np.mean(calls):11.1f}")
+    finally:
+        prediction.score_matrix = score_matrix
+        os.remove(settings.IPO_MODEL_PATH)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
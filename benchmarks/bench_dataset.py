@@ -0,0 +1,116 @@
+"""
+Loading the training features of HistoricalIPO: ORM iteration vs a columnar snapshot.
+
+Runs against a throwaway test database filled with synthetic rows, so the
+real db.sqlite3 is never touched.
+
+    python benchmarks/bench_dataset.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ipo_predictor.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.db import connection  # noqa: E402
+
+import pyarrow as pa  # noqa: E402
+from ipo_app.columnar import arrow_schema, export_table, import_table, read_snapshot  # noqa: E402
+from ipo_app.models import HistoricalIPO  # noqa: E402
+
+FEATURES = [
+    'qib_subscription', 'nii_subscription', 'retail_subscription', 'issue_size', 'issue_price', 'listing_gains_percent',
+]
+
+
+def synthetic_snapshot(path, n, rng):
+    """Write n synthetic HistoricalIPO rows as an Arrow snapshot"""
+    price = np.round(rng.lognormal(5.0, 0.9, n), 2)
+    qib, nii, retail = (np.round(rng.lognormal(mu, sigma, n), 2) for mu, sigma in ((2.0, 1.5), (2.0, 1.7), (1.5, 1.2)))
+    columns = {
+        'company_name': [f'Synthetic {i}' for i in range(n)],
+        'issue_type': np.where(np.arange(n) % 3 == 0, 'SME', 'Mainline').tolist(),
+        'sector': ['Finance'] * n,
+        'listing_date': [date(2005, 1, 1) + timedelta(days=int(i % 7000)) for i in range(n)],
+        'issue_size': np.round(rng.lognormal(5.0, 1.5, n), 2),
+        'issue_price': price,
+        'listing_price': np.round(price * 1.1, 2),
+        'qib_subscription': qib,
+        'nii_subscription': nii,
+        'retail_subscription': retail,
+        'total_subscription': np.round((qib + nii + retail) / 3, 2),
+        'listing_gains_rs': np.round(price * 0.1, 2),
+        'listing_gains_percent': np.round(rng.normal(15, 30, n), 2),
+    }
+    schema = arrow_schema(HistoricalIPO, 'historical')
+    arrays = []
+    for field in schema:
+        values = columns.get(field.name)
+        if values is None:
+            values = [None if field.nullable and not field.type.equals(pa.string()) else ''] * n
+        arrays.append(pa.array(values, type=field.type))
+    with pa.ipc.new_file(path, schema) as writer:
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def orm_matrix():
+    # What training did before: one model instance per row, Decimals converted one by one
+    rows = [[float(getattr(ipo, name)) for name in FEATURES] for ipo in HistoricalIPO.objects.order_by('pk').iterator(chunk_size=2000)]
+    return np.array(rows, dtype=np.float64)
+
+
+def columnar_matrix(path):
+    table = read_snapshot(path, columns=FEATURES)
+    return np.column_stack([table.column(name).to_numpy() for name in FEATURES])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    directory = tempfile.mkdtemp()
+    try:
+        source = os.path.join(directory, 'synthetic.arrow')
+        synthetic_snapshot(source, args.rows, np.random.default_rng(0))
+        import_seconds, (_, count) = timed(lambda: import_table(source, replace=True))
+        print(f"rows={args.rows}")
+        print(f"import_dataset (executemany):   {import_seconds * 1000:9.1f} ms ({count / import_seconds:,.0f} rows/s)")
+
+        orm_seconds, orm = timed(orm_matrix)
+        print(f"ORM iteration -> matrix:        {orm_seconds * 1000:9.1f} ms")
+
+        for name in ('historical.parquet', 'historical.arrow'):
+            path = os.path.join(directory, name)
+            export_seconds, _ = timed(lambda: export_table('historical', path, chunk_size=args.chunk_size))
+            load_seconds, matrix = timed(lambda: columnar_matrix(path))
+            assert np.allclose(matrix, orm)
+            size = os.path.getsize(path) / 1e6
+            print(f"{name:<18} export:        {export_seconds * 1000:9.1f} ms ({size:.1f} MB)")
+            print(f"{name:<18} load -> matrix:{load_seconds * 1000:9.1f} ms ({orm_seconds / load_seconds:,.0f}x faster than ORM)")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""
+API read latency on SQLite while an ingest writes, per IPO_SQLITE_PROFILE.
+
+For each profile a fresh database is seeded with synthetic HistoricalIPO
+rows, then reader threads page through /api/historical/ (caching off),
+first on a quiet database and then while `import_dataset` upserts the same
+rows again and again in another process.
+
+    python benchmarks/bench_db_concurrency.py --rows 50000 --readers 8 --seconds 10
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(args):
+    """Runs inside a process whose settings point at the profile's database"""
+    import numpy as np
+    from bench_dataset import synthetic_snapshot  # also sets up Django
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+
+    from ipo_app.columnar import import_table
+    from ipo_app.db import sqlite_pragmas
+
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    snapshot = os.path.join(os.path.dirname(connection.settings_dict['NAME']), 'rows.arrow')
+    synthetic_snapshot(snapshot, args.rows, np.random.default_rng(0))
+    import_table(snapshot, replace=True)
+    pragmas = sqlite_pragmas(connection)
+    connection.close()
+
+    pages = max(args.rows // 10, 1)
+
+    def read(stop, latencies, errors):
+        client = Client(HTTP_HOST='localhost')
+        rng = np.random.default_rng(threading.get_ident())
+        while not stop.is_set():
+            start = time.perf_counter()
+            response = client.get(f'/api/historical/?page={rng.integers(1, pages)}')
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    def phase(seconds=None, writer=None):
+        stop, latencies, errors = threading.Event(), [], []
+        threads = [threading.Thread(target=read, args=(stop, latencies, errors)) for _ in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        writes = []
+        if writer is None:
+            time.sleep(seconds)
+        else:
+            deadline = time.monotonic() + args.seconds
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                subprocess.run(writer, cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+                writes.append(time.perf_counter() - start)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        ms = np.array(latencies) * 1000
+        return len(ms), np.percentile(ms, 50), np.percentile(ms, 99), ms.max(), len(errors), writes
+
+    writer = [sys.executable, 'manage.py', 'import_dataset', snapshot, '--chunk-size', '1000']
+    print(f"profile={os.environ['IPO_SQLITE_PROFILE']} {pragmas}")
+    Client(HTTP_HOST='localhost').get('/api/historical/')  # warm up imports and URL resolving
+    for name, result in (('quiet', phase(seconds=args.seconds)), ('during ingest', phase(writer=writer))):
+        reads, p50, p99, worst, errors, writes = result
+        ingest = f' ingest runs={len(writes)} ({np.mean(writes):.1f} s each)' if writes else ''
+        print(f"  {name:<14} reads={reads:6} p50={p50:7.1f} ms p99={p99:8.1f} ms max={worst:8.1f} ms errors={errors}{ingest}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--profiles', default='default,tuned')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args)
+
+    print(f"rows={args.rows} readers={args.readers} seconds={args.seconds}")
+    for profile in args.profiles.split(','):
+        directory = tempfile.mkdtemp()
+        env = dict(
+            os.environ,
+            IPO_DATABASE_URL=f"sqlite:///{os.path.join(directory, 'bench.sqlite3')}",
+            IPO_SQLITE_PROFILE=profile,
+            IPO_CACHE_URL='dummy://',
+        )
+        try:
+            subprocess.run([sys.executable, __file__, '--child', *sys.argv[1:]], env=env, check=True)
+        finally:
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+/api/historical/export/ against building the whole response in memory:
+wall time and peak Python memory (tracemalloc) for the full table.
+
+Runs against a throwaway test database filled with synthetic rows.
+
+    python benchmarks/bench_export.py --rows 100000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from bench_dataset import synthetic_snapshot  # also sets up Django
+
+from django.db import connection
+from django.test import Client
+
+from ipo_app.columnar import import_table
+from ipo_app.models import HistoricalIPO
+from ipo_app.serializers import HistoricalIPOSerializer
+
+
+def in_memory():
+    # What a client pulling the full table got before: every row serialized into one response body
+    return json.dumps(HistoricalIPOSerializer(HistoricalIPO.objects.all(), many=True).data).encode()
+
+
+def streamed(gzipped):
+    headers = {'HTTP_ACCEPT_ENCODING': 'gzip'} if gzipped else {}
+    response = Client(HTTP_HOST='localhost').get('/api/historical/export/', **headers)
+    return sum(len(chunk) for chunk in response.streaming_content)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = result if isinstance(result, int) else len(result)
+    return seconds, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, 'synthetic.arrow')
+    try:
+        synthetic_snapshot(source, args.rows, np.random.default_rng(0))
+        import_table(source, replace=True)
+        streamed(False)  # warm up imports and URL resolving
+
+        print(f"rows={args.rows}")
+        for label, fn in (
+            ('serialize all', in_memory),
+            ('export ndjson', lambda: streamed(False)),
+            ('export gzip', lambda: streamed(True)),
+        ):
+            seconds, peak, size = measure(fn)
+            print(f"{label:<14} {seconds * 1000:9.1f} ms  peak {peak / 2**20:8.1f} MB  body {size / 2**20:7.1f} MB")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        os.remove(source)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+HistoricalIPO feature columns into a float64 matrix: Decimals converted in
+Python vs cast to float by the database (ipo_app.arrays.float_matrix).
+
+Runs against a throwaway test database filled with synthetic rows.
+
+    python benchmarks/bench_extraction.py --rows 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from bench_dataset import FEATURES, synthetic_snapshot  # also sets up Django
+
+from django.db import connection
+
+from ipo_app.arrays import float_matrix
+from ipo_app.columnar import import_table
+from ipo_app.models import HistoricalIPO
+
+
+def decimal_matrix():
+    # What the scoring and stats paths did before: Decimals from values_list, float() per value
+    rows = list(HistoricalIPO.objects.values_list(*FEATURES))
+    return np.array([[float(v or 0) for v in row] for row in rows], dtype=np.float64).reshape(len(rows), len(FEATURES))
+
+
+def best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    directory = tempfile.mkdtemp()
+    source = os.path.join(directory, 'synthetic.arrow')
+    try:
+        synthetic_snapshot(source, args.rows, np.random.default_rng(0))
+        import_table(source, replace=True)
+
+        decimal_seconds, expected = best_of(decimal_matrix, args.repeat)
+        float_seconds, matrix = best_of(lambda: float_matrix(HistoricalIPO.objects.all(), FEATURES), args.repeat)
+        assert np.allclose(matrix, expected)
+
+        print(f"rows={args.rows} columns={len(FEATURES)} (best of {args.repeat})")
+        print(f"values_list + float(Decimal): {decimal_seconds * 1000:9.1f} ms")
+        print(f"float_matrix (DB cast):       {float_seconds * 1000:9.1f} ms ({decimal_seconds / float_seconds:.1f}x faster)")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        os.remove(source)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    main()
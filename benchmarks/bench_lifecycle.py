@@ -0,0 +1,67 @@
+"""
+advance_statuses over a large IPO table: most rows long listed, a few hundred in flight.
+
+Runs against a throwaway test database filled with synthetic rows.
+
+    python benchmarks/bench_lifecycle.py --rows 100000
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ipo_predictor.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+from ipo_app.lifecycle import advance_statuses  # noqa: E402
+from ipo_app.models import IPO  # noqa: E402
+
+TODAY = date(2025, 6, 1)
+
+
+def seed(rows, in_flight):
+    """`rows` IPOs, ten opening a day up to TODAY + 30 days; the last `in_flight` still marked upcoming"""
+    ipos = []
+    for i in range(rows):
+        opened = TODAY + timedelta(days=30 - (rows - 1 - i) // 10)
+        ipos.append(IPO(
+            company_name=f'Synthetic {i}',
+            open_date=opened,
+            close_date=opened + timedelta(days=2),
+            listing_date=opened + timedelta(days=5),
+            status='upcoming' if i >= rows - in_flight else 'listed',
+        ))
+    IPO.objects.bulk_create(ipos, batch_size=2000)
+
+
+def report(label, passes):
+    summary = '  '.join(f"{name}={result['rows']} ({result['ms']:.2f} ms)" for name, result in passes.items())
+    total = sum(result['ms'] for result in passes.values())
+    print(f"{label:<12} {total:8.2f} ms  {summary}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--in-flight', type=int, default=500)
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(args.rows, args.in_flight)
+        print(f"rows={args.rows} in flight={args.in_flight}")
+        report('first pass', advance_statuses(TODAY))
+        report('next pass', advance_statuses(TODAY))
+        report('next day', advance_statuses(TODAY + timedelta(days=1)))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Compare n single /api/predict/ calls against one /api/predict/batch/ call.
+
+    python benchmarks/bench_predict.py --rows 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ipo_predictor.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+from asgiref.sync import async_to_sync  # noqa: E402
+from rest_framework.test import APIRequestFactory  # noqa: E402
+
+from ipo_app import views  # noqa: E402
+from ipo_app.model_registry import registry  # noqa: E402
+
+
+def make_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'qib_subscription': float(rng.uniform(0, 200)),
+            'hni_subscription': float(rng.uniform(0, 300)),
+            'retail_subscription': float(rng.uniform(0, 100)),
+            'issue_size': float(rng.uniform(10, 5000)),
+            'issue_price': float(rng.uniform(50, 1500)),
+            'gmp': float(rng.uniform(-20, 200)),
+        }
+        for _ in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=500)
+    args = parser.parse_args()
+
+    factory = APIRequestFactory()
+    rows = make_rows(args.rows)
+
+    predict = async_to_sync(views.predict_api)
+    start = time.perf_counter()
+    for row in rows:
+        predict(factory.post('/api/predict/', row, format='json'))
+    single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    views.predict_batch_api(factory.post('/api/predict/batch/', {'rows': rows}, format='json'))
+    batch = time.perf_counter() - start
+
+    print(f"rows={args.rows} model={registry.version}")
+    print(f"single calls: {single:.4f}s ({args.rows / single:,.0f} rows/s)")
+    print(f"batch call:   {batch:.4f}s ({args.rows / batch:,.0f} rows/s)")
+    print(f"speedup:      {single / batch:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
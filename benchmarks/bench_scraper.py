@@ -0,0 +1,88 @@
+"""
+Company page parsing throughput on the saved HTML fixtures, comparing the
+original BeautifulSoup approach (html.parser + repeated find_all) with
+ipo_app.scraper.parse_company_page (lxml + XPath).
+
+    python benchmarks/bench_scraper.py --repeat 20
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ipo_predictor.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from ipo_app.scraper import clean_number, parse_company_page  # noqa: E402
+from ipo_app.sectors import classify_sector  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'ipo_app', 'testdata', 'company_pages')
+
+
+def legacy_extract(html_content):
+    """The pre-lxml company page extraction (html.parser and find_all), without the network call"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    result = {'financial_data': {}, 'kpis': {}, 'sector': 'Unknown'}
+    financial_table = soup.find('table', {'id': 'financialTable'})
+    if financial_table:
+        rows = financial_table.find_all('tr')
+        periods = [td.get_text(strip=True) for td in rows[0].find_all('td')[1:]]
+        for period in periods:
+            result['financial_data'][period] = {}
+        for row in rows[1:]:
+            cells = row.find_all('td')
+            if len(cells) > 1:
+                label = cells[0].get_text(strip=True)
+                for i, period in enumerate(periods):
+                    if i + 1 < len(cells):
+                        result['financial_data'][period][label] = clean_number(cells[i + 1].get_text(strip=True))
+    for table in soup.find_all('table', class_='table table-bordered table-striped table-hover w-auto'):
+        for row in table.find_all('tr'):
+            cells = row.find_all(['td', 'th'])
+            if len(cells) >= 2:
+                value = clean_number(cells[1].get_text(strip=True))
+                result['kpis'][cells[0].get_text(strip=True)] = cells[1].get_text(strip=True) if value is None else value
+    about_section = soup.find('div', id='about-company-section')
+    if about_section:
+        result['sector'] = classify_sector(' '.join(p.get_text(strip=True) for p in about_section.find_all('p')))
+    return result
+
+
+def run(parse, pages, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parse(page)
+    return len(pages) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES, '*.html'))):
+        with open(path, 'rb') as f:
+            pages.append(f.read())
+
+    for page in pages:
+        assert legacy_extract(page) == parse_company_page(page)
+
+    legacy = run(legacy_extract, pages, args.repeat)
+    fast = run(parse_company_page, pages, args.repeat)
+    print(f"pages={len(pages)} x {args.repeat}")
+    print(f"html.parser + find_all: {legacy:,.1f} pages/s")
+    print(f"lxml + XPath:           {fast:,.1f} pages/s")
+    print(f"speedup:                {fast / legacy:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
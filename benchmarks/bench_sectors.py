@@ -0,0 +1,84 @@
+"""
+Sector classification over a few thousand synthetic company descriptions:
+the original nested substring loops (one substring test per keyword) against the
+compiled single-pass classifier in ipo_app.sectors.
+
+    python benchmarks/bench_sectors.py --count 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ipo_app.sectors import SECTOR_KEYWORDS, SectorClassifier  # noqa: E402
+
+FILLER = (
+    'the company was incorporated in and is headquartered in mumbai with a presence across several states '
+    'its promoters have decades of experience and the proceeds will fund working capital capital expenditure '
+    'repayment of borrowings and general corporate purposes customers include leading domestic and global brands'
+).split()
+
+
+def legacy_classify_sector(text):
+    if not text:
+        return 'Unknown'
+    normalized_text = text.lower()
+    sector_scores = {}
+    for sector, keywords in SECTOR_KEYWORDS.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in normalized_text:
+                score += 1
+        if score > 0:
+            sector_scores[sector] = score
+    if sector_scores:
+        return max(sector_scores, key=sector_scores.get)
+    return 'Unknown'
+
+
+def make_descriptions(count, seed=0):
+    rng = random.Random(seed)
+    keywords = [k for ks in SECTOR_KEYWORDS.values() for k in ks]
+    texts = []
+    for _ in range(count):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(60, 200))]
+        for _ in range(rng.randint(1, 4)):
+            words.insert(rng.randrange(len(words)), rng.choice(keywords))
+        texts.append(' '.join(words).capitalize() + '.')
+    return texts
+
+
+def timed(fn, texts):
+    start = time.perf_counter()
+    results = [fn(text) for text in texts]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--count', type=int, default=5000)
+    args = parser.parse_args()
+    texts = make_descriptions(args.count)
+
+    legacy, legacy_time = timed(legacy_classify_sector, texts)
+    cold = SectorClassifier()
+    fast, fast_time = timed(cold.classify, texts)
+    _, cached_time = timed(cold.classify, texts)
+    start = time.perf_counter()
+    SectorClassifier().classify_many(texts)
+    batch_time = time.perf_counter() - start
+
+    agree = sum(a == b for a, b in zip(legacy, fast)) / len(texts)
+    print(f"descriptions={len(texts)}")
+    print(f"legacy substring loops: {legacy_time * 1000:8.1f} ms")
+    print(f"compiled regex (cold):  {fast_time * 1000:8.1f} ms  ({legacy_time / fast_time:.1f}x)")
+    print(f"compiled regex (batch): {batch_time * 1000:8.1f} ms")
+    print(f"compiled regex (cached):{cached_time * 1000:8.1f} ms")
+    print(f"agreement with legacy:  {agree:.1%} (differences are mostly substring false hits such as 'car' in 'scarce')")
+
+
+if __name__ == '__main__':
+    main()
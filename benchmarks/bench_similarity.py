@@ -0,0 +1,81 @@
+"""
+k-NN lookups over synthetic historical IPOs with ipo_app.similarity.
+
+    python benchmarks/bench_similarity.py --rows 10000 --queries 1000 --k 3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ipo_predictor.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+
+from ipo_app import similarity  # noqa: E402
+
+
+def synthetic(n, rng):
+    numeric = np.column_stack([
+        rng.lognormal(2.0, 1.5, n),    # QIB subscription (x)
+        rng.lognormal(2.0, 1.7, n),    # NII subscription (x)
+        rng.lognormal(1.5, 1.2, n),    # retail subscription (x)
+        rng.lognormal(5.0, 1.5, n),    # issue size (cr)
+        rng.lognormal(5.0, 0.9, n),    # issue price (Rs)
+    ])
+    sectors = list(rng.choice(similarity.SECTORS, n))
+    return numeric, sectors
+
+
+def timed(engine, numeric, sectors, k, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine.query(numeric, sectors, k)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--k', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    numeric, sectors = synthetic(args.rows, rng)
+    gains = rng.normal(15, 30, args.rows)
+    names = [f'IPO {i}' for i in range(args.rows)]
+    q_numeric, q_sectors = synthetic(args.queries, rng)
+
+    engine = similarity.SimilarityEngine()
+    start = time.perf_counter()
+    engine.fit(np.arange(args.rows), numeric, sectors, gains, names)
+    build = time.perf_counter() - start
+
+    single = timed(engine, q_numeric[:1], q_sectors[:1], args.k)
+    batch = timed(engine, q_numeric, q_sectors, args.k)
+    print(f"rows={args.rows} queries={args.queries} k={args.k}")
+    print(f"build matrix:          {build * 1000:8.2f} ms")
+    print(f"brute force, 1 query:  {single * 1000:8.2f} ms")
+    print(f"brute force, batch:    {batch * 1000:8.2f} ms ({args.queries / batch:,.0f} queries/s)")
+
+    if similarity.KDTree is not None:
+        original = similarity.KD_TREE_MIN_ROWS
+        similarity.KD_TREE_MIN_ROWS = 0
+        engine._reindex()
+        similarity.KD_TREE_MIN_ROWS = original
+        single = timed(engine, q_numeric[:1], q_sectors[:1], args.k)
+        batch = timed(engine, q_numeric, q_sectors, args.k)
+        print(f"KD-tree, 1 query:      {single * 1000:8.2f} ms")
+        print(f"KD-tree, batch:        {batch * 1000:8.2f} ms ({args.queries / batch:,.0f} queries/s)")
+
+
+if __name__ == '__main__':
+    main()
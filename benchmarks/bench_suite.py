@@ -0,0 +1,231 @@
+"""
+End-to-end timings of the hot paths, with a regression check against a baseline.
+
+Fills a throwaway test database with generate_synthetic_ipos, then times
+each case through the full middleware stack with response caching off:
+the /api/ipos/ list, the ipo_past and ipo_detail pages, single and batch
+predictions, and ingesting recorded report JSON (decode, normalize and
+upsert of the ipo_app/testdata reports repeated to --ingest-rows rows).
+
+    python benchmarks/bench_suite.py --output benchmarks/baseline.json
+    python benchmarks/bench_suite.py --compare benchmarks/baseline.json --threshold 20
+
+--compare exits with status 1 when any case's median is more than
+--threshold percent slower than in the baseline. Baselines only compare
+fairly on the same machine with the same --ipos/--historical sizes; on a
+busy or single-CPU machine raise --repeat before trusting a small threshold.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ipo_predictor.settings')
+os.environ.setdefault('IPO_CACHE_URL', 'dummy://')  # time the work, not cache hits
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from ipo_app.ingest import decode_report, normalize_rows, parse_historical_row  # noqa: E402
+from ipo_app.models import IPO, HistoricalIPO  # noqa: E402
+from ipo_app.prediction_cache import prediction_cache  # noqa: E402
+from ipo_app.upsert import upsert  # noqa: E402
+
+TESTDATA = os.path.join(ROOT, 'ipo_app', 'testdata')
+INGEST_PREFIX = 'Recorded'
+
+
+def recorded_report(rows):
+    """The recorded report 98 rows, repeated with distinct names up to `rows`, as a response body"""
+    table = []
+    for name in sorted(os.listdir(TESTDATA)):
+        if name.startswith('report_98_'):
+            with open(os.path.join(TESTDATA, name), encoding='utf-8') as f:
+                table.extend(row for row in json.load(f)['reportTableData'] if row.get('Listing Date'))
+    repeated = [
+        dict(table[i % len(table)], Company=f'{INGEST_PREFIX} {i}', **{'~id': str(700000 + i)})
+        for i in range(rows)
+    ]
+    return json.dumps({'reportTableData': repeated}).encode()
+
+
+def prediction_payloads(n, rng):
+    return [
+        {
+            'qib_subscription': round(float(rng.lognormal(2.3, 1.4)), 2),
+            'hni_subscription': round(float(rng.lognormal(2.5, 1.6)), 2),
+            'retail_subscription': round(float(rng.lognormal(2.0, 1.2)), 2),
+            'issue_size': round(float(rng.lognormal(6.3, 1.0)), 2),
+            'issue_price': round(float(rng.lognormal(5.5, 0.7)), 2),
+            'gmp': round(float(rng.normal(20, 25)), 2),
+        }
+        for _ in range(n)
+    ]
+
+
+def build_cases(args):
+    """{name: (run, setup)}; setup runs before every timed call and is not timed"""
+    client = Client(HTTP_HOST='localhost')
+    rng = np.random.default_rng(0)
+    detail_ids = list(IPO.objects.values_list('company_id', flat=True)[:50])
+    singles = iter(prediction_payloads(args.repeat * 4 + 10, rng))
+    batch = prediction_payloads(args.batch_rows, rng)
+    body = recorded_report(args.ingest_rows)
+
+    def get(path):
+        def run():
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+        return run
+
+    def detail():
+        get(f'/ipo/{detail_ids[int(rng.integers(len(detail_ids)))]}/')()
+
+    def predict_single():
+        # A fresh row each call, so the prediction cache does not answer for the model
+        response = client.post('/api/predict/', next(singles), content_type='application/json')
+        assert response.status_code == 200, response.status_code
+
+    def predict_batch():
+        response = client.post('/api/predict/batch/', {'rows': batch}, content_type='application/json')
+        assert response.status_code == 200, response.status_code
+
+    def ingest():
+        # The recordings keep their one malformed row, so every run also pays for a rejected row
+        records, _ = normalize_rows(decode_report(body), parse_historical_row)
+        upsert(HistoricalIPO, records, ['company_name', 'listing_date'])
+
+    def clear_ingested():
+        HistoricalIPO.objects.filter(company_name__startswith=f'{INGEST_PREFIX} ').delete()
+
+    return {
+        'api_ipos_list': (get('/api/ipos/'), None),
+        'ipo_past': (get('/ipo/past'), None),
+        'ipo_detail': (detail, None),
+        'predict_single': (predict_single, prediction_cache.clear),
+        'predict_batch': (predict_batch, None),
+        'ingest_report': (ingest, clear_ingested),
+    }
+
+
+def measure(run, setup, repeat, warmup):
+    times = []
+    for i in range(warmup + repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        run()
+        if i >= warmup:
+            times.append((time.perf_counter() - start) * 1000)
+    times = np.array(times)
+    return {
+        'runs': repeat,
+        'p50_ms': round(float(np.percentile(times, 50)), 3),
+        'p95_ms': round(float(np.percentile(times, 95)), 3),
+        'mean_ms': round(float(times.mean()), 3),
+        'min_ms': round(float(times.min()), 3),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def compare(baseline, current, threshold):
+    """Rows of (case, baseline p50, current p50, change %, flagged); cases new to this run have no baseline"""
+    rows = []
+    for name, result in current['cases'].items():
+        before = baseline['cases'].get(name)
+        if before is None:
+            rows.append((name, None, result['p50_ms'], None, False))
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0.0
+        rows.append((name, before['p50_ms'], result['p50_ms'], change, change > threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--ipos', type=int, default=500)
+    parser.add_argument('--historical', type=int, default=20000)
+    parser.add_argument('--batch-rows', type=int, default=100, help='Rows per /api/predict/batch/ call')
+    parser.add_argument('--ingest-rows', type=int, default=2000, help='Rows in the recorded report ingested per run')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--cases', help='Comma-separated subset of cases to run')
+    parser.add_argument('--output', help='Write the results as JSON here (e.g. to make a baseline)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Compare with an earlier --output file')
+    parser.add_argument('--threshold', type=float, default=20, help='Percent slower than the baseline that fails --compare')
+    args = parser.parse_args()
+
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        call_command('generate_synthetic_ipos', ipos=args.ipos, historical=args.historical, stdout=io.StringIO())
+        cases = build_cases(args)
+        selected = args.cases.split(',') if args.cases else list(cases)
+        results = {
+            'meta': {
+                'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'commit': git_commit(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'machine': f'{platform.system()} {platform.machine()} ({os.cpu_count()} CPUs)',
+                'database': connection.vendor,
+                'sizes': {'ipos': args.ipos, 'historical': args.historical, 'batch_rows': args.batch_rows,
+                          'ingest_rows': args.ingest_rows},
+                'repeat': args.repeat,
+            },
+            'cases': {},
+        }
+        print(f"ipos={args.ipos} historical={args.historical} repeat={args.repeat}")
+        print(f"{'case':<16}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+        for name in selected:
+            run, setup = cases[name]
+            result = results['cases'][name] = measure(run, setup, args.repeat, args.warmup)
+            print(f"{name:<16}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['mean_ms']:>10.2f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline['meta'].get('sizes') != results['meta']['sizes']:
+            print(f"Warning: baseline sizes {baseline['meta'].get('sizes')} differ from this run's")
+        print(f"\nAgainst {args.compare} ({baseline['meta'].get('commit') or 'unknown commit'}), threshold {args.threshold:g}%")
+        flagged = []
+        for name, before, after, change, slower in compare(baseline, results, args.threshold):
+            if before is None:
+                print(f"  {name:<16} {after:9.2f} ms  (new)")
+                continue
+            print(f"  {name:<16} {before:9.2f} -> {after:9.2f} ms  {change:+6.1f}%{'  SLOWER' if slower else ''}")
+            if slower:
+                flagged.append(name)
+        if flagged:
+            print(f"Regressions over {args.threshold:g}%: {', '.join(flagged)}")
+            sys.exit(1)
+        print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,9 @@
 from django.contrib import admin
-from .models import IPO, SimilarIPO, HistoricalIPO
+from .models import IPO, SimilarIPO, HistoricalIPO, HistoricalIPOStats, IngestRun
 
 @admin.register(IPO)
 class IPOAdmin(admin.ModelAdmin):
-    list_display = ['company_name', 'issue_price', 'open_date', 'status', 'predicted_gain']
+    list_display = ['company_name', 'issue_price', 'open_date', 'status', 'predicted_gain', 'prediction_model_version']
     list_filter = ['status', 'sector']
     search_fields = ['company_name']
 
@@ -14,3 +14,13 @@ class SimilarIPOAdmin(admin.ModelAdmin):
 @admin.register(HistoricalIPO)
 class HistoricalIPOAdmin(admin.ModelAdmin):
     list_display = ['company_name', 'listing_date', 'listing_gains_percent', 'issue_type']
+
+@admin.register(HistoricalIPOStats)
+class HistoricalIPOStatsAdmin(admin.ModelAdmin):
+    list_display = ['year', 'sector', 'issue_type', 'ipo_count', 'mean_gain', 'median_gain', 'hit_rate']
+    list_filter = ['year', 'issue_type']
+
+@admin.register(IngestRun)
+class IngestRunAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'command', 'status', 'wall_seconds', 'rows_created', 'rows_updated', 'errors', 'queries']
+    list_filter = ['status', 'command']
@@ -0,0 +1,39 @@
+"""
+Numeric columns from the ORM into NumPy without a Decimal per value.
+
+The database casts each DecimalField to a float (NULL becoming 0.0), so
+rows arrive as tuples of Python floats that np.fromiter copies straight
+into one float64 buffer sized up front.
+"""
+from itertools import chain
+
+import numpy as np
+from django.db.models import FloatField, Value
+from django.db.models.functions import Cast, Coalesce
+
+
+def as_float(column, default=0.0):
+    """`column` cast to a float by the database, NULL read as `default`"""
+    return Coalesce(Cast(column, FloatField()), Value(default), output_field=FloatField())
+
+
+def float_columns(columns, default=0.0):
+    return [as_float(column, default) for column in columns]
+
+
+def _fill(values, rows, width):
+    return np.fromiter(values, dtype=np.float64, count=rows * width).reshape(rows, width)
+
+
+def rows_to_matrix(rows, width, start=0):
+    """
+    (len(rows), width) float64 array of the float values rows[i][start:start + width],
+    e.g. of values_list('id', *float_columns(...)) rows with start=1.
+    """
+    return _fill(chain.from_iterable(row[start:start + width] for row in rows), len(rows), width)
+
+
+def float_matrix(queryset, columns):
+    """(n, len(columns)) float64 array of `columns` for every row of `queryset`, in one query"""
+    rows = list(queryset.values_list(*float_columns(columns)))
+    return _fill(chain.from_iterable(rows), len(rows), len(columns))
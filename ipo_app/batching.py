@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import weakref
+
+import numpy as np
+from django.conf import settings
+
+from .prediction import ascore_matrix
+
+
+class PredictionQueueFull(Exception):
+    """More predictions are waiting than IPO_PREDICT_QUEUE_DEPTH allows"""
+
+
+class PredictionBatcher:
+    """
+    Coalesces single-row predictions made concurrently on one event loop
+    into one model call. A batch is scored once it holds max_batch rows or
+    its first row has waited max_wait seconds, whichever comes first, and
+    each caller gets its own row's result back.
+
+    Rows waiting or being scored count towards max_queue; beyond it
+    predict() raises PredictionQueueFull instead of queueing more work.
+    Each event loop has its own queue, so batches only form under ASGI:
+    under WSGI every request runs on a loop of its own, so callers there
+    pass batch=False to be scored at once instead of waiting max_wait alone.
+    """
+
+    def __init__(self, max_batch=None, max_wait=None, max_queue=None):
+        self._max_batch = max_batch
+        self._max_wait = max_wait
+        self._max_queue = max_queue
+        self._lock = threading.Lock()
+        self._queues = weakref.WeakKeyDictionary()
+
+    @property
+    def max_batch(self):
+        if self._max_batch is not None:
+            return self._max_batch
+        return getattr(settings, 'IPO_PREDICT_BATCH_SIZE', 64)
+
+    @property
+    def max_wait(self):
+        if self._max_wait is not None:
+            return self._max_wait
+        return getattr(settings, 'IPO_PREDICT_BATCH_WAIT_MS', 2) / 1000
+
+    @property
+    def max_queue(self):
+        if self._max_queue is not None:
+            return self._max_queue
+        return getattr(settings, 'IPO_PREDICT_QUEUE_DEPTH', 1024)
+
+    def _queue(self, loop):
+        queue = self._queues.get(loop)
+        if queue is None:
+            with self._lock:
+                queue = self._queues.setdefault(loop, _LoopQueue())
+        return queue
+
+    def depth(self):
+        """Rows waiting or being scored on the running event loop"""
+        return self._queue(asyncio.get_running_loop()).depth
+
+    async def predict(self, features, batch=True):
+        """(gain, confidence, model_version) for one feature row; batch=False scores it on its own"""
+        if not batch:
+            gains, confidence, version = await ascore_matrix(features[None, :])
+            return gains.tolist()[0], confidence, version
+        loop = asyncio.get_running_loop()
+        queue = self._queue(loop)
+        if queue.depth >= self.max_queue:
+            raise PredictionQueueFull(f'{queue.depth} predictions already queued')
+        return await queue.put(loop, features, self.max_batch, self.max_wait)
+
+
+class _LoopQueue:
+    """The rows waiting for a batch on one event loop (which it must not reference, or it is never freed)"""
+
+    def __init__(self):
+        self.pending = []
+        self.timer = None
+        self.in_flight = 0
+        self.tasks = set()
+
+    @property
+    def depth(self):
+        return len(self.pending) + self.in_flight
+
+    def put(self, loop, features, max_batch, max_wait):
+        future = loop.create_future()
+        self.pending.append((features, future))
+        if len(self.pending) >= max_batch:
+            self.flush(loop)
+        elif self.timer is None:
+            self.timer = loop.call_later(max_wait, self.flush, loop)
+        return future
+
+    def flush(self, loop):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            self.in_flight += len(batch)
+            task = loop.create_task(self.score(batch))
+            self.tasks.add(task)  # the loop only keeps a weak reference to its tasks
+            task.add_done_callback(self.tasks.discard)
+
+    async def score(self, batch):
+        try:
+            gains, confidence, version = await ascore_matrix(np.vstack([features for features, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), gain in zip(batch, gains.tolist()):
+                if not future.done():  # the client may have gone away
+                    future.set_result((gain, confidence, version))
+        finally:
+            self.in_flight -= len(batch)
+
+
+batcher = PredictionBatcher()
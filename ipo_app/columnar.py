@@ -0,0 +1,191 @@
+import os
+
+from django.db import DEFAULT_DB_ALIAS, connections, models, transaction
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import IPO, HistoricalIPO
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed for dataset snapshots
+    pa = pq = None
+
+# Snapshot name -> (model, natural key used to upsert on import)
+DATASET_TABLES = {
+    'historical': (HistoricalIPO, ['company_name', 'listing_date']),
+    'ipos': (IPO, ['company_name']),
+}
+ARROW_SUFFIXES = ('.arrow', '.feather', '.ipc')
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError('Dataset snapshots need pyarrow: pip install pyarrow')
+
+
+def is_arrow(path):
+    return os.fspath(path).lower().endswith(ARROW_SUFFIXES)
+
+
+def _arrow_type(field):
+    if isinstance(field, (models.DecimalField, models.FloatField)):
+        return pa.float64()
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    if isinstance(field, (models.IntegerField, models.AutoField)):
+        return pa.int64()
+    return pa.string()
+
+
+def dataset_fields(model):
+    return [field for field in model._meta.concrete_fields if not field.primary_key]
+
+
+def arrow_schema(model, table_name):
+    """Arrow schema for a model: Decimals become float64, dates date32, text stays text"""
+    require_pyarrow()
+    return pa.schema(
+        [pa.field(field.attname, _arrow_type(field), nullable=field.null or field.blank) for field in dataset_fields(model)],
+        metadata={'table': table_name, 'model': model._meta.label},
+    )
+
+
+def _selected(field):
+    # Decimals are cast to float in the database, which skips building a Decimal per value
+    if isinstance(field, models.DecimalField):
+        return Cast(field.attname, models.FloatField())
+    return field.attname
+
+
+def record_batches(table_name, chunk_size=10000, queryset=None):
+    """
+    Stream a table as Arrow record batches of `chunk_size` rows, reading the
+    database with a server-side iterator so memory stays flat.
+    """
+    model, _ = DATASET_TABLES[table_name]
+    schema = arrow_schema(model, table_name)
+    fields = dataset_fields(model)
+    queryset = model.objects.all() if queryset is None else queryset
+    rows = queryset.order_by('pk').values_list(*[_selected(f) for f in fields]).iterator(chunk_size=chunk_size)
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield _batch(chunk, schema)
+            chunk = []
+    if chunk:
+        yield _batch(chunk, schema)
+
+
+def _batch(rows, schema):
+    columns = zip(*rows)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=schema.field(i).type) for i, values in enumerate(columns)],
+        schema=schema,
+    )
+
+
+def export_table(table_name, path, chunk_size=10000, queryset=None):
+    """
+    Write a table to `path`: Parquet, or Arrow IPC (memory-mappable) when the
+    name ends in .arrow/.feather/.ipc. Returns the number of rows written.
+    """
+    model, _ = DATASET_TABLES[table_name]
+    schema = arrow_schema(model, table_name).with_metadata({
+        'table': table_name, 'model': model._meta.label, 'exported_at': timezone.now().isoformat(),
+    })
+    tmp = f'{path}.tmp'
+    count = 0
+    if is_arrow(path):
+        writer = pa.ipc.new_file(tmp, schema)
+    else:
+        writer = pq.ParquetWriter(tmp, schema, compression='zstd')
+    try:
+        for batch in record_batches(table_name, chunk_size, queryset):
+            writer.write_batch(batch)
+            count += batch.num_rows
+    finally:
+        writer.close()
+    os.replace(tmp, path)
+    return count
+
+
+def open_snapshot(path):
+    """The snapshot's schema and an iterator over its record batches"""
+    require_pyarrow()
+    if is_arrow(path):
+        reader = pa.ipc.open_file(pa.memory_map(os.fspath(path), 'r'))
+        return reader.schema, (reader.get_batch(i) for i in range(reader.num_record_batches))
+    parquet = pq.ParquetFile(path)
+    return parquet.schema_arrow, parquet.iter_batches()
+
+
+def read_snapshot(path, columns=None):
+    """Whole snapshot as a pyarrow Table; Arrow IPC files are memory-mapped, not copied"""
+    require_pyarrow()
+    if is_arrow(path):
+        table = pa.ipc.open_file(pa.memory_map(os.fspath(path), 'r')).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns)
+
+
+def _insert_sql(connection, model, fields, key_fields, replace):
+    qn = connection.ops.quote_name
+    sql = 'INSERT INTO %s (%s) VALUES (%s)' % (
+        qn(model._meta.db_table), ', '.join(qn(f.column) for f in fields), ', '.join(['%s'] * len(fields)),
+    )
+    if replace:
+        return sql
+    # The backend's own upsert clause (ON CONFLICT ... DO UPDATE / ON DUPLICATE KEY UPDATE)
+    suffix = connection.ops.on_conflict_suffix_sql(
+        fields,
+        OnConflict.UPDATE,
+        [f.column for f in fields if f.attname not in key_fields],
+        [model._meta.get_field(name).column for name in key_fields],
+    )
+    return f'{sql} {suffix}'
+
+
+def _db_values(values, field, connection):
+    if isinstance(field, models.DecimalField):
+        # The string DecimalField.get_db_prep_save would produce, without the per-value Decimal round trip
+        return [None if v is None else f'{v:.{field.decimal_places}f}' for v in values]
+    return [field.get_db_prep_save(value, connection) for value in values]
+
+
+def import_table(path, chunk_size=2000, table_name=None, replace=False):
+    """
+    Load a snapshot written by export_table, upserting on the table's natural
+    key (or after deleting every row if `replace`).
+
+    Values are prepared a column at a time and written with executemany:
+    model instances and bulk_create cost more per row than the insert itself.
+    Returns (table_name, rows_loaded).
+    """
+    schema, batches = open_snapshot(path)
+    metadata = {k.decode(): v.decode() for k, v in (schema.metadata or {}).items()}
+    table_name = table_name or metadata.get('table')
+    if table_name not in DATASET_TABLES:
+        raise ValueError(f'Unknown table {table_name!r}; expected one of {sorted(DATASET_TABLES)}')
+    model, key_fields = DATASET_TABLES[table_name]
+    fields = [field for field in dataset_fields(model) if field.attname in schema.names]
+    connection = connections[DEFAULT_DB_ALIAS]
+    sql = _insert_sql(connection, model, fields, key_fields, replace)
+
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        if replace:
+            model.objects.all().delete()
+        for batch in batches:
+            columns = [_db_values(batch.column(field.attname).to_pylist(), field, connection) for field in fields]
+            rows = list(zip(*columns))
+            for start in range(0, len(rows), chunk_size):
+                cursor.executemany(sql, rows[start:start + chunk_size])
+            count += len(rows)
+    return table_name, count
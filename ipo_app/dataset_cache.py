@@ -0,0 +1,136 @@
+import hashlib
+import time
+from datetime import date
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, has_vary_header
+from django.utils.http import http_date, quote_etag
+
+DATASET_VERSION_KEY = 'ipo_dataset_version'
+
+
+def dataset_version():
+    """
+    Current version of the IPO dataset: the time of the last write in epoch
+    milliseconds. Every cached response and fragment is keyed on it.
+    """
+    version = cache.get(DATASET_VERSION_KEY)
+    if version is None:
+        # Empty cache (first start, or evicted): any fresh value is safe, it only causes misses
+        cache.add(DATASET_VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(DATASET_VERSION_KEY, int(time.time() * 1000))
+    return int(version)
+
+
+def _bump():
+    version = max(int(time.time() * 1000), (cache.get(DATASET_VERSION_KEY) or 0) + 1)
+    cache.set(DATASET_VERSION_KEY, version, timeout=None)
+
+
+def bump_dataset_version():
+    """
+    Mark the dataset as changed, so everything cached under the old version
+    stops being read. Inside a transaction this waits for the commit;
+    otherwise a request could cache pre-commit rows under the new version.
+    """
+    transaction.on_commit(_bump)
+
+
+def versioned_key(name, version=None):
+    return f'{name}:v{dataset_version() if version is None else version}'
+
+
+def _timeout():
+    return getattr(settings, 'IPO_RESPONSE_CACHE_TIMEOUT', 3600)
+
+
+def cached_fragment(name, compute):
+    """Value of compute(), cached until the dataset changes"""
+    return cache.get_or_set(versioned_key(name), compute, timeout=_timeout())
+
+
+def _validators(request, version):
+    """(cache key, ETag, Last-Modified timestamp) of a GET under the given dataset version"""
+    variant = f'{version}:{date.today().isoformat()}:{request.get_full_path()}:{request.META.get("HTTP_ACCEPT", "")}'
+    digest = hashlib.md5(variant.encode('utf-8')).hexdigest()
+    return f'response:{digest}', quote_etag(digest), version // 1000
+
+
+def _shared(request):
+    """A request with no session or credentials, so its response can be served to anyone"""
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES and 'HTTP_AUTHORIZATION' not in request.META
+
+
+def _cacheable(request, response):
+    if callable(getattr(response, 'render', None)):
+        response.render()
+    if response.status_code != 200 or response.streaming:
+        return False
+    # A page carrying a CSRF token, or varying on cookies, belongs to the client it was rendered for
+    if request.META.get('CSRF_COOKIE_NEEDS_UPDATE') or has_vary_header(response, 'Cookie'):
+        return False
+    # The browsable API's HTML shows the user and their forms; only the JSON rendering is shared
+    renderer = getattr(response, 'accepted_renderer', None)
+    return renderer is None or renderer.format == 'json'
+
+
+def _stamp(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def cached_response(view):
+    """
+    Cache a view's successful GET responses under the dataset version and
+    answer revalidations with 304s. Works on sync and async views alike.
+
+    The ETag covers the dataset version, the day (several pages count days
+    from today), the full path and the Accept header. Last-Modified is the
+    time of the last write. Requests with a session or credentials, and
+    responses tied to one client (CSRF token, Vary: Cookie, browsable API
+    HTML), are neither cached nor validated.
+    """
+    if iscoroutinefunction(view):
+        return _async_cached_response(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not _shared(request):
+            return view(request, *args, **kwargs)
+
+        key, etag, last_modified = _validators(request, dataset_version())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if not _cacheable(request, response):
+                    return response
+                cache.set(key, response, timeout=_timeout())
+        return _stamp(response, etag, last_modified)
+    return wrapper
+
+
+def _async_cached_response(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or not _shared(request):
+            return await view(request, *args, **kwargs)
+
+        version = await sync_to_async(dataset_version)()
+        key, etag, last_modified = _validators(request, version)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await cache.aget(key)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+                if not _cacheable(request, response):
+                    return response
+                await cache.aset(key, response, timeout=_timeout())
+        return _stamp(response, etag, last_modified)
+    return wrapper
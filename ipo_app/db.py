@@ -0,0 +1,31 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import install_query_timer
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Run IPO_SQLITE_PRAGMAS on every new SQLite connection; other databases are left alone"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'IPO_SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def time_queries(sender, connection, **kwargs):
+    """Time every SQL statement for the request metrics"""
+    install_query_timer(connection)
+
+
+def sqlite_pragmas(connection):
+    """Current values of the IPO_SQLITE_PRAGMAS settings on `connection`"""
+    with connection.cursor() as cursor:
+        values = {}
+        for name in getattr(settings, 'IPO_SQLITE_PRAGMAS', {}):
+            cursor.execute(f'PRAGMA {name}')
+            values[name] = cursor.fetchone()[0]
+    return values
@@ -0,0 +1,101 @@
+import csv
+import json
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import models
+from django.db.models.functions import Cast
+
+from .models import HistoricalIPO
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def export_columns(model=HistoricalIPO):
+    """(name, expression) of every concrete field; Decimals are cast to float by the database"""
+    columns = []
+    for field in model._meta.concrete_fields:
+        if isinstance(field, models.DecimalField):
+            columns.append((field.attname, Cast(field.attname, models.FloatField())))
+        else:
+            columns.append((field.attname, field.attname))
+    return columns
+
+
+def export_rows(queryset, expressions, chunk_size=None):
+    """Row tuples read with a chunked iterator in primary key order, so memory stays flat"""
+    chunk_size = chunk_size or getattr(settings, 'IPO_EXPORT_CHUNK_SIZE', 2000)
+    return queryset.order_by('pk').values_list(*expressions).iterator(chunk_size=chunk_size)
+
+
+def _json_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_chunks(names, rows, lines=500):
+    """One JSON object per line, yielded `lines` rows at a time"""
+    for batch in _batches(rows, lines):
+        yield ''.join(json.dumps(dict(zip(names, row)), default=_json_value) + '\n' for row in batch)
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def csv_chunks(names, rows, lines=500):
+    """A header line, then the rows as CSV, yielded `lines` rows at a time"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(names)
+    for batch in _batches(rows, lines):
+        yield ''.join(writer.writerow(row) for row in batch)
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress a stream of text chunks into one gzip member as it goes"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(queryset, fmt='ndjson', compress=False, chunk_size=None):
+    """Chunks of the export of `queryset` in `fmt` (a key of EXPORT_FORMATS), gzipped if `compress`"""
+    columns = export_columns(queryset.model)
+    names = [name for name, _ in columns]
+    rows = export_rows(queryset, [expression for _, expression in columns], chunk_size)
+    chunks = ndjson_chunks(names, rows) if fmt == 'ndjson' else csv_chunks(names, rows)
+    return gzip_chunks(chunks) if compress else (chunk.encode('utf-8') for chunk in chunks)
+
+
+async def aiterate(chunks):
+    """
+    Async iterator over a sync one for StreamingHttpResponse under ASGI.
+    Each next() runs in the sync thread the ORM uses, so rows are still read
+    a chunk at a time rather than the whole export being gathered first.
+    """
+    done = object()
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while (chunk := await step(chunks, done)) is not done:
+            yield chunk
+    finally:
+        # Closes the database cursor when the client goes away mid-stream
+        await sync_to_async(chunks.close, thread_sensitive=True)()
@@ -0,0 +1,63 @@
+"""
+Feature spec shared by prediction (prediction.py) and training (training.py).
+
+FEATURE_FIELDS is the column order of every feature matrix the model sees.
+The *_COLUMNS lists say where each feature comes from on IPO and
+HistoricalIPO; a feature missing there is filled from FEATURE_DEFAULTS.
+"""
+import hashlib
+import json
+
+# Column order of the feature matrix fed to the model
+FEATURE_FIELDS = [
+    'qib_subscription',
+    'hni_subscription',
+    'retail_subscription',
+    'issue_size',
+    'issue_price',
+    'gmp',
+    'market_sentiment',
+]
+FEATURE_DEFAULTS = {'market_sentiment': 19500}
+
+# IPO model columns in FEATURE_FIELDS order; NII is what the API calls HNI.
+# Market sentiment is not stored per IPO, the default is used instead.
+IPO_FEATURE_COLUMNS = [
+    'qib_subscription',
+    'nii_subscription',
+    'retail_subscription',
+    'issue_size',
+    'issue_price',
+    'gmp',
+]
+
+# HistoricalIPO columns in FEATURE_FIELDS order. The reports carry no GMP
+# history, so GMP (like market sentiment) takes its default when training.
+HISTORICAL_FEATURE_COLUMNS = [
+    'qib_subscription',
+    'nii_subscription',
+    'retail_subscription',
+    'issue_size',
+    'issue_price',
+]
+TARGET_COLUMN = 'listing_gains_percent'
+
+
+def feature_default(name):
+    return FEATURE_DEFAULTS.get(name, 0)
+
+
+def feature_spec():
+    """The spec as plain data, stored with every trained model"""
+    return {
+        'features': FEATURE_FIELDS,
+        'defaults': {name: feature_default(name) for name in FEATURE_FIELDS},
+        'ipo_columns': IPO_FEATURE_COLUMNS,
+        'historical_columns': HISTORICAL_FEATURE_COLUMNS,
+        'target': TARGET_COLUMN,
+    }
+
+
+def feature_spec_hash():
+    payload = json.dumps(feature_spec(), sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
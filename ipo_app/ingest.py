@@ -0,0 +1,250 @@
+from contextlib import contextmanager
+from decimal import Decimal
+from datetime import datetime
+import json
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .report_cache import content_hash, year_is_closed
+from .upsert import QueryCounter
+
+DEFAULT_API_BASE = 'https://webnodejs.chittorgarh.com'
+DATE_FORMAT = "%b %d, %Y"
+# Stages of an ingest run in order; 'refresh' covers rescoring, statuses, stats and similar IPOs
+STAGES = ('fetch', 'decode', 'normalize', 'upsert', 'refresh')
+COUNTERS = ('rows', 'bytes', 'queries', 'errors')
+
+
+class StageSample:
+    """What one pass through a stage did; the caller fills in the counts"""
+
+    def __init__(self):
+        self.rows = self.bytes = self.queries = self.errors = 0
+
+
+class IngestTelemetry:
+    """
+    Time and counts per stage for one ingest run. Fetch workers record into
+    the same instance, so a stage's seconds are the time spent in it summed
+    across threads and can exceed the run's wall time.
+
+        with telemetry.stage('decode') as sample:
+            table = decode_report(body)
+            sample.rows = len(table)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {name: dict(seconds=0.0, calls=0, **dict.fromkeys(COUNTERS, 0)) for name in STAGES}
+
+    @contextmanager
+    def stage(self, name, count_queries=False):
+        """Time a block as a pass through `name`; with count_queries, its SQL statements are counted too"""
+        sample = StageSample()
+        counter = QueryCounter() if count_queries else None
+        start = time.perf_counter()
+        try:
+            if counter is None:
+                yield sample
+            else:
+                with counter:
+                    yield sample
+        except Exception:
+            sample.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            if counter is not None:
+                sample.queries = counter.count
+            with self._lock:
+                totals = self.stages[name]
+                totals['seconds'] += elapsed
+                totals['calls'] += 1
+                for counter_name in COUNTERS:
+                    totals[counter_name] += getattr(sample, counter_name)
+
+    def as_dict(self):
+        with self._lock:
+            return {name: dict(values, seconds=round(values['seconds'], 4)) for name, values in self.stages.items()}
+
+    def total(self, counter_name):
+        return sum(values[counter_name] for values in self.stages.values())
+
+
+def api_base():
+    return getattr(settings, 'CHITTORGARH_API_BASE', DEFAULT_API_BASE).rstrip('/')
+
+
+def upcoming_report_url(yr):
+    return f"{api_base()}/cloud/report/data-read/118/1/10/{yr}/{yr+1}-{yr+1}/0/all/0?search=&v=02-39"
+
+
+def historical_report_url(year):
+    return f"{api_base()}/cloud/report/data-read/98/1/10/{year}/{year}-{year+1}/0/all/0?search=&v=12-09"
+
+
+def make_session(workers=4, retries=3, backoff=0.5):
+    """
+    One pooled HTTP session shared by all fetch workers, retrying
+    connection errors and 429/5xx responses with exponential backoff.
+    """
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['GET'],
+    )
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=workers, pool_maxsize=workers)
+    session = requests.Session()
+    session.headers['User-Agent'] = 'Mozilla/5.0'
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def download_report(session, url, cache, force=False, immutable=False, timeout=30):
+    """
+    Fetch stage: conditional GET through the on-disk report cache.
+
+    Returns (body, entry, size): body is None when the report is unchanged
+    since the cached copy (immutable entry, 304, or same content hash), so the
+    caller can skip decoding and writes. entry is the cache entry to store
+    once the rows have been written, or None when there is nothing new to
+    record. size is the number of bytes downloaded.
+    """
+    entry = None if force else cache.get(url)
+    if entry and entry.get('immutable'):
+        return None, None, 0
+
+    response = session.get(url, headers=cache.conditional_headers(entry), timeout=timeout)
+    if response.status_code == 304:
+        if immutable and not entry.get('immutable'):
+            return None, dict(entry, immutable=True), 0
+        return None, None, 0
+    response.raise_for_status()
+
+    new_entry = {
+        'etag': response.headers.get('ETag', ''),
+        'last_modified': response.headers.get('Last-Modified', ''),
+        'content_hash': content_hash(response.content),
+        'immutable': immutable,
+        'body': response.text,
+    }
+    if entry and entry.get('content_hash') == new_entry['content_hash']:
+        return None, new_entry, len(response.content)
+    return response.content, new_entry, len(response.content)
+
+
+def decode_report(body):
+    """Decode stage: the report's rows, still as strings"""
+    return json.loads(body).get('reportTableData', [])
+
+
+def normalize_rows(table, parse_row):
+    """
+    Normalize stage: `parse_row` applied to every row of a decoded report.
+    Returns (records, errors) where errors is a list of (company, message);
+    a bad row is reported and skipped, it does not stop the rest.
+    """
+    records, errors = [], []
+    for row in table:
+        try:
+            record = parse_row(row)
+        except Exception as e:
+            errors.append((row.get('Company', 'Unknown'), str(e)))
+            continue
+        if record is not None:
+            records.append(record)
+    return records, errors
+
+
+def fetch_decoded(session, url, cache, telemetry, force=False, immutable=False):
+    """
+    The fetch and decode stages for one report. Returns (table, entry): table
+    is None when the report is unchanged, see download_report.
+    """
+    with telemetry.stage('fetch') as sample:
+        body, entry, sample.bytes = download_report(session, url, cache, force=force, immutable=immutable)
+    if body is None:
+        return None, entry
+    with telemetry.stage('decode') as sample:
+        table = decode_report(body)
+        sample.rows = len(table)
+    return table, entry
+
+
+def parse_date(value):
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def parse_historical_row(ipo):
+    """Convert one report row into HistoricalIPO field values"""
+    ipo_data = {
+        'company_id': ipo.get('~id') or '',
+        'company_name': ipo['Company'],
+        'issue_type': ipo.get('Issue Type') or '',
+        'comapny_url_name': ipo.get('~URLRewrite_Folder_Name') or '',
+        'open_date': parse_date(ipo['Opening Date']),
+        'listing_date': parse_date(ipo['Listing Date']),
+        'issue_size': Decimal(ipo['Issue Amount<br/> (Rs.cr.)']),
+        'issue_price': Decimal(ipo['Issue Price (Rs.)']),
+        'listing_price': Decimal(ipo['Open Price on Listing (Rs.)']),
+        'qib_subscription': Decimal(ipo.get('QIB', 0) or 0),
+        'nii_subscription': Decimal(ipo.get('NII', 0) or 0),
+        'retail_subscription': Decimal(ipo.get('RII', 0) or 0),
+        'total_subscription': Decimal(ipo.get('TOTAL', 0) or 0),
+    }
+    ipo_data['listing_gains_rs'] = ipo_data['listing_price'] - ipo_data['issue_price']
+    ipo_data['listing_gains_percent'] = round(ipo_data['listing_gains_rs'] / ipo_data['issue_price'] * 100, 2)
+    return ipo_data
+
+
+def parse_upcoming_row(ipo, today):
+    """Convert one upcoming report row into IPO field values; None for IPOs already listed or opened before `today`"""
+    open_date = parse_date(ipo['Opening Date'])
+    if ipo.get('~IPO_Listing_date') or open_date < today:
+        return None
+    return {
+        'company_id': ipo.get('~id') or '',
+        'company_name': ipo['Company'],
+        'company_logo_url': ipo.get("~compare_image") or '',
+        'issue_type': ipo.get('Issue Type') or '',
+        'comapny_url_name': ipo.get('~urlrewrite_folder_name') or '',
+        'open_date': open_date,
+        'close_date': parse_date(ipo['Closing Date']),
+        'status': 'upcoming',
+        'predicted_at': None,
+    }
+
+
+def fetch_historical_year(session, year, cache, force=False, telemetry=None):
+    """
+    Fetch, decode and normalize one year's report. Runs on a worker thread;
+    returns (year, records, errors, cache_entry) where errors is a list of
+    (company, message). records is None when the cached report is unchanged.
+    A bad row is reported and skipped, it does not stop the rest of the year.
+    """
+    telemetry = telemetry or IngestTelemetry()
+    url = historical_report_url(year)
+    table, entry = fetch_decoded(session, url, cache, telemetry, force=force, immutable=year_is_closed(year))
+    if table is None:
+        return year, None, [], entry
+    with telemetry.stage('normalize') as sample:
+        records, errors = normalize_rows(table, parse_historical_row)
+        sample.rows, sample.errors = len(records), len(errors)
+    return year, records, errors, entry
+
+
+def parse_years(value):
+    """'2015-2025' -> [2015, ..., 2025], '2024' -> [2024]"""
+    start, _, end = str(value).partition('-')
+    start = int(start)
+    end = int(end) if end else start
+    if end < start:
+        raise ValueError(f'Invalid year range: {value}')
+    return list(range(start, end + 1))
@@ -0,0 +1,103 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .dataset_cache import bump_dataset_version
+from .models import IPO, HistoricalIPO
+from .stats import refresh_historical_stats
+from .upsert import upsert
+
+logger = logging.getLogger(__name__)
+
+STATUSES = [choice for choice, _ in IPO.STATUS_CHOICES]
+# IPO fields copied as they are when a listed IPO is promoted to HistoricalIPO
+PROMOTED_FIELDS = [
+    'company_id', 'company_name', 'company_logo_url', 'issue_type', 'comapny_url_name', 'open_date', 'listing_date',
+    'issue_size', 'issue_price', 'listing_price', 'qib_subscription', 'nii_subscription', 'retail_subscription',
+    'total_subscription', 'sector', 'revenue', 'profit', 'pe_ratio',
+]
+
+
+def status_conditions(today):
+    """
+    Where each status applies on `today`. The conditions exclude each other,
+    and an IPO with no dates matches none of them, so it keeps its status.
+    """
+    listed = Q(listing_date__lte=today)
+    not_listed = Q(listing_date__isnull=True) | Q(listing_date__gt=today)
+    return {
+        'listed': listed,
+        'closed': Q(close_date__lt=today) & not_listed,
+        'open': Q(open_date__lte=today) & (Q(close_date__isnull=True) | Q(close_date__gte=today)) & not_listed,
+        'upcoming': Q(open_date__gt=today) & not_listed,
+    }
+
+
+def advance_statuses(today=None, promote=True):
+    """
+    Bring IPO.status in line with the open, close and listing dates on
+    `today`, with one UPDATE per target status. Each UPDATE only looks at
+    rows not yet listed and in another status, which the (status, date)
+    indexes narrow to the few IPOs in flight, so a pass stays cheap however
+    many listed IPOs have piled up.
+
+    Then IPOs listed in the last IPO_LIFECYCLE_PROMOTE_DAYS days that have
+    prices and no HistoricalIPO row yet are promoted in bulk.
+    Returns {pass name: {'rows': n, 'ms': elapsed}}.
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    passes = {}
+    with transaction.atomic():
+        for target, condition in status_conditions(today).items():
+            start = time.perf_counter()
+            # 'listed' is final: the listing date has passed, and a re-announced IPO comes back through
+            # fetch_ipo_data as 'upcoming'. Leaving it out keeps every pass off the bulk of the table.
+            others = [status for status in STATUSES if status not in (target, 'listed')]
+            rows = IPO.objects.filter(condition, status__in=others).update(status=target, updated_at=now)
+            passes[target] = {'rows': rows, 'ms': round((time.perf_counter() - start) * 1000, 3)}
+
+    if promote:
+        start = time.perf_counter()
+        rows = promote_listed_ipos(today)
+        passes['promote'] = {'rows': rows, 'ms': round((time.perf_counter() - start) * 1000, 3)}
+
+    if any(result['rows'] for result in passes.values()):
+        bump_dataset_version()
+    logger.info('IPO status passes: %s', passes)
+    return passes
+
+
+def promote_listed_ipos(today=None):
+    """Copy recently listed IPOs with a listing price into HistoricalIPO; returns the number added"""
+    today = today or timezone.localdate()
+    since = today - timedelta(days=getattr(settings, 'IPO_LIFECYCLE_PROMOTE_DAYS', 30))
+    already = HistoricalIPO.objects.filter(company_name=OuterRef('company_name'), listing_date=OuterRef('listing_date'))
+    rows = list(
+        IPO.objects.filter(status='listed', listing_date__gt=since, listing_date__lte=today)
+        .exclude(Q(issue_price__isnull=True) | Q(issue_price=0) | Q(listing_price__isnull=True) | Q(issue_size__isnull=True))
+        .filter(~Exists(already))
+        .values(*PROMOTED_FIELDS, 'listing_gains_rs', 'listing_gains_percentage')
+    )
+    if not rows:
+        return 0
+
+    records = []
+    for row in rows:
+        gains_rs = row.pop('listing_gains_rs')
+        gains_percent = row.pop('listing_gains_percentage')
+        if gains_rs is None:
+            gains_rs = row['listing_price'] - row['issue_price']
+        if gains_percent is None:
+            gains_percent = round(gains_rs / row['issue_price'] * 100, 2)
+        records.append(dict(row, listing_gains_rs=gains_rs, listing_gains_percent=gains_percent))
+
+    with transaction.atomic():
+        result = upsert(HistoricalIPO, records, ['company_name', 'listing_date'])
+    refresh_historical_stats({record['listing_date'].year for record in records})
+    return len(result['created']) + len(result['updated'])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from ipo_app.similarity import engine, compute_similar_ipos, DEFAULT_TOP_K
+import time
+
+
+class Command(BaseCommand):
+    help = 'Store the most similar historical IPOs for every IPO'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=DEFAULT_TOP_K, help='Number of similar IPOs stored per IPO')
+        parser.add_argument('--rebuild', action='store_true', help='Rebuild the feature matrix from scratch')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['rebuild']:
+            engine.build()
+        written = compute_similar_ipos(k=options['k'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Stored {written} similar IPOs from {len(engine)} historical rows in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from ipo_app.models import IPO, HistoricalIPO
+from ipo_app.ingest import make_session
+from ipo_app.dataset_cache import bump_dataset_version
+from ipo_app.stats import refresh_historical_stats
+from ipo_app.scraper import HostRateLimiter, company_page_url, scrape_company
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+
+ENRICHED_FIELDS = ['sector', 'revenue', 'profit', 'pe_ratio']
+
+
+class Command(BaseCommand):
+    help = 'Scrape company pages for financials, KPIs and sector and store them on IPO/HistoricalIPO rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Number of pages fetched concurrently')
+        parser.add_argument('--rate', type=float, default=4.0, help='Maximum requests per second per host (0 = unlimited)')
+        parser.add_argument('--all', action='store_true', help='Re-scrape rows that already have a sector')
+        parser.add_argument('--limit', type=int, default=None, help='Scrape at most this many companies')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows per bulk update statement')
+
+    def handle(self, *args, **options):
+        targets = self.collect_targets(options['all'])
+        if options['limit']:
+            targets = dict(list(targets.items())[:options['limit']])
+        self.stdout.write(f"Scraping {len(targets)} company pages...")
+
+        workers = max(1, options['workers'])
+        session = make_session(workers=workers)
+        limiter = HostRateLimiter(options['rate'])
+        updates = {IPO: [], HistoricalIPO: []}
+        error_count = 0
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(scrape_company, session, limiter, url, 30): url for url in targets}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    fields = future.result()
+                except Exception as e:
+                    # Any page can be malformed (an empty body, an unparsable figure); one must not lose the rest
+                    error_count += 1
+                    self.stdout.write(self.style.ERROR(f"✗ Failed {url}: {e}"))
+                    continue
+                for model, pk in targets[url]:
+                    updates[model].append(model(pk=pk, **fields))
+        elapsed = time.perf_counter() - start
+
+        for model, objs in updates.items():
+            model.objects.bulk_update(objs, ENRICHED_FIELDS, batch_size=options['chunk_size'])
+        if updates[IPO] or updates[HistoricalIPO]:
+            bump_dataset_version()
+        if updates[HistoricalIPO]:
+            # Sectors changed, so the stats buckets of those listing years are out of date
+            dates = HistoricalIPO.objects.filter(pk__in=[obj.pk for obj in updates[HistoricalIPO]]).dates('listing_date', 'year')
+            refresh_historical_stats(d.year for d in dates)
+
+        scraped = len(targets) - error_count
+        rate = scraped / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Summary: {scraped} pages scraped, {error_count} failed in {elapsed:.1f}s ({rate:.1f} pages/s); "
+            f"{len(updates[IPO])} IPO and {len(updates[HistoricalIPO])} historical rows updated"
+        ))
+
+    def collect_targets(self, include_enriched):
+        """Map each company page URL to the (model, pk) rows it fills, so shared pages are fetched once"""
+        targets = {}
+        for model in (IPO, HistoricalIPO):
+            queryset = model.objects.exclude(comapny_url_name='').exclude(company_id='')
+            if not include_enriched:
+                queryset = queryset.filter(Q(sector__isnull=True) | Q(sector=''))
+            for pk, url_name, company_id in queryset.values_list('pk', 'comapny_url_name', 'company_id'):
+                targets.setdefault(company_page_url(url_name, company_id), []).append((model, pk))
+        return targets
@@ -1,135 +1,237 @@
-from django.core.management.base import BaseCommand
-from ipo_app.models import IPO, HistoricalIPO
-from decimal import Decimal
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from ipo_app.models import IPO, HistoricalIPO, IngestRun
+from ipo_app.prediction import rescore_ipos
+from ipo_app.upsert import upsert, QueryCounter
+from ipo_app.report_cache import ReportCache
+from ipo_app.dataset_cache import bump_dataset_version
+from ipo_app.similarity import compute_similar_ipos
+from ipo_app.stats import refresh_historical_stats
+from ipo_app.lifecycle import advance_statuses
+from ipo_app.ingest import (
+    IngestTelemetry, STAGES, make_session, fetch_decoded, fetch_historical_year, normalize_rows, parse_upcoming_row,
+    upcoming_report_url, historical_report_url, parse_years,
+)
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import requests
-from bs4 import BeautifulSoup
-import json
 from django.db import transaction
 
 
 class Command(BaseCommand):
     help = 'Fetch real IPO data from Chittorgarh'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--years', default='2024-2025', help='Year or year range of historical reports, e.g. 2015-2025')
+        parser.add_argument('--workers', type=int, default=4, help='Number of years fetched concurrently')
+        parser.add_argument('--retries', type=int, default=3, help='Retries per report, with exponential backoff')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows per bulk insert/update statement')
+        parser.add_argument('--force', action='store_true', help='Ignore the report cache and re-ingest every report')
+        parser.add_argument('--report', help='Also write the run\'s per-stage timing report to this JSON file')
+        parser.add_argument('--quiet', action='store_true', help='Skip the per-row lines, print summaries only')
+
     def handle(self, *args, **kwargs):
-        
-        years = [2024,2025]
-        
-        self.stdout.write('Fetching upcoming IPOs...')
-        self.fetch_upcoming_ipos()
-        self.stdout.write('\n\n-----------------------------------------\n\n')
-        self.stdout.write('Fetching closed IPOs...')
-        self.fetch_historical_ipos(years)
-        # self.fetch_closed_ipo(years)
-        self.stdout.write(self.style.SUCCESS('IPO data fetch complete!'))
+        try:
+            years = parse_years(kwargs['years'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        workers = max(1, kwargs['workers'])
+        self.session = make_session(workers=workers, retries=kwargs['retries'])
+        self.chunk_size = kwargs['chunk_size']
+        self.cache = ReportCache()
+        self.force = kwargs['force']
+        self.quiet = kwargs['quiet']
+        self.changed = False
+        self.telemetry = IngestTelemetry()
+        self.totals = {'created': 0, 'updated': 0, 'unchanged': 0}
+        self.failures = []
+
+        self.run = IngestRun.objects.create(options={
+            'years': [years[0], years[-1]], 'workers': workers, 'retries': kwargs['retries'],
+            'chunk_size': self.chunk_size, 'force': self.force,
+        })
+        start = time.perf_counter()
+        try:
+            with QueryCounter() as queries:
+                self.stdout.write('Fetching upcoming IPOs...')
+                self.fetch_upcoming_ipos()
+                self.stdout.write('\n\n-----------------------------------------\n\n')
+                self.stdout.write('Fetching closed IPOs...')
+                self.fetch_historical_ipos(years, workers)
+                # self.fetch_closed_ipo(years)
+                with self.telemetry.stage('refresh', count_queries=True):
+                    # Upcoming rows are written as 'upcoming'; move those already open, closed or listed
+                    passes = advance_statuses()
+                    self.changed = self.changed or bool(passes['promote']['rows'])
+                    if self.changed:
+                        # Picks up the new history incrementally and refreshes every IPO's similar list
+                        self.stdout.write(f"Stored {compute_similar_ipos()} similar IPOs")
+                        # Cached pages and API responses are keyed on the dataset version
+                        bump_dataset_version()
+                    else:
+                        self.stdout.write("No changes, similar IPOs and cached pages kept")
+        except Exception as e:
+            self.finish_run('failed', time.perf_counter() - start, 0, str(e), kwargs['report'])
+            raise
+        status = 'partial' if self.failures or self.telemetry.total('errors') else 'success'
+        self.finish_run(status, time.perf_counter() - start, queries.count, '; '.join(self.failures), kwargs['report'])
+        self.write_stage_table()
+        self.stdout.write(self.style.SUCCESS(f'IPO data fetch complete! ({queries.count} queries)'))
 
+    def row_message(self, message, style=None):
+        """One line per company; --quiet drops them, as writing them slows large backfills"""
+        if not self.quiet:
+            self.stdout.write(style(message) if style else message)
 
+    def finish_run(self, status, wall_seconds, queries, error_message, report_path):
+        run = self.run
+        run.status = status
+        run.finished_at = timezone.now()
+        run.wall_seconds = round(wall_seconds, 4)
+        run.rows_created = self.totals['created']
+        run.rows_updated = self.totals['updated']
+        run.rows_unchanged = self.totals['unchanged']
+        run.errors = self.telemetry.total('errors')
+        run.bytes_downloaded = self.telemetry.total('bytes')
+        run.queries = queries
+        run.stages = self.telemetry.as_dict()
+        run.error_message = error_message
+        run.save()
+        if report_path:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(run.report(), f, indent=2)
+            self.stdout.write(f"Report written to {report_path}")
+
+    def write_stage_table(self):
+        stages = self.run.stages
+        self.stdout.write(f"\n{'stage':<10}{'seconds':>10}{'calls':>7}{'rows':>9}{'bytes':>12}{'queries':>9}{'errors':>8}")
+        for name in STAGES:
+            stage = stages[name]
+            self.stdout.write(
+                f"{name:<10}{stage['seconds']:>10.3f}{stage['calls']:>7}{stage['rows']:>9}{stage['bytes']:>12}"
+                f"{stage['queries']:>9}{stage['errors']:>8}"
+            )
+        self.stdout.write(f"Run {self.run.pk}: {self.run.status} in {self.run.wall_seconds:.2f} s")
+
+    def upsert_stage(self, model, records, key_fields):
+        with self.telemetry.stage('upsert', count_queries=True) as sample:
+            result = upsert(model, records, key_fields, chunk_size=self.chunk_size)
+            sample.rows = len(records)
+        for name in self.totals:
+            self.totals[name] += result[name] if name == 'unchanged' else len(result[name])
+        return result
 
     @transaction.atomic
     def fetch_upcoming_ipos(self):
         try:
-            yr = datetime.now().year
-            url = f"https://webnodejs.chittorgarh.com/cloud/report/data-read/118/1/10/{yr}/{yr+1}-{yr+1}/0/all/0?search=&v=02-39"
-            response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-            response.raise_for_status()
-            data = json.loads(response.text)
-            table = data.get("reportTableData", [])
+            url = upcoming_report_url(datetime.now().year)
+            table, cache_entry = fetch_decoded(self.session, url, self.cache, self.telemetry, force=self.force)
+            if table is None:
+                if cache_entry:
+                    self.cache.put(url, cache_entry)
+                self.stdout.write("Upcoming report unchanged, skipping")
+                return
             today = datetime.now().date()
 
-            # Filter IPOs where listing date is empty and opening date >= today
-            upcoming_ipos = [
-                ipo for ipo in table
-                if not ipo.get('~IPO_Listing_date') and datetime.strptime(ipo['Opening Date'], "%b %d, %Y").date() >= today
-            ]
-            self.stdout.write(f"Found {len(upcoming_ipos)} upcoming IPOs to process")
-            created_count,updated_count = 0,0
-            for ipo in upcoming_ipos:
-                try:
-                    company_name = ipo.get('Company')
-                    ipo_data = {
-                        'company_id': ipo.get('~id'),
-                        'company_logo_url': ipo.get("~compare_image"),
-                        'issue_type': ipo.get('Issue Type'),
-                        'comapny_url_name': ipo.get('~urlrewrite_folder_name'),
-                        'open_date': datetime.strptime(ipo['Opening Date'], "%b %d, %Y").date(),
-                        'close_date': datetime.strptime(ipo['Closing Date'], "%b %d, %Y").date(),
-                        'status': 'upcoming'
-                    }
-                    ipo_obj, created = IPO.objects.update_or_create(
-                        company_name=company_name,
-                        defaults=ipo_data
-                    )
-                    
-                    if created:
-                        created_count += 1
-                        self.stdout.write(self.style.SUCCESS(f"✓ Created: {company_name}"))
-                    else:
-                        updated_count += 1
-                        self.stdout.write(f"✓ Updated: {company_name}")
-                        
-                except KeyError as e:
-                    self.stdout.write(self.style.ERROR(f"✗ Missing field for {ipo.get('Company', 'Unknown')}: {e}"))
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f"✗ Error processing {ipo.get('Company', 'Unknown')}: {str(e)}"))
+            # Only IPOs with no listing date yet that open today or later
+            with self.telemetry.stage('normalize') as sample:
+                records, errors = normalize_rows(table, lambda ipo: parse_upcoming_row(ipo, today))
+                sample.rows, sample.errors = len(records), len(errors)
+            self.stdout.write(f"Found {len(records)} upcoming IPOs to process")
+            for company, message in errors:
+                self.row_message(f"✗ Error processing {company}: {message}", self.style.ERROR)
+
+            result = self.upsert_stage(IPO, records, ['company_name'])
+            self.changed = self.changed or bool(result['created'] or result['updated'])
+            for (company_name,) in result['created']:
+                self.row_message(f"✓ Created: {company_name}", self.style.SUCCESS)
+            for (company_name,) in result['updated']:
+                self.row_message(f"✓ Updated: {company_name}")
             
-            self.stdout.write(self.style.SUCCESS(f"Summary: {created_count} created, {updated_count} updated"))
+            self.stdout.write(self.style.SUCCESS(
+                f"Summary: {len(result['created'])} created, {len(result['updated'])} updated, {result['unchanged']} unchanged"
+            ))
+            with self.telemetry.stage('refresh', count_queries=True) as sample:
+                sample.rows = rescore_ipos()
+            self.stdout.write(self.style.SUCCESS(f"Scored {sample.rows} IPOs"))
+            self.cache.put(url, cache_entry)
             
         except requests.RequestException as e:
+            self.failures.append(f"upcoming: {e}")
             self.stdout.write(self.style.ERROR(f"Network error: {str(e)}"))
         except Exception as e:
+            self.failures.append(f"upcoming: {e}")
             self.stdout.write(self.style.ERROR(f"Unexpected error: {str(e)}"))
             import traceback
             traceback.print_exc()
 
-    def fetch_historical_ipos(self,years):
-        created_count,updated_count = 0,0
-        try:
-            y = years if len(years) < 1 else list(range(years[0], years[1] + 1))
-            for year in y :
-                url = f"https://webnodejs.chittorgarh.com/cloud/report/data-read/98/1/10/{year}/{year}-{year+1}/0/all/0?search=&v=12-09"
-                data =  json.loads(requests.get(url,{'User-Agent': 'Mozilla/5.0'}).text)
-                table = data["reportTableData"]
-                for ipo in table:
-                        try:
-                            ipo_data = {
-                            'company_id': ipo.get('~id'),
-                            'company_name': ipo['Company'],
-                            'issue_type': ipo.get('Issue Type', ''),
-                            'comapny_url_name': ipo.get('~URLRewrite_Folder_Name'),
-                            'open_date': datetime.strptime(ipo['Opening Date'], "%b %d, %Y").date(),
-                            'listing_date': datetime.strptime(ipo['Listing Date'], "%b %d, %Y").date(),
-                            'issue_size': Decimal(ipo['Issue Amount<br/> (Rs.cr.)']),
-                            'issue_price': Decimal(ipo['Issue Price (Rs.)']),
-                            'listing_price': Decimal(ipo['Open Price on Listing (Rs.)']),
-                            'qib_subscription': Decimal(ipo.get('QIB', 0) or 0 ),
-                            'nii_subscription': Decimal(ipo.get('NII', 0) or 0),
-                            'retail_subscription': Decimal(ipo.get('RII', 0) or 0),
-                            'total_subscription': Decimal(ipo.get('TOTAL', 0) or 0),
-                            }
-
-                            ipo_data['listing_gains_rs'] = ipo_data['listing_price'] - ipo_data['issue_price']
-                            ipo_data['listing_gains_percent'] = round(ipo_data['listing_gains_rs'] / ipo_data['issue_price'] * 100, 2)
-
-                            hist, created = HistoricalIPO.objects.update_or_create(
-                            company_name=ipo_data['company_name'], defaults=ipo_data)
-                            if created:
-                                created_count += 1
-                            else:
-                                updated_count += 1
-                        
-                        except Exception as e:
-                            self.stdout.write(self.style.ERROR(f"✗ Error processing {ipo.get('company_name', ipo['Company'])} of year {year}: {str(e)}"))
-                            break
-                self.stdout.write(self.style.SUCCESS(f"✓ Created: Year {year}"))
-            self.stdout.write(self.style.SUCCESS(f"\nSummary: {created_count} created, {updated_count} updated in year range {years}"))
-            resp = {"Success":True}
+    def fetch_historical_ipos(self, years, workers=4):
+        """
+        Fetch, decode and normalize all years concurrently, then upsert each
+        year in its own transaction on the main thread as results arrive.
+        """
+        created_count, updated_count, unchanged_count, error_count = 0, 0, 0, 0
+        failed_years = []
+        touched_years = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(fetch_historical_year, self.session, year, self.cache, self.force, self.telemetry): year
+                for year in years
+            }
+            for future in as_completed(futures):
+                year = futures[future]
+                try:
+                    _, records, errors, cache_entry = future.result()
+                except Exception as e:
+                    # Any bad report (network error, a body that is not a report) fails only its year;
+                    # the stage it failed in has already counted the error
+                    failed_years.append(year)
+                    self.failures.append(f"{year}: {e}")
+                    self.stdout.write(self.style.ERROR(f"✗ Failed to get Historical data for year {year}: {e}"))
+                    continue
+
+                if records is None:
+                    if cache_entry:
+                        self.cache.put(historical_report_url(year), cache_entry)
+                    self.stdout.write(f"✓ Year {year}: report unchanged, skipped")
+                    continue
+
+                for company, message in errors:
+                    self.row_message(f"✗ Error processing {company} of year {year}: {message}", self.style.ERROR)
+                error_count += len(errors)
+
+                with QueryCounter() as queries:
+                    result = self.upsert_stage(HistoricalIPO, records, ['company_name', 'listing_date'])
+                created, updated = len(result['created']), len(result['updated'])
+                touched_years.update(listing_date.year for _, listing_date in result['created'] + result['updated'] if listing_date)
+                created_count += created
+                updated_count += updated
+                unchanged_count += result['unchanged']
+                self.stdout.write(self.style.SUCCESS(
+                    f"✓ Year {year}: {created} created, {updated} updated, {result['unchanged']} unchanged, "
+                    f"{len(errors)} skipped ({queries.count} queries)"
+                ))
+                # Only remember the report once its rows are safely written
+                self.cache.put(historical_report_url(year), cache_entry)
+
+        if created_count or updated_count:
+            self.changed = True
+        if touched_years:
+            # Only the years this run wrote to; every other year's stats are still current
+            with self.telemetry.stage('refresh', count_queries=True) as sample:
+                sample.rows = refresh_historical_stats(touched_years)
+            self.stdout.write(f"Refreshed {sample.rows} stats buckets for years {sorted(touched_years)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"\nSummary: {created_count} created, {updated_count} updated, {unchanged_count} unchanged, "
+            f"{error_count} skipped in years {years[0]}-{years[-1]}"
+        ))
+        if failed_years:
+            return {"Success": False, "Error": f"Failed years: {sorted(failed_years)}"}
+        return {"Success": True}
 
-        except Exception as e:
-            resp = {"Success":False, "Error":e}
-            self.stdout.write(self.style.ERROR(f"✗ Failed to get Historical data: {e}"))
-        
-        return resp
-    
     # def fetch_closed_ipo(self, years=None):
     #     created_count, updated_count = 0, 0
     #     try:
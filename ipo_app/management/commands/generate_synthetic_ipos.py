@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from ipo_app.synthetic import NAME_PREFIX, clear_synthetic, generate
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with synthetic IPO, HistoricalIPO and SimilarIPO rows for benchmarks and demos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ipos', type=int, default=500, help='Current IPOs, spread from 120 days ago to 30 days ahead')
+        parser.add_argument('--historical', type=int, default=5000, help='Historical IPOs')
+        parser.add_argument('--years', type=int, default=10, help='Years the historical listings are spread over')
+        parser.add_argument('--similar', type=int, default=3, help='Similar IPOs stored per IPO (0 skips them)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same rows')
+        parser.add_argument('--clear', action='store_true', help='Only delete earlier synthetic rows')
+
+    def handle(self, *args, **options):
+        if min(options['ipos'], options['historical'], options['similar'], options['years']) < 0:
+            raise CommandError('Counts must not be negative')
+        # Earlier synthetic rows are replaced; real rows are left alone, see synthetic_rows
+        removed = clear_synthetic()
+        self.stdout.write(f"Removed {removed} earlier '{NAME_PREFIX} ...' rows")
+        if options['clear']:
+            return
+        start = time.perf_counter()
+        counts = generate(
+            ipos=options['ipos'], historical=options['historical'], k=options['similar'],
+            seed=options['seed'], years=max(1, options['years']),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {counts['ipos']} IPOs ({counts['scored']} scored), {counts['historical']} historical IPOs and "
+            f"{counts['similar']} similar IPOs in {time.perf_counter() - start:.1f} s"
+        ))
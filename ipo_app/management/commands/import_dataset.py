@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from ipo_app.columnar import DATASET_TABLES, import_table, require_pyarrow
+from ipo_app.dataset_cache import bump_dataset_version
+from ipo_app.models import HistoricalIPO
+from ipo_app.stats import refresh_historical_stats
+import time
+
+
+class Command(BaseCommand):
+    help = 'Load a snapshot written by export_dataset into the database with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Parquet or Arrow IPC snapshot')
+        parser.add_argument('--table', choices=sorted(DATASET_TABLES), default=None, help='Target table (default: the one recorded in the snapshot)')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows per bulk insert statement')
+        parser.add_argument('--replace', action='store_true', help='Delete every existing row of the table first instead of upserting')
+
+    def handle(self, *args, **options):
+        try:
+            require_pyarrow()
+            start = time.perf_counter()
+            table, count = import_table(
+                options['input'], chunk_size=options['chunk_size'], table_name=options['table'], replace=options['replace'],
+            )
+        except (ImportError, ValueError, OSError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - start
+
+        if DATASET_TABLES[table][0] is HistoricalIPO:
+            refresh_historical_stats()
+        bump_dataset_version()
+        self.stdout.write(self.style.SUCCESS(f"✓ Imported {count} {table} rows from {options['input']} in {elapsed:.2f}s"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from ipo_app.ingest import parse_years
+from ipo_app.stats import refresh_historical_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed HistoricalIPOStats buckets (fetch_ipo_data keeps them current for the years it writes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--years', default=None, help='Year or year range to rebuild, e.g. 2015-2025 (default: every year)')
+
+    def handle(self, *args, **options):
+        years = None
+        if options['years']:
+            try:
+                years = parse_years(options['years'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        buckets = refresh_historical_stats(years)
+        self.stdout.write(self.style.SUCCESS(f"✓ Refreshed {buckets} stats buckets"))
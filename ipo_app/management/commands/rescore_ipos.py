@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from ipo_app.prediction import rescore_ipos
+
+
+class Command(BaseCommand):
+    help = 'Score every unscored or stale IPO in one batch prediction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-score every IPO with subscription data, not just stale ones')
+
+    def handle(self, *args, **options):
+        scored = rescore_ipos(force=options['all'])
+        self.stdout.write(self.style.SUCCESS(f"✓ Scored {scored} IPOs"))
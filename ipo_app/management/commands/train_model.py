@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from ipo_app.training import MODEL_KINDS, train
+
+
+class Command(BaseCommand):
+    help = 'Train the listing-gain model on HistoricalIPO, cross-validate it and publish it to IPO_MODEL_PATH'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=MODEL_KINDS, default='gbr', help='Estimator to train')
+        parser.add_argument('--folds', type=int, default=5, help='Cross-validation folds')
+        parser.add_argument('--n-jobs', type=int, default=-1, help='Folds fitted in parallel (-1 = all cores)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the folds and the estimator')
+        parser.add_argument('--output', default=None, help='Where to publish the model (default: IPO_MODEL_PATH); .pkl, .joblib or .npy')
+        parser.add_argument('--no-cache', action='store_true', help='Rebuild the design matrix even if it is cached')
+
+    def handle(self, *args, **options):
+        try:
+            metadata = train(
+                kind=options['model'], folds=options['folds'], n_jobs=options['n_jobs'], seed=options['seed'],
+                output=options['output'], use_cache=not options['no_cache'],
+            )
+        except (ImportError, ValueError) as e:
+            raise CommandError(str(e))
+
+        timings = metadata['training_seconds']
+        source = 'cache' if metadata['design_matrix_cached'] else 'database'
+        self.stdout.write(f"Design matrix: {metadata['rows']} rows from {source} in {timings['design_matrix']:.2f}s (data {metadata['data_hash']})")
+        for name, value in metadata['cv']['metrics'].items():
+            self.stdout.write(f"  {name}: {value['mean']:.4f} ± {value['std']:.4f}")
+        self.stdout.write(f"Cross-validation {timings['cross_validation']:.2f}s, final fit {timings['fit']:.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"✓ Published model {metadata['model_version']} ({metadata['artifact']})"))
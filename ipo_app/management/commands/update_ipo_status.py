@@ -0,0 +1,27 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from ipo_app.lifecycle import advance_statuses
+
+
+class Command(BaseCommand):
+    help = 'Move IPOs between upcoming, open, closed and listed by their dates, and promote listed IPOs to history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', default=None, help='Treat this day (YYYY-MM-DD) as today')
+        parser.add_argument('--loop', type=float, default=0, help='Keep running, one pass every this many seconds')
+        parser.add_argument('--no-promote', action='store_true', help='Only update statuses')
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options['date']) if options['date'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+        while True:
+            passes = advance_statuses(today, promote=not options['no_promote'])
+            summary = ', '.join(f"{name} {result['rows']} ({result['ms']:.1f} ms)" for name, result in passes.items())
+            self.stdout.write(self.style.SUCCESS(f"✓ {summary}"))
+            if not options['loop']:
+                break
+            time.sleep(options['loop'])
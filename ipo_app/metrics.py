@@ -0,0 +1,289 @@
+import contextvars
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help_text, self.labels = name, help_text, tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labels), 0)
+
+    def lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}'
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """Cumulative buckets, sum and count per label set, as Prometheus expects them"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=SECONDS_BUCKETS):
+        self.name, self.help_text, self.labels = name, help_text, tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values = {}  # label values -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    def count(self, **labels):
+        entry = self._values.get(tuple(str(labels[name]) for name in self.labels))
+        return sum(entry[0]) if entry else 0
+
+    def lines(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                yield f'{self.name}_bucket{_format_labels(self.labels, key, [("le", le)])} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labels, key)} {cumulative}'
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class MetricsRegistry:
+    """
+    The process's metrics, rendered in the Prometheus text format. Values
+    live in memory, so under several workers each one reports its own.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, help_text, labels=()):
+        return self._register(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=SECONDS_BUCKETS):
+        return self._register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.lines())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+metrics = MetricsRegistry()
+
+REQUESTS = metrics.counter('ipo_http_requests_total', 'Requests handled, by view, method and status.', ('view', 'method', 'status'))
+REQUEST_SECONDS = metrics.histogram('ipo_http_request_duration_seconds', 'Time to build the response, by view.', ('view', 'method'))
+REQUEST_DB_QUERIES = metrics.histogram(
+    'ipo_http_request_db_queries', 'SQL statements run per request, by view.', ('view',), QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = metrics.histogram('ipo_http_request_db_seconds', 'Time spent in SQL per request, by view.', ('view',))
+DB_QUERY_SECONDS = metrics.histogram('ipo_db_query_duration_seconds', 'Time of each SQL statement, by database alias.', ('alias',))
+TEMPLATE_SECONDS = metrics.histogram('ipo_template_render_seconds', 'Time to render each top-level template.', ('template',))
+PREDICT_SECONDS = metrics.histogram(
+    'ipo_predict_duration_seconds', 'Prediction time by phase: model_load (registry lookup and reload) or predict.', ('phase',),
+)
+
+
+class RequestTimings:
+    """What one request spent its time on, filled in as it runs"""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.phases = {}
+
+    def summary(self):
+        parts = [f'{self.db_queries} queries in {self.db_seconds * 1000:.1f} ms', f'templates {self.template_seconds * 1000:.1f} ms']
+        parts.extend(f'{phase} {seconds * 1000:.1f} ms' for phase, seconds in self.phases.items())
+        return ', '.join(parts)
+
+
+_timings = contextvars.ContextVar('ipo_request_timings', default=None)
+
+
+def current_timings():
+    """Timings of the request being handled, or None outside a request"""
+    return _timings.get()
+
+
+class QueryTimer:
+    """execute_wrapper that times every SQL statement on a connection"""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            DB_QUERY_SECONDS.observe(elapsed, alias=self.alias)
+            timings = _timings.get()
+            if timings is not None:
+                timings.db_queries += 1
+                timings.db_seconds += elapsed
+
+
+def install_query_timer(connection):
+    """
+    Add a QueryTimer to `connection` once (its execute_wrappers outlive
+    reconnects). It goes first, as execute_wrapper() blocks pop the last one.
+    """
+    if not any(isinstance(wrapper, QueryTimer) for wrapper in connection.execute_wrappers):
+        connection.execute_wrappers.insert(0, QueryTimer(connection.alias))
+
+
+@contextmanager
+def predict_phase(phase):
+    """Time a block as one phase of a prediction"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        PREDICT_SECONDS.observe(elapsed, phase=phase)
+        timings = _timings.get()
+        if timings is not None:
+            timings.phases[phase] = timings.phases.get(phase, 0.0) + elapsed
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            elapsed = time.perf_counter() - start
+            TEMPLATE_SECONDS.observe(elapsed, template=self.origin.template_name or '<string>')
+            timings = _timings.get()
+            if timings is not None:
+                timings.template_seconds += elapsed
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render time recorded per template"""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+def slow_request_threshold(view):
+    """Milliseconds after which a request to `view` is logged: IPO_SLOW_REQUEST_THRESHOLDS, else IPO_SLOW_REQUEST_MS"""
+    thresholds = getattr(settings, 'IPO_SLOW_REQUEST_THRESHOLDS', {})
+    return thresholds.get(view, getattr(settings, 'IPO_SLOW_REQUEST_MS', 500))
+
+
+class RequestMetricsMiddleware:
+    """
+    Records latency, status and SQL count and time per view, and logs a
+    breakdown of requests slower than their threshold. Latency runs until
+    the response is returned, so a streamed body is not included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings, start = RequestTimings(), time.perf_counter()
+        token = _timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self.record(request, response, timings, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        timings, start = RequestTimings(), time.perf_counter()
+        token = _timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        self.record(request, response, timings, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, timings, elapsed):
+        view = getattr(request.resolver_match, 'view_name', None) or 'unresolved'
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_SECONDS.observe(elapsed, view=view, method=request.method)
+        REQUEST_DB_QUERIES.observe(timings.db_queries, view=view)
+        REQUEST_DB_SECONDS.observe(timings.db_seconds, view=view)
+
+        threshold = slow_request_threshold(view)
+        if threshold is not None and elapsed * 1000 >= threshold:
+            logger.warning(
+                'Slow request %s %s (%s) -> %s in %.1f ms: %s',
+                request.method, request.path, view, response.status_code, elapsed * 1000, timings.summary(),
+            )
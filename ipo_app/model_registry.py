@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+try:
+    import joblib
+except ImportError:  # joblib ships with scikit-learn, but is optional here
+    joblib = None
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_VERSION = 'fallback'
+
+
+class LinearArrayModel:
+    """
+    Linear model stored as a plain NumPy vector: 7 coefficients followed by
+    the intercept. Loaded with mmap so every worker shares the same pages.
+    """
+
+    def __init__(self, weights):
+        self.coef_ = weights[:-1]
+        self.intercept_ = float(weights[-1])
+
+    def predict(self, features):
+        return features @ self.coef_ + self.intercept_
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    model: object
+    version: str
+    path: str = None
+    file_key: tuple = None
+    loaded_at: object = field(default_factory=timezone.now)
+
+
+def _load_file(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        return LinearArrayModel(np.load(path, mmap_mode='r'))
+    if ext == '.joblib':
+        if joblib is None:
+            raise ImportError('joblib is required to load .joblib models')
+        return joblib.load(path, mmap_mode='r')
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def file_version(path):
+    """Model version reported by the registry: the start of the file's sha256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _file_key(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ModelRegistry:
+    """
+    Loads the prediction model on first use and hot-swaps it when the file
+    on disk changes. Change detection is a stat() call, done at most once
+    per check_interval seconds. While one thread reloads, the others keep
+    serving the previous model instead of waiting.
+    """
+
+    def __init__(self, path=None, check_interval=None):
+        self._path = path
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._checked_at = 0.0
+
+    @property
+    def path(self):
+        path = self._path or getattr(settings, 'IPO_MODEL_PATH', None)
+        return os.fspath(path) if path else None
+
+    @property
+    def check_interval(self):
+        if self._check_interval is not None:
+            return self._check_interval
+        return getattr(settings, 'IPO_MODEL_CHECK_INTERVAL', 5)
+
+    def get(self):
+        current = self._current
+        now = time.monotonic()
+        if current is not None and now - self._checked_at < self.check_interval:
+            return current
+        self._checked_at = now
+
+        path = self.path
+        key = _file_key(path) if path else None
+        if current is not None and current.path == path and current.file_key == key:
+            return current
+
+        # Only the first load blocks; a reload in progress elsewhere keeps the old model serving
+        if not self._lock.acquire(blocking=current is None):
+            return current
+        try:
+            current = self._current
+            if current is None or current.path != path or current.file_key != key:
+                self._current = self._load(path, key, current)
+            return self._current
+        finally:
+            self._lock.release()
+
+    def peek(self):
+        """
+        The model being served when get() would return it without touching
+        the file (loaded, and checked within check_interval), else None.
+        Never does I/O, so it is safe to call on an event loop.
+        """
+        current = self._current
+        if current is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return current
+        return None
+
+    def reload(self):
+        """Drop the cached model and load it again from disk"""
+        with self._lock:
+            self._current = None
+            self._checked_at = 0.0
+        return self.get()
+
+    @property
+    def version(self):
+        return self.get().version
+
+    def _load(self, path, key, previous):
+        if key is None:
+            return LoadedModel(model=None, version=FALLBACK_VERSION, path=path)
+        try:
+            model = _load_file(path)
+            version = file_version(path)
+        except Exception:
+            logger.exception('Failed to load prediction model from %s', path)
+            if previous is not None and previous.model is not None:
+                # Keep serving the last good model; retry when the file changes again
+                return LoadedModel(previous.model, previous.version, path, key, previous.loaded_at)
+            return LoadedModel(model=None, version=FALLBACK_VERSION, path=path, file_key=key)
+        logger.info('Loaded prediction model %s (version %s)', path, version)
+        return LoadedModel(model=model, version=version, path=path, file_key=key)
+
+
+registry = ModelRegistry()
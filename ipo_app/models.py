@@ -21,6 +21,7 @@ class IPO(models.Model):
     nii_subscription = models.DecimalField(max_digits=10, decimal_places=2, default=0)#
     retail_subscription = models.DecimalField(max_digits=10, decimal_places=2, default=0)#
     total_subscription = models.DecimalField(max_digits=10, decimal_places=2, default=0)#
+    gmp = models.DecimalField(max_digits=10, decimal_places=2, default=0, help_text="Grey market premium in Rs")
     
     listing_gains_rs = models.DecimalField(max_digits=10, decimal_places=2,null=True, blank=True)#
     listing_gains_percentage = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, help_text="In percentage")#
@@ -34,6 +35,8 @@ class IPO(models.Model):
     
     predicted_gain = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     prediction_confidence = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    prediction_model_version = models.CharField(max_length=64, blank=True)
+    predicted_at = models.DateTimeField(null=True, blank=True)
     
     STATUS_CHOICES = [
         ('upcoming', 'Upcoming'),
@@ -43,11 +46,22 @@ class IPO(models.Model):
     ]
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='upcoming')
     
+    source_hash = models.CharField(max_length=40, blank=True, editable=False, help_text="Hash of the last ingested report row")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['open_date']
+        constraints = [
+            models.UniqueConstraint(fields=['company_name'], name='unique_ipo_company_name'),
+        ]
+        indexes = [
+            models.Index(fields=['open_date'], name='ipo_open_date_idx'),
+            # advance_statuses updates rows by status and one of the dates; most rows sit in 'listed'
+            models.Index(fields=['status', 'open_date'], name='ipo_status_open_idx'),
+            models.Index(fields=['status', 'close_date'], name='ipo_status_close_idx'),
+            models.Index(fields=['status', 'listing_date'], name='ipo_status_listing_idx'),
+        ]
         # verbose_name = "IPO"
         # verbose_name_plural = "IPOs"
     
@@ -94,8 +108,113 @@ class HistoricalIPO(models.Model):
     listing_gains_rs = models.DecimalField(max_digits=10, decimal_places=2)
     listing_gains_percent = models.DecimalField(max_digits=10, decimal_places=2)
 
+    sector = models.CharField(max_length=100, null=True, blank=True)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True, help_text="In crores")
+    profit = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True, help_text="In crores")
+    pe_ratio = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    source_hash = models.CharField(max_length=40, blank=True, editable=False, help_text="Hash of the last ingested report row")
+
     class Meta:
         ordering = ['-listing_date']
+        constraints = [
+            models.UniqueConstraint(fields=['company_name', 'listing_date'], name='unique_historical_ipo_listing'),
+        ]
+        indexes = [
+            # (listing_date, id) backs the keyset pagination in ipo_past
+            models.Index(fields=['listing_date', 'id'], name='hist_ipo_listing_idx'),
+            models.Index(fields=['issue_type'], name='hist_ipo_issue_type_idx'),
+            models.Index(fields=['listing_gains_percent'], name='hist_ipo_gain_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.company_name} - {self.listing_gains_percent}%"
\ No newline at end of file
+        return f"{self.company_name} - {self.listing_gains_percent}%"
+
+
+class HistoricalIPOStats(models.Model):
+    """
+    Listing-gain and subscription aggregates of HistoricalIPO per (year, sector,
+    issue type), maintained by stats.refresh_historical_stats. 'All' as the
+    sector or issue type is the rollup across that dimension.
+    """
+    year = models.IntegerField()
+    sector = models.CharField(max_length=100)
+    issue_type = models.CharField(max_length=50)
+
+    ipo_count = models.IntegerField(default=0)
+    mean_gain = models.DecimalField(max_digits=10, decimal_places=2, help_text="In percentage")
+    median_gain = models.DecimalField(max_digits=10, decimal_places=2, help_text="In percentage")
+    p90_gain = models.DecimalField(max_digits=10, decimal_places=2, help_text="90th percentile, in percentage")
+    hit_rate = models.DecimalField(max_digits=5, decimal_places=2, help_text="Share of IPOs listing above issue price, in percentage")
+
+    avg_qib_subscription = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    avg_nii_subscription = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    avg_retail_subscription = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    avg_total_subscription = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-year', 'sector', 'issue_type']
+        constraints = [
+            models.UniqueConstraint(fields=['year', 'sector', 'issue_type'], name='unique_historical_ipo_stats_bucket'),
+        ]
+        verbose_name_plural = "historical IPO stats"
+
+    def __str__(self):
+        return f"{self.year} {self.sector} {self.issue_type} ({self.ipo_count} IPOs)"
+
+
+class IngestRun(models.Model):
+    """
+    One run of fetch_ipo_data: its options, outcome, and time and counts per
+    stage (fetch, decode, normalize, upsert, refresh) as ingest.IngestTelemetry
+    records them.
+    """
+    STATUS_CHOICES = [
+        ('running', 'Running'),
+        ('success', 'Success'),
+        ('partial', 'Partial'),  # finished, but some reports or rows failed
+        ('failed', 'Failed'),
+    ]
+
+    command = models.CharField(max_length=50, default='fetch_ipo_data')
+    options = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='running')
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    wall_seconds = models.FloatField(null=True, blank=True)
+
+    rows_created = models.IntegerField(default=0)
+    rows_updated = models.IntegerField(default=0)
+    rows_unchanged = models.IntegerField(default=0)
+    errors = models.IntegerField(default=0)
+    bytes_downloaded = models.BigIntegerField(default=0)
+    queries = models.IntegerField(default=0)
+    stages = models.JSONField(default=dict)
+    error_message = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"{self.command} {self.started_at:%Y-%m-%d %H:%M} ({self.status})"
+
+    def report(self):
+        """The run as a JSON-serializable dict, as written by fetch_ipo_data --report"""
+        return {
+            'id': self.pk,
+            'command': self.command,
+            'options': self.options,
+            'status': self.status,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'wall_seconds': self.wall_seconds,
+            'rows_created': self.rows_created,
+            'rows_updated': self.rows_updated,
+            'rows_unchanged': self.rows_unchanged,
+            'errors': self.errors,
+            'bytes_downloaded': self.bytes_downloaded,
+            'queries': self.queries,
+            'stages': self.stages,
+            'error_message': self.error_message,
+        }
@@ -0,0 +1,29 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class HistoricalCursorPagination(CursorPagination):
+    """Newest rows first by primary key, which is unique and indexed, so a page is one LIMIT query with no COUNT(*)"""
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """
+    Page numbers with a total count by default; ?pagination=cursor (or
+    following a ?cursor= link) switches to HistoricalCursorPagination,
+    which answers with next/previous links and skips the COUNT(*).
+    """
+    cursor_pagination_class = HistoricalCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if request.query_params.get('pagination') == 'cursor' or 'cursor' in request.query_params:
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
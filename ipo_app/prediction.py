@@ -0,0 +1,224 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .arrays import float_columns, rows_to_matrix
+from .dataset_cache import bump_dataset_version
+from .features import FEATURE_FIELDS, IPO_FEATURE_COLUMNS, feature_default
+from .models import IPO
+from .metrics import predict_phase
+from .model_registry import registry
+from .prediction_cache import prediction_cache
+
+
+# Linear fallback used when no trained model is available
+FALLBACK_WEIGHTS = np.array([0.3, 0.2, 0.1, 0.0, 0.0, 0.4, 0.0]) * 2.5
+
+MODEL_CONFIDENCE = 70.0
+FALLBACK_CONFIDENCE = 60.0
+
+
+def feature_row(data):
+    """Build one feature row (list of floats) from a dict-like payload"""
+    return [float(data.get(name, feature_default(name)) or 0) for name in FEATURE_FIELDS]
+
+
+def build_matrix(rows=None, columns=None):
+    """
+    Build an (n, 7) float64 matrix from either a list of feature dicts
+    or a columnar payload {feature_name: [values...]}. Raises ValueError
+    when a value is not a finite number (NaN, infinity, or null in a column).
+    """
+    if columns is not None:
+        lengths = {len(v) for v in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError('All columns must have the same length')
+        n = lengths.pop() if lengths else 0
+        matrix = np.empty((n, len(FEATURE_FIELDS)), dtype=np.float64)
+        for i, name in enumerate(FEATURE_FIELDS):
+            if name in columns:
+                matrix[:, i] = np.asarray(columns[name], dtype=np.float64)
+            else:
+                matrix[:, i] = feature_default(name)
+    else:
+        rows = rows or []
+        matrix = np.empty((len(rows), len(FEATURE_FIELDS)), dtype=np.float64)
+        for i, row in enumerate(rows):
+            matrix[i] = feature_row(row)
+    if not np.isfinite(matrix).all():
+        raise ValueError('Features must be finite numbers')
+    return matrix
+
+
+def predict_matrix(features, model=None):
+    """
+    Score every row of the feature matrix with a single call.
+    Returns (gains, confidence) where gains is a float64 array of length n.
+    """
+    if len(features) == 0:
+        return np.empty(0, dtype=np.float64), (MODEL_CONFIDENCE if model is not None else FALLBACK_CONFIDENCE)
+    if model is not None:
+        gains = np.asarray(model.predict(features), dtype=np.float64)
+        return gains, MODEL_CONFIDENCE
+    return features @ FALLBACK_WEIGHTS, FALLBACK_CONFIDENCE
+
+
+def score_matrix(features):
+    """
+    Score with whichever model the registry is currently serving.
+    Returns (gains, confidence, model_version).
+    """
+    with predict_phase('model_load'):
+        loaded = registry.get()
+    with predict_phase('predict'):
+        gains, confidence = predict_matrix(features, loaded.model)
+    return gains, confidence, loaded.version
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def predict_executor():
+    """
+    The process's pool of IPO_PREDICT_WORKERS threads for model calls made by
+    async views. Bounding it keeps a burst of predictions from taking over
+    the threads the async ORM needs; numpy releases the GIL while it scores.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IPO_PREDICT_WORKERS', 4),
+                    thread_name_prefix='ipo-predict',
+                )
+    return _executor
+
+
+async def ascore_matrix(features):
+    """score_matrix run on the predict executor, so the event loop is never blocked by the model"""
+    loop = asyncio.get_running_loop()
+    # run_in_executor does not carry context variables over, so the request's timings would be lost
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(predict_executor(), context.run, score_matrix, features)
+
+
+async def aloaded_model():
+    """
+    registry.get() for async views: answered from memory when no check is
+    due, otherwise the stat() and any (re)load, which unpickles and hashes
+    the file, run on the predict executor rather than the event loop.
+    """
+    loaded = registry.peek()
+    if loaded is None:
+        loop = asyncio.get_running_loop()
+        loaded = await loop.run_in_executor(predict_executor(), registry.get)
+    return loaded
+
+
+def ipo_feature_matrix(rows):
+    """
+    Build the feature matrix from IPO values in IPO_FEATURE_COLUMNS order: a
+    float array (see ipo_feature_rows) or column tuples such as the output of
+    values_list(*IPO_FEATURE_COLUMNS). Nulls are scored as 0.
+    """
+    width = len(IPO_FEATURE_COLUMNS)
+    matrix = np.empty((len(rows), len(FEATURE_FIELDS)), dtype=np.float64)
+    if isinstance(rows, np.ndarray):
+        matrix[:, :width] = rows
+    else:
+        for i, row in enumerate(rows):
+            matrix[i, :width] = [float(v or 0) for v in row]
+    for i in range(width, len(FEATURE_FIELDS)):
+        matrix[:, i] = feature_default(FEATURE_FIELDS[i])
+    return matrix
+
+
+def ipo_feature_rows(queryset):
+    """(pks, feature matrix) of every IPO in `queryset`, with the features read as floats by the database"""
+    rows = list(queryset.values_list('pk', *float_columns(IPO_FEATURE_COLUMNS)))
+    values = rows_to_matrix(rows, len(IPO_FEATURE_COLUMNS), start=1)
+    return [row[0] for row in rows], ipo_feature_matrix(values)
+
+
+PREDICTION_FIELDS = ['predicted_gain', 'prediction_confidence', 'prediction_model_version', 'predicted_at']
+
+
+def prediction_fields(gain, confidence, model_version, scored_at=None):
+    """Model field values for one prediction, ready for save() or bulk_update()"""
+    return {
+        'predicted_gain': Decimal(str(round(float(gain), 2))),
+        'prediction_confidence': Decimal(str(confidence)),
+        'prediction_model_version': model_version,
+        'predicted_at': scored_at or timezone.now(),
+    }
+
+
+def cleared_prediction_fields():
+    """Model field values for a row that can no longer be scored, so no stale prediction is left on it"""
+    return {name: '' if name == 'prediction_model_version' else None for name in PREDICTION_FIELDS}
+
+
+def predict_listing_gain(ipo):
+    """Predict listing gain for a single IPO (instance or dict of IPO fields), memoized per feature row"""
+    get = ipo.get if isinstance(ipo, dict) else lambda name: getattr(ipo, name, None)
+    features = ipo_feature_matrix([[get(name) for name in IPO_FEATURE_COLUMNS]])
+    with predict_phase('model_load'):
+        loaded = registry.get()
+    cached = prediction_cache.get(features[0], loaded.version)
+    if cached is None:
+        with predict_phase('predict'):
+            gains, confidence = predict_matrix(features, loaded.model)
+        cached = (float(gains[0]), confidence)
+        prediction_cache.set(features[0], loaded.version, cached)
+    gain, confidence = cached
+    return {'predicted_gain': round(gain, 2), 'confidence': confidence, 'model_version': loaded.version}
+
+
+def scorable(values):
+    """An IPO is only scored once subscription numbers are in"""
+    return bool(values.get('qib_subscription'))
+
+
+def stale_ipos(queryset=None):
+    """Scorable IPOs without a prediction, or scored by a different model version"""
+    queryset = IPO.objects.all() if queryset is None else queryset
+    stale = (
+        Q(predicted_gain__isnull=True)
+        | Q(predicted_at__isnull=True)
+        | ~Q(prediction_model_version=registry.version)
+    )
+    return queryset.filter(qib_subscription__gt=0).filter(stale)
+
+
+def rescore_ipos(queryset=None, force=False):
+    """
+    Score every unscored or stale IPO with one matrix prediction and write
+    the results back with a single bulk_update. Returns the number of rows scored.
+    """
+    if force:
+        queryset = (IPO.objects.all() if queryset is None else queryset).filter(qib_subscription__gt=0)
+    else:
+        queryset = stale_ipos(queryset)
+
+    pks, features = ipo_feature_rows(queryset)
+    if not pks:
+        return 0
+
+    gains, confidence, version = score_matrix(features)
+    scored_at = timezone.now()
+    objs = [
+        IPO(pk=pk, **prediction_fields(gain, confidence, version, scored_at))
+        for pk, gain in zip(pks, gains.tolist())
+    ]
+    IPO.objects.bulk_update(objs, PREDICTION_FIELDS)
+    bump_dataset_version()
+    return len(objs)
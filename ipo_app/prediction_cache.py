@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+
+class PredictionCache:
+    """
+    Memoized predictions, keyed on the feature row rounded to `decimals`
+    places plus the model version, so a reloaded model never serves the
+    previous model's results.
+
+    Each process keeps an LRU of up to `size` entries that expire after
+    `ttl` seconds; with `shared` the Django cache backs it, so workers reuse
+    each other's predictions. A size of 0 turns memoization off.
+    """
+
+    def __init__(self, size=None, ttl=None, decimals=None, shared=None):
+        self._size = size
+        self._ttl = ttl
+        self._decimals = decimals
+        self._shared = shared
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self.hits = self.shared_hits = self.misses = self.evictions = 0
+
+    @property
+    def size(self):
+        return self._size if self._size is not None else getattr(settings, 'IPO_PREDICTION_CACHE_SIZE', 10000)
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else getattr(settings, 'IPO_PREDICTION_CACHE_TTL', 3600)
+
+    @property
+    def decimals(self):
+        return self._decimals if self._decimals is not None else getattr(settings, 'IPO_PREDICTION_CACHE_DECIMALS', 2)
+
+    @property
+    def shared(self):
+        return self._shared if self._shared is not None else getattr(settings, 'IPO_PREDICTION_CACHE_SHARED', False)
+
+    def key(self, features, version):
+        quantized = np.round(np.asarray(features, dtype=np.float64), self.decimals) + 0.0  # +0.0 folds -0.0 into 0.0
+        return f'prediction:{version}:{hashlib.sha1(quantized.tobytes()).hexdigest()}'
+
+    def _local_get(self, key, version):
+        now = time.monotonic()
+        with self._lock:
+            if version != self._version:
+                # The model changed: nothing cached locally can be served any more
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+        return None
+
+    def _local_set(self, key, version, value):
+        with self._lock:
+            if version != self._version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _count(self, value):
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.shared_hits += 1
+
+    def get(self, features, version):
+        """The (gain, confidence) stored for this row and model version, or None"""
+        if not self.size:
+            return None
+        key = self.key(features, version)
+        value = self._local_get(key, version)
+        if value is None:
+            value = cache.get(key) if self.shared else None
+            self._count(value)
+            if value is not None:
+                self._local_set(key, version, value)
+        return value
+
+    async def aget(self, features, version):
+        if not self.size:
+            return None
+        key = self.key(features, version)
+        value = self._local_get(key, version)
+        if value is None:
+            value = await cache.aget(key) if self.shared else None
+            self._count(value)
+            if value is not None:
+                self._local_set(key, version, value)
+        return value
+
+    def set(self, features, version, value):
+        if not self.size:
+            return
+        key = self.key(features, version)
+        self._local_set(key, version, value)
+        if self.shared:
+            cache.set(key, value, timeout=self.ttl)
+
+    async def aset(self, features, version, value):
+        if not self.size:
+            return
+        key = self.key(features, version)
+        self._local_set(key, version, value)
+        if self.shared:
+            await cache.aset(key, value, timeout=self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+            self.hits = self.shared_hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size': self.size,
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+            }
+
+
+prediction_cache = PredictionCache()
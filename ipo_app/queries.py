@@ -0,0 +1,97 @@
+from datetime import MAXYEAR, MINYEAR, date
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Q
+
+from .dataset_cache import cached_fragment
+from .models import HistoricalIPOStats
+from .stats import ALL, UNKNOWN
+
+PAST_IPO_COLUMNS = [
+    'id', 'company_id', 'company_name', 'issue_type', 'sector', 'listing_date',
+    'issue_price', 'listing_price', 'listing_gains_rs', 'listing_gains_percent',
+]
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _decimal(value):
+    try:
+        number = Decimal(value) if value not in (None, '') else None
+    except InvalidOperation:
+        return None
+    # NaN and infinities would reach the ORM and fail there
+    return number if number is not None and number.is_finite() else None
+
+
+def filter_historical(queryset, params):
+    """
+    Apply the ipo_past filters from query parameters: year, sector,
+    issue_type, min_gain and max_gain (listing gain %). Unknown or
+    malformed values are ignored; 'All' means no filter.
+    """
+    year = _int(params.get('year'))
+    if year and MINYEAR <= year <= MAXYEAR:
+        queryset = queryset.filter(listing_date__gte=date(year, 1, 1), listing_date__lte=date(year, 12, 31))
+    for name in ('sector', 'issue_type'):
+        value = params.get(name)
+        if value == UNKNOWN:
+            # The rows stats.py buckets as 'Unknown': no value at all, or the literal string
+            queryset = queryset.filter(Q(**{f'{name}__isnull': True}) | Q(**{f'{name}__in': ['', UNKNOWN]}))
+        elif value and value != ALL:
+            queryset = queryset.filter(**{name: value})
+    min_gain = _decimal(params.get('min_gain'))
+    if min_gain is not None:
+        queryset = queryset.filter(listing_gains_percent__gte=min_gain)
+    max_gain = _decimal(params.get('max_gain'))
+    if max_gain is not None:
+        queryset = queryset.filter(listing_gains_percent__lte=max_gain)
+    return queryset
+
+
+def encode_cursor(obj):
+    return f'{obj.listing_date.isoformat()}_{obj.pk}'
+
+
+def decode_cursor(cursor):
+    try:
+        listing_date, pk = cursor.split('_', 1)
+        return date.fromisoformat(listing_date), int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+def keyset_page(queryset, cursor=None, page_size=50):
+    """
+    One page of historical IPOs, newest listing first, continuing after
+    `cursor` (from encode_cursor). Seeks on (listing_date, id) instead of
+    OFFSET, so deep pages cost the same as the first.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    queryset = queryset.exclude(listing_date__isnull=True).order_by('-listing_date', '-id')
+    position = decode_cursor(cursor) if cursor else None
+    if position:
+        listing_date, pk = position
+        queryset = queryset.filter(Q(listing_date__lt=listing_date) | Q(listing_date=listing_date, id__lt=pk))
+    rows = list(queryset[:page_size + 1])
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+def historical_years():
+    """Listing years, newest first, read from the per-year rollups in HistoricalIPOStats"""
+    def compute():
+        return list(
+            HistoricalIPOStats.objects
+            .filter(sector=ALL, issue_type=ALL)
+            .order_by('-year')
+            .values_list('year', flat=True)
+        )
+    return cached_fragment('historical_ipo_years', compute)
@@ -0,0 +1,57 @@
+import hashlib
+import json
+import os
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def content_hash(body):
+    return hashlib.sha256(body).hexdigest()
+
+
+class ReportCache:
+    """
+    On-disk cache of raw report responses, one JSON entry per report URL,
+    holding the validators (ETag / Last-Modified), a hash of the payload and
+    the payload itself. Entries for years that closed long ago are marked
+    immutable and are never requested again unless forced.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = os.fspath(directory or settings.IPO_REPORT_CACHE_DIR)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, url):
+        try:
+            with open(self._path(url), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, entry):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(url)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(dict(entry, url=url, stored_at=timezone.now().isoformat()), f)
+        os.replace(tmp, path)
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+
+def year_is_closed(year, today=None, after_days=None):
+    """A report year is immutable once it ended more than `after_days` ago"""
+    if after_days is None:
+        after_days = getattr(settings, 'IPO_REPORT_IMMUTABLE_AFTER_DAYS', 90)
+    today = today or date.today()
+    return date(year, 12, 31) + timedelta(days=after_days) < today
@@ -0,0 +1,143 @@
+import re
+import threading
+import time
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlsplit
+
+import lxml.html
+from django.conf import settings
+
+from .sectors import classify_sector
+
+DEFAULT_WEB_BASE = 'https://www.chittorgarh.com'
+
+KPI_TABLE_CLASS = 'table table-bordered table-striped table-hover w-auto'
+PE_LABEL = re.compile(r'\bp/?e\b')
+
+
+def web_base():
+    return getattr(settings, 'CHITTORGARH_WEB_BASE', DEFAULT_WEB_BASE).rstrip('/')
+
+
+def company_page_url(company_url_name, company_id):
+    return f"{web_base()}/ipo/{company_url_name}/{company_id}/"
+
+
+def clean_number(text):
+    """Remove commas and convert to Decimal"""
+    if not text:
+        return None
+    try:
+        value = Decimal(text.strip().replace(',', ''))
+    except InvalidOperation:
+        return None
+    return value if value.is_finite() else None
+
+
+def _text(element):
+    # Same result as BeautifulSoup's get_text(strip=True)
+    return ''.join(s.strip() for s in element.itertext())
+
+
+def parse_company_page(html):
+    """
+    Extract financial data, KPIs and sector from an IPO company page.
+
+    Uses lxml and XPath to jump straight to financialTable, the KPI tables and
+    about-company-section instead of walking the whole tree with find_all.
+    """
+    result = {
+        'financial_data': {},
+        'kpis': {},
+        'sector': 'Unknown',
+    }
+    if not html:
+        return result
+    doc = lxml.html.fromstring(html)
+
+    # 1. Financial data (Assets, Profit, Total Income for all periods)
+    for table in doc.xpath('//table[@id="financialTable"][1]'):
+        rows = table.xpath('.//tr')
+        if not rows:
+            break
+        periods = [_text(td) for td in rows[0].xpath('./td')[1:]]  # Skip first column (label)
+        for period in periods:
+            result['financial_data'][period] = {}
+        for row in rows[1:]:
+            cells = row.xpath('./td')
+            if len(cells) > 1:
+                label = _text(cells[0])
+                for i, period in enumerate(periods):
+                    if i + 1 < len(cells):
+                        result['financial_data'][period][label] = clean_number(_text(cells[i + 1]))
+
+    # 2. Key performance indicators
+    for row in doc.xpath(f'//table[@class="{KPI_TABLE_CLASS}"]//tr'):
+        cells = row.xpath('./td|./th')
+        if len(cells) >= 2:
+            label = _text(cells[0])
+            value_text = _text(cells[1])
+            value = clean_number(value_text)
+            result['kpis'][label] = value_text if value is None else value
+
+    # 3. Sector from the "About Company" section
+    paragraphs = doc.xpath('//div[@id="about-company-section"]//p')
+    if paragraphs:
+        result['sector'] = classify_sector(' '.join(_text(p) for p in paragraphs))
+
+    return result
+
+
+def company_fields(data):
+    """
+    Map parsed page data onto the revenue/profit/pe_ratio/sector model fields,
+    using the latest reported period.
+    """
+    fields = {'sector': data['sector'], 'revenue': None, 'profit': None, 'pe_ratio': None}
+    cents = Decimal('0.01')
+    if data['financial_data']:
+        latest = next(iter(data['financial_data'].values()))
+        for label, value in latest.items():
+            label = label.lower()
+            if value is None:
+                continue
+            if fields['revenue'] is None and ('total income' in label or 'revenue' in label):
+                fields['revenue'] = value.quantize(cents)
+            elif fields['profit'] is None and 'profit after tax' in label:
+                fields['profit'] = value.quantize(cents)
+    for label, value in data['kpis'].items():
+        if isinstance(value, Decimal) and PE_LABEL.search(label.lower()):
+            fields['pe_ratio'] = value.quantize(cents)
+            break
+    return fields
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to each host so that no host sees more than
+    `rate` requests per second, however many workers are running.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self._lock = threading.Lock()
+        self._next = {}
+
+    def wait(self, url):
+        if not self.interval:
+            return
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def scrape_company(session, limiter, url, timeout=30):
+    """Fetch and parse one company page; runs on a worker thread"""
+    limiter.wait(url)
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return company_fields(parse_company_page(response.content))
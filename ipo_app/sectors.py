@@ -0,0 +1,132 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+# Sector keywords mapping. Words match whole, so plural forms are listed where they occur; generic
+# words that read as something else in company blurbs ('it', 'network') are only matched in phrases.
+SECTOR_KEYWORDS = {
+    'Mining': ['mining', 'granite', 'stone', 'stones', 'ores', 'natural resources', 'minerals', 'quarry', 'quarries', 'excavation'],
+    'Technology': [
+        'software', 'it services', 'it solutions', 'information technology', 'technology', 'technologies', 'digital',
+        'tech', 'saas', 'cloud computing',
+    ],
+    'Pharmaceuticals': [
+        'pharmaceutical', 'pharmaceuticals', 'biotech', 'laboratory', 'laboratories', 'clinical', 'drug', 'drugs',
+        'medicine', 'medicines', 'healthcare',
+    ],
+    'Finance': ['bank', 'banks', 'banking', 'finance', 'nbfc', 'financial services', 'investment', 'investments', 'lending', 'credit'],
+    'Infrastructure': ['construction', 'infrastructure', 'real estate', 'builder', 'builders', 'housing', 'property', 'properties'],
+    'Energy': ['energy', 'power', 'electricity', 'solar', 'renewable', 'oil', 'gas', 'coal'],
+    'Consumer Goods': ['fmcg', 'consumer goods', 'consumer products', 'retail', 'e-commerce'],
+    'Automobiles': ['automobile', 'automobiles', 'auto', 'vehicle', 'vehicles', 'car', 'cars', 'bike', 'bikes', 'automotive'],
+    'Chemical': ['chemical', 'chemicals', 'fertilizer', 'fertilizers', 'agrochemical', 'agrochemicals', 'pesticide', 'pesticides'],
+    'Telecom': ['telecom', 'telecommunication', 'telecommunications', 'mobile', 'telecom network', 'network services', 'networking'],
+    'Media': ['media', 'entertainment', 'broadcasting', 'film', 'films', 'content'],
+    'Manufacturing': ['manufacturing', 'production', 'factory', 'factories', 'industrial'],
+    'Textiles': ['textile', 'textiles', 'apparel', 'garment', 'garments', 'fabric', 'fabrics', 'clothing'],
+    'Education': ['education', 'training', 'learning', 'institute', 'institutes', 'school', 'schools', 'college', 'colleges'],
+    'Logistics': ['logistics', 'transportation', 'shipping', 'supply chain', 'courier', 'couriers'],
+}
+
+
+def _trie_pattern(words):
+    """
+    Regex alternation factored into a prefix trie ('tech(?:nolog(?:ies|y))?|...'),
+    so the regex engine branches on each character instead of trying every
+    keyword in turn at every position. Longer matches are preferred.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        alternatives = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class SectorClassifier:
+    """
+    Keyword sector classifier compiled once into a single word-boundary regex
+    (a trie-factored alternation of every keyword).
+
+    One pass over the text finds every keyword as a whole word (longest
+    alternative first), so keywords like 'car' no longer hit inside words such
+    as 'scarce'; plurals match only when SECTOR_KEYWORDS lists them. A sector
+    scores one point per distinct keyword found, as before; ties go to the
+    sector listed first.
+    Results are cached by a hash of the text.
+    """
+
+    def __init__(self, sector_keywords=SECTOR_KEYWORDS, cache_size=16384):
+        self.sectors = list(sector_keywords)
+        self.keyword_sectors = {}
+        for index, keywords in enumerate(sector_keywords.values()):
+            for keyword in keywords:
+                self.keyword_sectors.setdefault(keyword, set()).add(index)
+
+        keywords = list(self.keyword_sectors)
+        self.pattern = re.compile(r'\b(' + _trie_pattern(keywords) + r')\b')
+        # A longer phrase also counts the keywords it contains, e.g. 'telecom network' -> 'telecom'
+        self.implied = {
+            keyword: [k for k in keywords if re.search(r'\b' + re.escape(k) + r'\b', keyword)]
+            for keyword in keywords
+        }
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def scores(self, text):
+        """Sector -> number of distinct keywords found in the text"""
+        found = set()
+        for keyword in self.pattern.findall(text.lower()):
+            found.update(self.implied[keyword])
+        counts = [0] * len(self.sectors)
+        for keyword in found:
+            for index in self.keyword_sectors[keyword]:
+                counts[index] += 1
+        return {self.sectors[i]: c for i, c in enumerate(counts) if c}
+
+    def classify(self, text):
+        if not text:
+            return 'Unknown'
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        scores = self.scores(text)
+        sector = max(scores, key=scores.get) if scores else 'Unknown'
+
+        with self._lock:
+            self._cache[key] = sector
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return sector
+
+    def classify_many(self, texts):
+        """Classify a batch of descriptions; repeated texts are scored once"""
+        results = {}
+        return [results[text] if text in results else results.setdefault(text, self.classify(text)) for text in texts]
+
+
+classifier = SectorClassifier()
+
+
+def classify_sector(text):
+    """Classify sector based on keyword matching"""
+    return classifier.classify(text)
+
+
+def classify_sectors(texts):
+    return classifier.classify_many(texts)
@@ -1,19 +1,50 @@
 from rest_framework import serializers
-from .models import IPO, SimilarIPO, HistoricalIPO
+from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
+from .models import IPO, SimilarIPO, HistoricalIPO, HistoricalIPOStats
+
+def requested_fields(request):
+    """Field names from a ?fields=a,b,c query parameter, or None for all fields"""
+    if request is None or request.method != 'GET':
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return {name.strip() for name in fields.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    """Drop every field not listed in ?fields= (GET requests only)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = requested_fields(self.context.get('request'))
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+
 
 class SimilarIPOSerializer(serializers.ModelSerializer):
     class Meta:
         model = SimilarIPO
         fields = '__all__'
 
-class IPOSerializer(serializers.ModelSerializer):
+class IPOSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     similar_ipos = SimilarIPOSerializer(many=True, read_only=True)
 
     class Meta:
         model = IPO
         fields = '__all__'
+        read_only_fields = ['prediction_model_version', 'predicted_at']
+        # DRF 3.14 does not derive validators from Meta.constraints, so duplicates would reach the database
+        extra_kwargs = {'company_name': {'validators': [UniqueValidator(queryset=IPO.objects.all())]}}
 
 class HistoricalIPOSerializer(serializers.ModelSerializer):
     class Meta:
         model = HistoricalIPO
         fields = '__all__'
+        validators = [UniqueTogetherValidator(queryset=HistoricalIPO.objects.all(), fields=['company_name', 'listing_date'])]
+
+class HistoricalIPOStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = HistoricalIPOStats
+        exclude = ['id']
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .dataset_cache import bump_dataset_version
+from .models import IPO, HistoricalIPO, SimilarIPO
+
+
+# Single-row saves (admin, API, shell). Bulk writes don't send signals, so
+# fetch_ipo_data, rescore_ipos, enrich_ipos and compute_similar_ipos bump the version themselves.
+@receiver(post_save, sender=IPO)
+@receiver(post_save, sender=HistoricalIPO)
+@receiver(post_save, sender=SimilarIPO)
+@receiver(post_delete, sender=IPO)
+@receiver(post_delete, sender=HistoricalIPO)
+@receiver(post_delete, sender=SimilarIPO)
+def dataset_changed(sender, **kwargs):
+    bump_dataset_version()
@@ -0,0 +1,299 @@
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Max, Q, Sum
+from django.db.models.functions import Cast, Length
+
+from .arrays import float_columns, rows_to_matrix
+from .dataset_cache import bump_dataset_version
+from .models import IPO, HistoricalIPO, SimilarIPO
+from .sectors import SECTOR_KEYWORDS
+
+try:
+    from sklearn.neighbors import KDTree
+except ImportError:  # scikit-learn is optional; brute force works at any size
+    KDTree = None
+
+NUMERIC_FEATURES = ['qib_subscription', 'nii_subscription', 'retail_subscription', 'issue_size', 'issue_price']
+SECTORS = list(SECTOR_KEYWORDS) + ['Unknown']
+SECTOR_WEIGHT = 1.0
+
+# Brute force (one matrix product per query batch) wins on small histories; past a few
+# thousand rows a KD-tree answers batches faster (see benchmarks/bench_similarity.py)
+KD_TREE_MIN_ROWS = 5000
+# Re-fit the normalisation once the history has grown this much since the last full build
+REFIT_GROWTH = 0.25
+
+DEFAULT_TOP_K = 3
+
+
+class SimilarityEngine:
+    """
+    k-nearest-neighbour search over HistoricalIPO.
+
+    Each row becomes a vector of z-scored log1p(subscription, issue size,
+    issue price) plus a one-hot sector block. The matrix is kept in memory
+    and saved under IPO_SIMILARITY_CACHE_DIR, so the next process starts from
+    it. It is extended in place when new history arrives, and fully rebuilt
+    when rows already indexed were edited or removed, or the history has
+    grown enough to shift the normalisation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ids = np.empty(0, dtype=np.int64)
+        self.matrix = np.empty((0, len(NUMERIC_FEATURES) + len(SECTORS)))
+        self.raw = np.empty((0, len(NUMERIC_FEATURES)))
+        self.gains = np.empty(0)
+        self.names = []
+        self.sectors = []
+        self.mean = np.zeros(len(NUMERIC_FEATURES))
+        self.std = np.ones(len(NUMERIC_FEATURES))
+        self.fitted_rows = 0
+        self.fingerprint = None
+        self._norms = np.empty(0)
+        self._tree = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def transform(self, numeric, sectors):
+        """Normalised feature matrix for raw numeric rows and their sectors"""
+        logged = np.log1p(np.clip(numeric, 0, None))
+        onehot = np.zeros((len(sectors), len(SECTORS)))
+        for i, sector in enumerate(sectors):
+            if sector in SECTORS:
+                onehot[i, SECTORS.index(sector)] = SECTOR_WEIGHT
+        return np.hstack([(logged - self.mean) / self.std, onehot])
+
+    def fit(self, ids, numeric, sectors, gains, names):
+        logged = np.log1p(np.clip(numeric, 0, None))
+        self.mean = logged.mean(axis=0) if len(logged) else np.zeros(len(NUMERIC_FEATURES))
+        std = logged.std(axis=0) if len(logged) else np.ones(len(NUMERIC_FEATURES))
+        self.std = np.where(std > 0, std, 1.0)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.raw = numeric
+        self.gains = np.asarray(gains, dtype=np.float64)
+        self.names = list(names)
+        self.sectors = list(sectors)
+        self.matrix = self.transform(numeric, sectors)
+        self.fitted_rows = len(ids)
+        self.fingerprint = None
+        self._reindex()
+
+    def append(self, ids, numeric, sectors, gains, names):
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self.raw = np.vstack([self.raw, numeric])
+        self.gains = np.concatenate([self.gains, np.asarray(gains, dtype=np.float64)])
+        self.names += list(names)
+        self.sectors += list(sectors)
+        self.matrix = np.vstack([self.matrix, self.transform(numeric, sectors)])
+        self.fingerprint = None
+        self._reindex()
+
+    def _reindex(self):
+        self._norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+        self._tree = KDTree(self.matrix) if KDTree is not None and len(self.matrix) >= KD_TREE_MIN_ROWS else None
+
+    def query(self, numeric, sectors, k=DEFAULT_TOP_K):
+        """
+        Top-k neighbours for each query row.
+        Returns (indices, distances), both shaped (n_queries, k), nearest first.
+        """
+        k = min(k, len(self.ids))
+        points = self.transform(numeric, sectors)
+        if k == 0 or len(points) == 0:
+            return np.empty((len(points), 0), dtype=np.int64), np.empty((len(points), 0))
+        if self._tree is not None:
+            distances, indices = self._tree.query(points, k=k)
+            return indices, distances
+
+        # ||a - b||^2 = ||a||^2 - 2ab + ||b||^2, for every pair in one matrix product
+        squared = np.einsum('ij,ij->i', points, points)[:, None] - 2 * points @ self.matrix.T + self._norms[None, :]
+        np.maximum(squared, 0, out=squared)
+        indices = np.argpartition(squared, k - 1, axis=1)[:, :k]
+        rows = np.arange(len(points))[:, None]
+        order = np.argsort(squared[rows, indices], axis=1)
+        indices = indices[rows, order]
+        return indices, np.sqrt(squared[rows, indices])
+
+    def _load(self, queryset):
+        rows = list(queryset.order_by('id').values_list(
+            'id', 'company_name', 'sector', *float_columns(['listing_gains_percent'] + NUMERIC_FEATURES),
+        ))
+        ids = [row[0] for row in rows]
+        names = [row[1] for row in rows]
+        sectors = [row[2] or 'Unknown' for row in rows]
+        values = rows_to_matrix(rows, 1 + len(NUMERIC_FEATURES), start=3)
+        return ids, values[:, 1:], sectors, values[:, 0], names
+
+    @property
+    def cache_path(self):
+        cache_dir = getattr(settings, 'IPO_SIMILARITY_CACHE_DIR', None)
+        return os.path.join(os.fspath(cache_dir), 'engine.npz') if cache_dir else None
+
+    def save(self):
+        """Write the fitted matrix and its fingerprint to cache_path"""
+        path = self.cache_path
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(
+            tmp, ids=self.ids, matrix=self.matrix, raw=self.raw, gains=self.gains,
+            names=np.array(self.names, dtype=str), sectors=np.array(self.sectors, dtype=str),
+            mean=self.mean, std=self.std, fitted_rows=self.fitted_rows, fingerprint=self.fingerprint,
+        )
+        os.replace(tmp, path)
+
+    def restore(self):
+        """Load what save() wrote, if it is there and readable; returns whether it was"""
+        path = self.cache_path
+        if path is None or not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                ids, matrix, raw, gains = data['ids'], data['matrix'], data['raw'], data['gains']
+                names, sectors = data['names'].tolist(), data['sectors'].tolist()
+                mean, std, fitted_rows, fingerprint = data['mean'], data['std'], int(data['fitted_rows']), str(data['fingerprint'])
+        except (OSError, ValueError, KeyError):
+            return False
+        if matrix.shape[1:] != self.matrix.shape[1:]:
+            return False  # written with other features or sectors
+        self.ids, self.matrix, self.raw, self.gains = ids, matrix, raw, gains
+        self.names, self.sectors = names, sectors
+        self.mean, self.std, self.fitted_rows, self.fingerprint = mean, std, fitted_rows, fingerprint
+        self._reindex()
+        return True
+
+    def build(self):
+        with self._lock:
+            self.fit(*self._load(HistoricalIPO.objects.all()))
+            self.fingerprint = _fingerprint(HistoricalIPO.objects.filter(id__lte=self._last_id()))
+            self.save()
+        return len(self)
+
+    def _last_id(self):
+        return int(self.ids.max()) if len(self.ids) else 0
+
+    def refresh(self):
+        """
+        Bring the matrix up to date with HistoricalIPO, starting from the saved
+        one when this process has none yet: read only the rows ingested since,
+        or rebuild if an indexed row was edited in place (its features, sector,
+        gain or name) or removed, or the history has grown past REFIT_GROWTH.
+        Edits are found by an aggregate fingerprint of the indexed rows.
+        """
+        with self._lock:
+            if not len(self.ids):
+                self.restore()
+            last_id = self._last_id()
+            indexed = HistoricalIPO.objects.filter(id__lte=last_id)
+            unchanged = len(self.ids) and _fingerprint(indexed) == self.fingerprint
+            new = HistoricalIPO.objects.filter(id__gt=last_id)
+            new_count = new.count() if unchanged else 0
+            if not unchanged or len(self.ids) + new_count > self.fitted_rows * (1 + REFIT_GROWTH):
+                self.fit(*self._load(HistoricalIPO.objects.all()))
+            elif new_count:
+                self.append(*self._load(new))
+            else:
+                return len(self)
+            self.fingerprint = _fingerprint(HistoricalIPO.objects.filter(id__lte=self._last_id()))
+            self.save()
+        return len(self)
+
+
+def _weighted_sum(expression):
+    return Sum(expression * F('id'), output_field=FloatField())
+
+
+def _fingerprint(queryset):
+    """
+    Digest of the rows in `queryset` from one aggregate query, as in
+    training.data_hash: row count, highest id, and per column a plain and an
+    id-weighted sum, so a value edited or moved between rows changes it.
+    Sectors are summed per sector and names by length; the engine's layout is
+    included so a change to the features or sectors refits.
+    """
+    aggregates = {
+        'rows': Count('id'), 'max_id': Max('id'),
+        'names': _weighted_sum(Length('company_name')), 'sectors': _weighted_sum(Length('sector')),
+    }
+    for column in NUMERIC_FEATURES + ['listing_gains_percent']:
+        aggregates[f'sum_{column}'] = Sum(Cast(column, FloatField()))
+        aggregates[f'wsum_{column}'] = _weighted_sum(Cast(column, FloatField()))
+    for i, sector in enumerate(SECTORS[:-1]):
+        aggregates[f'sector_{i}'] = Sum('id', filter=Q(sector=sector))
+    summary = queryset.aggregate(**aggregates)
+    payload = json.dumps({'layout': [NUMERIC_FEATURES, SECTORS, SECTOR_WEIGHT], **summary}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+engine = SimilarityEngine()
+
+
+def _score(distance):
+    # 100 for an identical profile, falling towards 0 with distance
+    return round(100.0 / (1.0 + float(distance)), 2)
+
+
+def _own_history(rows):
+    """HistoricalIPO ids each IPO was promoted to (same company name and listing date), keyed by IPO id"""
+    keys = {(name, listed): ipo_id for ipo_id, _, name, listed, *_ in rows if listed}
+    own = {}
+    if keys:
+        history = HistoricalIPO.objects.filter(company_name__in={name for name, _ in keys})
+        for historical_id, name, listed in history.values_list('id', 'company_name', 'listing_date'):
+            if (name, listed) in keys:
+                own.setdefault(keys[name, listed], set()).add(historical_id)
+    return own
+
+
+def compute_similar_ipos(queryset=None, k=DEFAULT_TOP_K):
+    """
+    Store the top-k most similar historical IPOs for every IPO in `queryset`,
+    replacing what was there. An IPO's own historical record (once it has
+    listed and been promoted) is never one of its matches. One k-NN query for
+    the whole batch, one delete and one bulk_create. Returns the number of
+    SimilarIPO rows written.
+    """
+    engine.refresh()
+    queryset = IPO.objects.all() if queryset is None else queryset
+    rows = list(queryset.values_list('id', 'sector', 'company_name', 'listing_date', *float_columns(NUMERIC_FEATURES)))
+    if not rows or not len(engine):
+        return 0
+
+    own = _own_history(rows)
+    numeric = rows_to_matrix(rows, len(NUMERIC_FEATURES), start=4)
+    # Ask for enough extra neighbours to still have k once own records are dropped
+    extra = max((len(ids) for ids in own.values()), default=0)
+    indices, distances = engine.query(numeric, [row[1] or 'Unknown' for row in rows], k + extra)
+    similar = []
+    for (ipo_id, *_), neighbours, dists in zip(rows, indices, distances):
+        exclude = own.get(ipo_id, ())
+        kept = [(index, distance) for index, distance in zip(neighbours, dists) if engine.ids[index] not in exclude]
+        for index, distance in kept[:k]:
+            qib, nii, retail, issue_size, _ = engine.raw[index]
+            similar.append(SimilarIPO(
+                ipo_id=ipo_id,
+                similar_ipo_name=engine.names[index],
+                similarity_score=_score(distance),
+                similar_qib=round(qib, 2),
+                similar_hni=round(nii, 2),
+                similar_retail=round(retail, 2),
+                similar_issue_size=round(issue_size, 2),
+                similar_gmp=0,
+                similar_listing_gains_percentage=round(engine.gains[index], 2),
+                similar_sector=engine.sectors[index],
+            ))
+
+    with transaction.atomic():
+        SimilarIPO.objects.filter(ipo_id__in=[row[0] for row in rows]).delete()
+        SimilarIPO.objects.bulk_create(similar, batch_size=500)
+    bump_dataset_version()
+    return len(similar)
@@ -0,0 +1,78 @@
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from .arrays import float_columns, rows_to_matrix
+from .dataset_cache import bump_dataset_version
+from .models import HistoricalIPO, HistoricalIPOStats
+
+ALL = 'All'
+UNKNOWN = 'Unknown'
+SUBSCRIPTION_FIELDS = ['qib_subscription', 'nii_subscription', 'retail_subscription', 'total_subscription']
+
+
+def _in_years(years):
+    # listing_date__year compiles to a BETWEEN range, so each year can use the listing_date index
+    condition = Q()
+    for year in years:
+        condition |= Q(listing_date__year=year)
+    return condition
+
+
+def bucket_fields(values):
+    """
+    Aggregate fields for one bucket. `values` is a float matrix whose first
+    column is the listing gain % and the rest follow SUBSCRIPTION_FIELDS.
+    """
+    gains = values[:, 0]
+    averages = values[:, 1:].mean(axis=0)
+    fields = {
+        'ipo_count': len(gains),
+        'mean_gain': round(float(gains.mean()), 2),
+        'median_gain': round(float(np.median(gains)), 2),
+        'p90_gain': round(float(np.percentile(gains, 90)), 2),
+        'hit_rate': round(float((gains > 0).mean() * 100), 2),
+    }
+    for name, average in zip(SUBSCRIPTION_FIELDS, averages.tolist()):
+        fields[f'avg_{name}'] = round(average, 2)
+    return fields
+
+
+def refresh_historical_stats(years=None):
+    """
+    Rebuild the HistoricalIPOStats buckets of the given listing years (every
+    year if None) from one read of their HistoricalIPO rows. A year is
+    recomputed as a whole, so rows that moved between sectors or issue types
+    leave no stale bucket behind. Returns the number of buckets written.
+    """
+    queryset = HistoricalIPO.objects.exclude(listing_date__isnull=True)
+    stale = HistoricalIPOStats.objects.all()
+    if years is not None:
+        years = sorted(set(years))
+        if not years:
+            return 0
+        queryset = queryset.filter(_in_years(years))
+        stale = stale.filter(year__in=years)
+
+    rows = list(queryset.values_list(
+        'listing_date', 'sector', 'issue_type', *float_columns(['listing_gains_percent'] + SUBSCRIPTION_FIELDS),
+    ))
+    values = rows_to_matrix(rows, 1 + len(SUBSCRIPTION_FIELDS), start=3)
+
+    buckets = defaultdict(list)
+    for i, (listing_date, sector, issue_type, *_) in enumerate(rows):
+        for bucket_sector in (sector or UNKNOWN, ALL):
+            for bucket_type in (issue_type or UNKNOWN, ALL):
+                buckets[(listing_date.year, bucket_sector, bucket_type)].append(i)
+
+    stats = [
+        HistoricalIPOStats(year=year, sector=sector, issue_type=issue_type, **bucket_fields(values[indices]))
+        for (year, sector, issue_type), indices in buckets.items()
+    ]
+    with transaction.atomic():
+        stale.delete()
+        HistoricalIPOStats.objects.bulk_create(stats, batch_size=500)
+    bump_dataset_version()
+    return len(stats)
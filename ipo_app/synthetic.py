@@ -0,0 +1,162 @@
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .dataset_cache import bump_dataset_version
+from .lifecycle import advance_statuses
+from .models import IPO, HistoricalIPO
+from .prediction import rescore_ipos
+from .sectors import SECTOR_KEYWORDS
+from .similarity import compute_similar_ipos
+from .stats import refresh_historical_stats
+
+NAME_PREFIX = 'Synthetic'
+# Generated rows take company_ids from a reserved ten-digit range (still numbers, for the
+# /ipo/<id>/ URLs). A row is only treated as synthetic with both an id in the range and the
+# name prefix, so clearing never touches a real company called 'Synthetic ...'.
+IPO_ID_START = 9_900_000_000
+HISTORICAL_ID_START = 9_950_000_000
+ID_PATTERN = r'^99[0-9]{8}$'
+SECTORS = list(SECTOR_KEYWORDS)
+SME_SHARE = 0.45
+# (mean, sigma) of the log of each value, per issue type
+ISSUE_PRICE = {'Mainline': (5.5, 0.7), 'SME': (4.3, 0.5)}
+ISSUE_SIZE = {'Mainline': (6.3, 1.0), 'SME': (3.3, 0.6)}
+SUBSCRIPTION = {'qib': (2.3, 1.4), 'nii': (2.5, 1.6), 'retail': (2.0, 1.2)}
+
+
+def _money(values, limit=9_999_999):
+    return np.round(np.clip(values, 0.01, limit), 2)
+
+
+def issue_profiles(n, rng):
+    """
+    Columns shared by IPO and HistoricalIPO for n issues: SME and Mainline
+    issues with lognormal prices, sizes and subscriptions, and a listing gain
+    that rises with QIB and retail demand, with noise and a fat right tail.
+    """
+    issue_type = np.where(rng.random(n) < SME_SHARE, 'SME', 'Mainline')
+    sme = issue_type == 'SME'
+
+    def lognormal(params):
+        values = rng.lognormal(params['Mainline'][0], params['Mainline'][1], n)
+        values[sme] = rng.lognormal(params['SME'][0], params['SME'][1], int(sme.sum()))
+        return values
+
+    price = _money(lognormal(ISSUE_PRICE), 99_999)
+    size = _money(lognormal(ISSUE_SIZE), 99_999)
+    qib, nii, retail = (_money(rng.lognormal(mu, sigma, n), 9_999) for mu, sigma in SUBSCRIPTION.values())
+    total = np.round(0.5 * qib + 0.15 * nii + 0.35 * retail, 2)
+    gain = -8 + 5 * np.log1p(qib) + 3 * np.log1p(retail) + rng.normal(0, 12, n) + rng.exponential(6, n)
+    gain = np.round(np.clip(gain, -60, 300), 2)
+    listing_price = _money(price * (1 + gain / 100), 99_999)
+    revenue = _money(size * rng.lognormal(0.3, 0.8, n))
+    profit = np.round(revenue * rng.normal(0.08, 0.07, n), 2)
+    return {
+        'issue_type': issue_type.tolist(),
+        'sector': rng.choice(SECTORS, n).tolist(),
+        'issue_price': price.tolist(),
+        'issue_size': size.tolist(),
+        'qib_subscription': qib.tolist(),
+        'nii_subscription': nii.tolist(),
+        'retail_subscription': retail.tolist(),
+        'total_subscription': total.tolist(),
+        'listing_price': listing_price.tolist(),
+        'listing_gains_rs': np.round(listing_price - price, 2).tolist(),
+        'listing_gains_percent': np.round((listing_price - price) / price * 100, 2).tolist(),
+        'revenue': revenue.tolist(),
+        'profit': profit.tolist(),
+        'pe_ratio': np.round(np.clip(rng.lognormal(3.2, 0.5, n), 1, 999), 2).tolist(),
+    }
+
+
+def synthetic_historical(n, rng, years=10, today=None):
+    """n HistoricalIPO instances listed evenly over the last `years` years"""
+    today = today or timezone.localdate()
+    profiles = issue_profiles(n, rng)
+    listed = rng.integers(1, 365 * years, n)
+    return [
+        HistoricalIPO(
+            company_id=str(HISTORICAL_ID_START + i),
+            company_name=f'{NAME_PREFIX} {profiles["sector"][i]} {i}',
+            comapny_url_name=f'synthetic-{i}-ipo',
+            open_date=today - timedelta(days=int(listed[i]) + 6),
+            listing_date=today - timedelta(days=int(listed[i])),
+            **{name: values[i] for name, values in profiles.items()},
+        )
+        for i in range(n)
+    ]
+
+
+def synthetic_ipos(n, rng, today=None):
+    """
+    n IPO instances opening between 120 days ago and 30 days ahead, so once
+    advance_statuses has run they are a mix of listed, closed, open and
+    upcoming. Only listed ones have a listing price.
+    """
+    today = today or timezone.localdate()
+    profiles = issue_profiles(n, rng)
+    gains_percent = profiles.pop('listing_gains_percent')
+    opened = rng.integers(-120, 31, n)
+    gmp = np.round(np.array(profiles['issue_price']) * rng.normal(0.12, 0.15, n), 2).tolist()
+    ipos = []
+    for i in range(n):
+        open_date = today + timedelta(days=int(opened[i]))
+        listing_date = open_date + timedelta(days=6)
+        values = {name: values[i] for name, values in profiles.items()}
+        if listing_date > today:
+            values.update(listing_price=None, listing_gains_rs=None)
+        ipos.append(IPO(
+            company_id=str(IPO_ID_START + i),
+            company_name=f'{NAME_PREFIX} {values["sector"]} IPO {i}',
+            comapny_url_name=f'synthetic-ipo-{i}',
+            open_date=open_date,
+            close_date=open_date + timedelta(days=3),
+            listing_date=listing_date,
+            listing_gains_percentage=gains_percent[i] if listing_date <= today else None,
+            lot_size=max(1, int(15000 // values['issue_price'])),
+            gmp=gmp[i],
+            status='upcoming',
+            **values,
+        ))
+    return ipos
+
+
+def synthetic_rows(model):
+    """The generated rows of `model` (IPO or HistoricalIPO)"""
+    return model.objects.filter(company_id__regex=ID_PATTERN, company_name__startswith=f'{NAME_PREFIX} ')
+
+
+def clear_synthetic():
+    """
+    Delete the generated rows (their SimilarIPO rows go with them) and rebuild
+    the stats of the years they were listed in; real data is left alone.
+    """
+    with transaction.atomic():
+        years = [d.year for d in synthetic_rows(HistoricalIPO).dates('listing_date', 'year')]
+        ipos, _ = synthetic_rows(IPO).delete()
+        historical, _ = synthetic_rows(HistoricalIPO).delete()
+    if years:
+        refresh_historical_stats(years)
+    if ipos or historical:
+        bump_dataset_version()
+    return ipos + historical
+
+
+def generate(ipos=500, historical=5000, k=3, seed=0, years=10):
+    """
+    Write synthetic rows, then run the same passes as an ingest: statuses,
+    stats, predictions and the top-k similar IPOs. Returns the row counts.
+    """
+    rng = np.random.default_rng(seed)
+    with transaction.atomic():
+        HistoricalIPO.objects.bulk_create(synthetic_historical(historical, rng, years), batch_size=1000)
+        IPO.objects.bulk_create(synthetic_ipos(ipos, rng), batch_size=1000)
+    advance_statuses(promote=False)
+    refresh_historical_stats()
+    scored = rescore_ipos()
+    similar = compute_similar_ipos(synthetic_rows(IPO), k=k) if k else 0
+    bump_dataset_version()
+    return {'ipos': ipos, 'historical': historical, 'scored': scored, 'similar': similar}
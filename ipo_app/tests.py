@@ -1,3 +1,1354 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+
+from . import prediction
+from .arrays import float_matrix
+from .db import sqlite_pragmas
+from .lifecycle import advance_statuses
+from .metrics import PREDICT_SECONDS, TEMPLATE_SECONDS, metrics
+from .batching import PredictionBatcher, PredictionQueueFull
+from .model_registry import LoadedModel, registry
+from .prediction_cache import PredictionCache, prediction_cache
+from .models import IPO, HistoricalIPO, HistoricalIPOStats, IngestRun, SimilarIPO
+from .upsert import upsert, QueryCounter
+from .sectors import SectorClassifier
+from .similarity import compute_similar_ipos
+from .dataset_cache import dataset_version
+from .stats import refresh_historical_stats
+
+TESTDATA_DIR = os.path.join(os.path.dirname(__file__), 'testdata')
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'ipo-tests'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, IPO_SIMILARITY_CACHE_DIR=None)
+class IPOTestCase(TestCase):
+    """
+    TestCase with an empty in-memory cache for every test, so cached pages never
+    leak between tests, and no similarity matrix saved outside the test
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        prediction_cache.clear()
+
+
+class StubReportServer:
+    """
+    Local HTTP server that serves recorded Chittorgarh report JSON from
+    ipo_app/testdata. Report 98 is served per year (report_98_<year>.json),
+    report 118 (upcoming) from report_118.json, and company pages
+    /ipo/<url_name>/<id>/ from company_pages/<url_name>-<id>.html. Paths listed in `failures`
+    answer 503 that many times before succeeding, and those in `bodies` are
+    served with that body instead of a file. Responses carry an ETag and
+    honour If-None-Match with a 304.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.failures = {}
+        self.bodies = {}
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append(self.path)
+                match = re.search(r'/data-read/(\d+)/1/10/(\d+)/', self.path)
+                name = None
+                if match and match.group(1) == '98':
+                    name = f'report_98_{match.group(2)}.json'
+                elif match and match.group(1) == '118':
+                    name = 'report_118.json'
+                page = re.match(r'/ipo/([^/]+)/(\d+)/$', self.path)
+                if page:
+                    name = os.path.join('company_pages', f'{page.group(1)}-{page.group(2)}.html')
+                if name and stub.failures.get(name, 0) > 0:
+                    stub.failures[name] -= 1
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                path = os.path.join(TESTDATA_DIR, name) if name else None
+                if name in stub.bodies:
+                    body = stub.bodies[name]
+                elif not path or not os.path.exists(path):
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                else:
+                    with open(path, 'rb') as f:
+                        body = f.read()
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Type', 'text/html' if name.endswith('.html') else 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubRedisServer:
+    """
+    Local stand-in for a Redis-compatible server: speaks RESP and implements
+    the commands Django's RedisCache sends (GET/MGET/SET [NX]/DEL/EXISTS/
+    INCRBY/FLUSHDB) on a dict. Expiry is accepted and ignored.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    args = []
+                    for _ in range(int(line[1:])):
+                        length = int(self.rfile.readline()[1:])
+                        args.append(self.rfile.read(length + 2)[:-2])
+                    self.wfile.write(stub.execute(args))
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f'redis://127.0.0.1:{self.server.server_address[1]}/0'
+
+    @staticmethod
+    def bulk(value):
+        return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def execute(self, args):
+        command, args = args[0].upper().decode(), args[1:]
+        with self.lock:
+            self.commands.append(command)
+            if command == 'GET':
+                return self.bulk(self.data.get(args[0]))
+            if command == 'MGET':
+                return b'*%d\r\n' % len(args) + b''.join(self.bulk(self.data.get(key)) for key in args)
+            if command == 'SET':
+                if b'NX' in [a.upper() for a in args[2:]] and args[0] in self.data:
+                    return self.bulk(None)
+                self.data[args[0]] = args[1]
+                return b'+OK\r\n'
+            if command in ('DEL', 'EXISTS'):
+                found = [key for key in args if key in self.data]
+                if command == 'DEL':
+                    for key in found:
+                        del self.data[key]
+                return b':%d\r\n' % len(found)
+            if command == 'INCRBY':
+                value = int(self.data.get(args[0], b'0')) + int(args[1])
+                self.data[args[0]] = str(value).encode()
+                return b':%d\r\n' % value
+            if command == 'FLUSHDB':
+                self.data.clear()
+            return b'+OK\r\n'
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class FetchIPODataTests(IPOTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+
+    def run_fetch(self, stub, **options):
+        out = StringIO()
+        with override_settings(CHITTORGARH_API_BASE=stub.url, IPO_REPORT_CACHE_DIR=self.cache_dir):
+            call_command('fetch_ipo_data', stdout=out, **options)
+        return out.getvalue()
+
+    def test_fetches_all_years_concurrently(self):
+        with StubReportServer() as stub:
+            self.run_fetch(stub, years='2023-2024', workers=2)
+
+        self.assertEqual(HistoricalIPO.objects.count(), 5)
+        alpha = HistoricalIPO.objects.get(company_name='Alpha Infra')
+        self.assertEqual(alpha.listing_gains_rs, Decimal('25.50'))
+        self.assertEqual(alpha.listing_gains_percent, Decimal('25.50'))
+        self.assertEqual(IPO.objects.get().company_name, 'Zeta Motors')
+
+    def test_bad_row_does_not_stop_the_year(self):
+        with StubReportServer() as stub:
+            out = self.run_fetch(stub, years='2024', workers=1)
+
+        self.assertIn('Broken Logistics', out)
+        # The row after the bad one is still ingested
+        self.assertTrue(HistoricalIPO.objects.filter(company_name='Epsilon Energy').exists())
+
+    def test_retries_failed_report(self):
+        with StubReportServer() as stub:
+            stub.failures['report_98_2023.json'] = 1
+            self.run_fetch(stub, years='2023', workers=1)
+
+        self.assertEqual(HistoricalIPO.objects.count(), 3)
+        self.assertEqual(sum('/2023/' in path for path in stub.requests), 2)
+
+    def test_rerun_skips_unchanged_rows(self):
+        with StubReportServer() as stub:
+            self.run_fetch(stub, years='2023', workers=1)
+            out = self.run_fetch(stub, years='2023', workers=1, force=True)
+
+        self.assertEqual(HistoricalIPO.objects.count(), 3)
+        self.assertIn('0 created, 0 updated, 3 unchanged', out)
+
+    def test_changed_rows_are_updated(self):
+        with StubReportServer() as stub:
+            self.run_fetch(stub, years='2023', workers=1)
+        HistoricalIPO.objects.filter(company_name='Beta Pharma').update(listing_price=1, source_hash='')
+        with StubReportServer() as stub:
+            out = self.run_fetch(stub, years='2023', workers=1, force=True)
+
+        self.assertIn('0 created, 1 updated, 2 unchanged', out)
+        self.assertEqual(HistoricalIPO.objects.get(company_name='Beta Pharma').listing_price, Decimal('240'))
+
+    def test_run_is_recorded_per_stage(self):
+        report = os.path.join(self.cache_dir, 'run.json')
+        with StubReportServer() as stub:
+            out = self.run_fetch(stub, years='2024', workers=1, report=report, quiet=True)
+
+        run = IngestRun.objects.get()
+        self.assertEqual(run.status, 'partial')  # report_98_2024.json has a broken row
+        self.assertEqual(run.errors, 1)
+        self.assertEqual(run.rows_created, HistoricalIPO.objects.count() + IPO.objects.count())
+        self.assertEqual(run.stages['fetch']['calls'], 2)
+        self.assertEqual(run.stages['fetch']['bytes'], run.bytes_downloaded)
+        self.assertGreater(run.bytes_downloaded, 0)
+        self.assertEqual(run.stages['normalize']['errors'], 1)
+        self.assertGreater(run.stages['upsert']['queries'], 0)
+        self.assertEqual(run.stages['fetch']['queries'], 0)
+        with open(report) as f:
+            self.assertEqual(json.load(f), json.loads(json.dumps(run.report())))
+        # --quiet drops the per-row lines but keeps the summaries
+        self.assertNotIn('Broken Logistics', out)
+        self.assertNotIn('Created: Zeta Motors', out)
+        self.assertIn('upsert', out)
+
+    def test_malformed_report_fails_only_its_year(self):
+        with StubReportServer() as stub:
+            stub.bodies['report_98_2022.json'] = b'["not", "an", "object"]'
+            out = self.run_fetch(stub, years='2022-2023', workers=1)
+
+        self.assertIn('Failed to get Historical data for year 2022', out)
+        self.assertEqual(HistoricalIPO.objects.filter(listing_date__year=2023).count(), 3)
+        run = IngestRun.objects.get()
+        self.assertEqual(run.status, 'partial')
+        self.assertEqual(run.stages['decode']['errors'], 1)
+
+    @override_settings(IPO_REPORT_IMMUTABLE_AFTER_DAYS=90)
+    def test_closed_year_is_not_fetched_again(self):
+        with StubReportServer() as stub:
+            self.run_fetch(stub, years='2023', workers=1)
+            stub.requests.clear()
+            out = self.run_fetch(stub, years='2023', workers=1)
+
+        self.assertFalse(any('/98/' in path for path in stub.requests))
+        self.assertIn('report unchanged', out)
+
+    @override_settings(IPO_REPORT_IMMUTABLE_AFTER_DAYS=100000)
+    def test_unchanged_open_year_revalidates_with_304(self):
+        with StubReportServer() as stub:
+            self.run_fetch(stub, years='2024', workers=1)
+            HistoricalIPO.objects.all().delete()
+            out = self.run_fetch(stub, years='2024', workers=1)
+
+        self.assertEqual(sum('/2024/' in path for path in stub.requests), 2)
+        # The 304 skips parsing and writes entirely
+        self.assertEqual(HistoricalIPO.objects.count(), 0)
+        self.assertIn('Upcoming report unchanged', out)
+
+
+class EnrichIPOsTests(IPOTestCase):
+    def test_fills_financials_and_sector_fetching_each_page_once(self):
+        common = {'company_id': '2150', 'comapny_url_name': 'midwest-ipo'}
+        HistoricalIPO.objects.create(
+            company_name='Midwest', listing_date=date(2025, 10, 24), issue_size=451, issue_price=1065,
+            listing_price=1165, listing_gains_rs=100, listing_gains_percent=Decimal('9.39'), **common,
+        )
+        IPO.objects.create(company_name='Midwest', **common)
+        IPO.objects.create(company_name='Missing Page', company_id='9999', comapny_url_name='missing-ipo')
+
+        with StubReportServer() as stub, override_settings(CHITTORGARH_WEB_BASE=stub.url):
+            out = StringIO()
+            call_command('enrich_ipos', rate=0, stdout=out)
+
+        for model in (IPO, HistoricalIPO):
+            row = model.objects.get(company_name='Midwest')
+            self.assertEqual(row.sector, 'Mining')
+            self.assertEqual(row.revenue, Decimal('612.45'))
+            self.assertEqual(row.profit, Decimal('133.30'))
+            self.assertEqual(row.pe_ratio, Decimal('22.45'))
+        self.assertEqual(stub.requests.count('/ipo/midwest-ipo/2150/'), 1)
+        self.assertIn('1 failed', out.getvalue())
+
+    def test_unexpected_page_errors_skip_only_that_page(self):
+        from decimal import InvalidOperation
+        from .management.commands import enrich_ipos
+
+        IPO.objects.create(company_name='Good', company_id='1', comapny_url_name='good-ipo')
+        IPO.objects.create(company_name='Bad', company_id='2', comapny_url_name='bad-ipo')
+
+        def scrape(session, limiter, url, timeout):
+            if 'bad-ipo' in url:
+                raise InvalidOperation('quantize result has too many digits')
+            return {'sector': 'Finance', 'revenue': Decimal('10.00'), 'profit': Decimal('1.00'), 'pe_ratio': None}
+
+        out = StringIO()
+        with mock.patch.object(enrich_ipos, 'scrape_company', scrape):
+            call_command('enrich_ipos', rate=0, stdout=out)
+        self.assertEqual(IPO.objects.get(company_name='Good').sector, 'Finance')
+        self.assertIsNone(IPO.objects.get(company_name='Bad').sector)
+        self.assertIn('1 failed', out.getvalue())
+
+
+class PastIPOViewTests(IPOTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        HistoricalIPO.objects.bulk_create([
+            HistoricalIPO(
+                company_id=str(i), company_name=f'Company {i}', issue_type='SME' if i % 3 == 0 else 'Mainline',
+                sector='Finance' if i % 2 else 'Energy', listing_date=date(2020 + i % 5, 1 + i % 12, 1),
+                issue_size=100, issue_price=100, listing_price=100 + i, listing_gains_rs=i, listing_gains_percent=i,
+            )
+            for i in range(130)
+        ])
+        refresh_historical_stats()
+
+    def test_year_dropdown_comes_from_stats(self):
+        response = self.client.get('/ipo/past')
+        self.assertEqual(response.context['years'], [2024, 2023, 2022, 2021, 2020])
+
+    def test_keyset_pages_cover_every_row_once(self):
+        response = self.client.get('/ipo/past')
+        seen = [ipo.pk for ipo in response.context['past_ipos']]
+        cursor = response.context['next_cursor']
+        while cursor:
+            response = self.client.get('/ipo/past', {'after': cursor, 'partial': 1})
+            seen += [ipo.pk for ipo in response.context['past_ipos']]
+            cursor = response['X-Next-Cursor']
+        self.assertEqual(len(seen), 130)
+        self.assertEqual(len(set(seen)), 130)
+
+    def test_filters_on_server(self):
+        response = self.client.get('/ipo/past', {'year': 2021, 'issue_type': 'SME', 'sector': 'Energy', 'min_gain': 20})
+        rows = response.context['past_ipos']
+        self.assertTrue(rows)
+        for ipo in rows:
+            self.assertEqual(ipo.listing_date.year, 2021)
+            self.assertEqual(ipo.issue_type, 'SME')
+            self.assertEqual(ipo.sector, 'Energy')
+            self.assertGreaterEqual(ipo.listing_gains_percent, 20)
+        self.assertEqual(response.context['years'], [2024, 2023, 2022, 2021, 2020])
+
+    def test_unknown_sector_matches_rows_without_one(self):
+        for i, sector in enumerate([None, '', 'Unknown']):
+            HistoricalIPO.objects.create(
+                company_id=str(500 + i), company_name=f'No Sector {i}', sector=sector, listing_date=date(2024, 12, 31),
+                issue_size=100, issue_price=100, listing_price=100, listing_gains_rs=0, listing_gains_percent=0,
+            )
+        response = self.client.get('/ipo/past', {'sector': 'Unknown'})
+        self.assertEqual([ipo.company_name for ipo in response.context['past_ipos']], ['No Sector 2', 'No Sector 1', 'No Sector 0'])
+        # The same rows the stats bucket as Unknown
+        refresh_historical_stats([2024])
+        self.assertEqual(HistoricalIPOStats.objects.get(year=2024, sector='Unknown', issue_type='All').ipo_count, 3)
+
+    def test_malformed_filters_are_ignored(self):
+        for params in ({'min_gain': 'nan'}, {'max_gain': '-Infinity'}, {'min_gain': '1e20'}, {'year': 99999}, {'year': -5}):
+            response = self.client.get('/ipo/past', params)
+            self.assertEqual(response.status_code, 200, params)
+            if 'year' in params or params.get('min_gain') == 'nan':
+                self.assertEqual(len(response.context['past_ipos']), 50, params)
+        # The last representable year is still a valid filter
+        response = self.client.get('/ipo/past', {'year': 9999})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context['past_ipos']), [])
+
+
+class SimilarIPOTests(IPOTestCase):
+    def test_stores_nearest_historical_ipos(self):
+        for i, (qib, sector) in enumerate([(100, 'Technology'), (95, 'Technology'), (2, 'Energy'), (1, 'Finance')]):
+            HistoricalIPO.objects.create(
+                company_name=f'Hist {i}', listing_date=date(2024, 1, i + 1), sector=sector,
+                qib_subscription=qib, nii_subscription=qib, retail_subscription=qib / 2,
+                issue_size=500, issue_price=300, listing_price=330, listing_gains_rs=30, listing_gains_percent=10,
+            )
+        ipo = IPO.objects.create(
+            company_name='New Tech', sector='Technology', issue_size=480, issue_price=310,
+            qib_subscription=98, nii_subscription=97, retail_subscription=50,
+        )
+
+        self.assertEqual(compute_similar_ipos(k=3), 3)
+        names = list(ipo.similar_ipos.order_by('-similarity_score').values_list('similar_ipo_name', flat=True))
+        self.assertEqual(names[:2], ['Hist 0', 'Hist 1'])
+
+        # Re-running replaces rather than accumulates
+        compute_similar_ipos(k=2)
+        self.assertEqual(ipo.similar_ipos.count(), 2)
+
+    def add_history(self, name, qib, sector, listing_date=date(2024, 1, 1)):
+        return HistoricalIPO.objects.create(
+            company_name=name, listing_date=listing_date, sector=sector,
+            qib_subscription=qib, nii_subscription=qib, retail_subscription=qib / 2,
+            issue_size=500, issue_price=300, listing_price=330, listing_gains_rs=30, listing_gains_percent=10,
+        )
+
+    def test_edits_to_indexed_history_are_picked_up(self):
+        edited = self.add_history('Edited', 100, 'Technology')
+        self.add_history('Other', 1, 'Energy')
+        ipo = IPO.objects.create(
+            company_name='New', sector='Finance', issue_size=500, issue_price=300,
+            qib_subscription=100, nii_subscription=100, retail_subscription=50,
+        )
+        compute_similar_ipos(k=1)
+        self.assertEqual(ipo.similar_ipos.get().similar_sector, 'Technology')
+
+        # Same ids and row count: only a fingerprint of the data shows the change
+        HistoricalIPO.objects.filter(pk=edited.pk).update(sector='Finance', qib_subscription=90)
+        compute_similar_ipos(k=1)
+        match = ipo.similar_ipos.get()
+        self.assertEqual((match.similar_sector, match.similar_qib), ('Finance', Decimal('90.00')))
+
+    def test_saved_matrix_is_extended_by_the_next_run(self):
+        from .similarity import SimilarityEngine
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        for i in range(8):
+            self.add_history(f'Hist {i}', 10 + i, 'Finance')
+
+        with override_settings(IPO_SIMILARITY_CACHE_DIR=directory):
+            self.assertEqual(SimilarityEngine().refresh(), 8)
+            self.assertTrue(os.path.exists(os.path.join(directory, 'engine.npz')))
+
+            # A later run (a new engine, as in a new process) reads only the row added since
+            added = self.add_history('Added', 50, 'Energy')
+            engine = SimilarityEngine()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(engine.refresh(), 9)
+            self.assertEqual(engine.fitted_rows, 8)
+            reads = [q['sql'] for q in queries.captured_queries if '"company_name"' in q['sql'] and 'SUM(' not in q['sql']]
+            self.assertEqual(len(reads), 1)
+            self.assertIn('"id" >', reads[0])
+            self.assertEqual(engine.names[-1], 'Added')
+
+            # An in-place edit of an indexed row refits from the whole table
+            HistoricalIPO.objects.filter(pk=added.pk).update(sector='Technology')
+            engine = SimilarityEngine()
+            self.assertEqual(engine.refresh(), 9)
+            self.assertEqual(engine.fitted_rows, 9)
+            self.assertEqual(engine.sectors[-1], 'Technology')
+
+    def test_promoted_ipo_does_not_match_itself(self):
+        listed = date(2024, 3, 1)
+        self.add_history('Listed Co', 50, 'Finance', listed)
+        self.add_history('Peer', 45, 'Finance')
+        self.add_history('Far', 1, 'Energy')
+        ipo = IPO.objects.create(
+            company_name='Listed Co', sector='Finance', listing_date=listed, issue_size=500, issue_price=300,
+            qib_subscription=50, nii_subscription=50, retail_subscription=25,
+        )
+        self.assertEqual(compute_similar_ipos(k=2), 2)
+        names = list(ipo.similar_ipos.order_by('-similarity_score').values_list('similar_ipo_name', flat=True))
+        self.assertEqual(names, ['Peer', 'Far'])
+
+
+class HistoricalStatsTests(IPOTestCase):
+    def add(self, name, year, gain, sector='Finance', issue_type='Mainline'):
+        return HistoricalIPO.objects.create(
+            company_name=name, listing_date=date(year, 6, 1), sector=sector, issue_type=issue_type,
+            issue_size=100, issue_price=100, listing_price=100 + gain, listing_gains_rs=gain,
+            listing_gains_percent=gain, qib_subscription=gain + 10,
+        )
+
+    def test_buckets_and_rollups(self):
+        for i, gain in enumerate([-10, 0, 10, 20, 30]):
+            self.add(f'F{i}', 2023, gain)
+        self.add('E0', 2023, 50, sector='Energy', issue_type='SME')
+        refresh_historical_stats()
+
+        finance = HistoricalIPOStats.objects.get(year=2023, sector='Finance', issue_type='Mainline')
+        self.assertEqual(finance.ipo_count, 5)
+        self.assertEqual(finance.mean_gain, Decimal('10'))
+        self.assertEqual(finance.median_gain, Decimal('10'))
+        self.assertEqual(finance.p90_gain, Decimal('26'))
+        self.assertEqual(finance.hit_rate, Decimal('60'))
+        self.assertEqual(finance.avg_qib_subscription, Decimal('20'))
+
+        year = HistoricalIPOStats.objects.get(year=2023, sector='All', issue_type='All')
+        self.assertEqual(year.ipo_count, 6)
+        self.assertEqual(HistoricalIPOStats.objects.get(year=2023, sector='All', issue_type='SME').ipo_count, 1)
+
+    def test_fetch_refreshes_only_touched_years(self):
+        self.add('Old', 2019, 5)
+        refresh_historical_stats()
+        HistoricalIPOStats.objects.filter(year=2019).update(mean_gain=99)
+
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        with StubReportServer() as stub:
+            with override_settings(CHITTORGARH_API_BASE=stub.url, IPO_REPORT_CACHE_DIR=cache_dir):
+                call_command('fetch_ipo_data', years='2023', workers=1, stdout=StringIO())
+
+        self.assertEqual(HistoricalIPOStats.objects.get(year=2023, sector='All', issue_type='All').ipo_count, 3)
+        # 2019 was not part of the run, so its (tampered) bucket is left alone
+        self.assertEqual(HistoricalIPOStats.objects.get(year=2019, sector='All', issue_type='All').mean_gain, Decimal('99'))
+
+    def test_stats_api_filters(self):
+        self.add('A', 2023, 10)
+        self.add('B', 2024, 20, sector='Energy')
+        refresh_historical_stats()
+
+        response = self.client.get('/api/historical/stats/', {'year': 2024, 'sector': 'All', 'issue_type': 'All'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(response.json()[0]['mean_gain'], '20.00')
+        self.assertEqual(self.client.get('/api/historical/stats/', {'year': 'x'}).status_code, 400)
+
+
+class DatasetSnapshotTests(IPOTestCase):
+    def setUp(self):
+        super().setUp()
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            self.skipTest('pyarrow not installed')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        HistoricalIPO.objects.bulk_create([
+            HistoricalIPO(
+                company_name=f'Company {i}', listing_date=date(2024, 1, 1 + i), sector='Finance' if i else None,
+                issue_size=Decimal('123.45'), issue_price=100 + i, listing_price=110 + i, listing_gains_rs=10,
+                listing_gains_percent=Decimal('9.99'), qib_subscription=Decimal('150.75'),
+            )
+            for i in range(25)
+        ])
+
+    def round_trip(self, filename):
+        path = os.path.join(self.directory, filename)
+        expected = list(HistoricalIPO.objects.order_by('company_name').values())
+        out = StringIO()
+        call_command('export_dataset', path, chunk_size=10, stdout=out)
+        self.assertIn('Exported 25 historical rows', out.getvalue())
+
+        HistoricalIPO.objects.all().delete()
+        call_command('import_dataset', path, chunk_size=7, stdout=StringIO())
+        loaded = list(HistoricalIPO.objects.order_by('company_name').values())
+        for row in expected + loaded:
+            row.pop('id')
+        self.assertEqual(loaded, expected)
+        return path
+
+    def test_parquet_round_trip(self):
+        from .columnar import read_snapshot
+        path = self.round_trip('historical.parquet')
+        table = read_snapshot(path, columns=['qib_subscription', 'listing_date'])
+        self.assertEqual(str(table.schema.field('qib_subscription').type), 'double')
+        self.assertEqual(str(table.schema.field('listing_date').type), 'date32[day]')
+
+    def test_arrow_round_trip_upserts_on_natural_key(self):
+        path = self.round_trip('historical.arrow')
+        HistoricalIPO.objects.filter(company_name='Company 3').update(listing_price=1)
+        call_command('import_dataset', path, stdout=StringIO())
+        self.assertEqual(HistoricalIPO.objects.count(), 25)
+        self.assertEqual(HistoricalIPO.objects.get(company_name='Company 3').listing_price, Decimal('113'))
+
+
+class TrainModelTests(IPOTestCase):
+    def setUp(self):
+        super().setUp()
+        try:
+            import sklearn  # noqa: F401
+        except ImportError:
+            self.skipTest('scikit-learn not installed')
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(
+            IPO_MODEL_ARTIFACT_DIR=os.path.join(self.directory, 'artifacts'),
+            IPO_TRAINING_CACHE_DIR=os.path.join(self.directory, 'training'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # Listing gain is exactly 0.5 * QIB + 0.1 * retail - 2
+        HistoricalIPO.objects.bulk_create([
+            HistoricalIPO(
+                company_name=f'Company {i}', listing_date=date(2024, 1, 1 + i % 28), issue_size=100,
+                issue_price=200, listing_price=210, listing_gains_rs=10, qib_subscription=i, retail_subscription=i * 7 % 13,
+                listing_gains_percent=Decimal(0.5 * i + 0.1 * (i * 7 % 13) - 2).quantize(Decimal('0.01')),
+            )
+            for i in range(40)
+        ])
+
+    def train(self, output, **options):
+        out = StringIO()
+        call_command('train_model', output=os.path.join(self.directory, output), folds=4, stdout=out, **options)
+        return out.getvalue()
+
+    def test_linear_model_is_versioned_published_and_served(self):
+        from .model_registry import ModelRegistry
+        from .prediction import build_matrix, predict_matrix
+        from .training import read_metadata
+
+        out = self.train('model.npy', model='linear', n_jobs=1)
+        self.assertIn('40 rows from database', out)
+
+        path = os.path.join(self.directory, 'model.npy')
+        metadata = read_metadata(path)
+        self.assertEqual(metadata['rows'], 40)
+        self.assertEqual(metadata['feature_spec']['features'][0], 'qib_subscription')
+        self.assertGreater(metadata['cv']['metrics']['r2']['mean'], 0.99)
+        self.assertTrue(os.path.exists(os.path.join(self.directory, 'artifacts', metadata['artifact'])))
+
+        loaded = ModelRegistry(path=path).get()
+        self.assertEqual(loaded.version, metadata['model_version'])
+        features = build_matrix([{'qib_subscription': 10, 'retail_subscription': 10, 'issue_size': 100, 'issue_price': 200}])
+        gains, _ = predict_matrix(features, loaded.model)
+        # 0.5 * 10 + 0.1 * 10 - 2, up to ridge shrinkage
+        self.assertAlmostEqual(gains[0], 4.0, delta=0.2)
+
+    def test_design_matrix_is_cached_by_data_hash(self):
+        self.train('model.pkl', model='gbr', n_jobs=2)
+        out = self.train('model.pkl', model='gbr', n_jobs=2)
+        self.assertIn('from cache', out)
+
+        HistoricalIPO.objects.filter(company_name='Company 3').update(qib_subscription=99)
+        out = self.train('model.pkl', model='gbr', n_jobs=2)
+        self.assertIn('from database', out)
+
+
+class ModelRegistryTests(TestCase):
+    WEIGHTS = np.array([0.5, 0.0, 0.1, 0.0, 0.0, 0.0, 0.0, -2.0])
+    ROW = np.array([[10.0, 0.0, 10.0, 0.0, 0.0, 0.0, 0.0]])
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write(self, name, weights, mtime_ns=None):
+        """Write a LinearArrayModel as a pickle, or an .npy/.joblib file, with a distinct mtime"""
+        from .model_registry import LinearArrayModel
+        path = os.path.join(self.directory, name)
+        if name.endswith('.npy'):
+            np.save(path, weights)
+        elif name.endswith('.joblib'):
+            import joblib
+            joblib.dump(LinearArrayModel(weights), path)
+        else:
+            with open(path, 'wb') as f:
+                pickle.dump(LinearArrayModel(weights), f)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+        return path
+
+    def test_replaced_file_is_swapped_in_after_check_interval(self):
+        from . import model_registry
+        path = self.write('model.pkl', self.WEIGHTS, mtime_ns=10 ** 18)
+        registry = model_registry.ModelRegistry(path=path, check_interval=60)
+        self.assertIsNone(registry.peek())
+        first = registry.version
+        self.assertEqual(registry.peek().version, first)
+        self.assertEqual(first, model_registry.file_version(path))
+
+        self.write('model.pkl', self.WEIGHTS * 2, mtime_ns=10 ** 18 + 10 ** 9)
+        self.assertEqual(registry.version, first)  # not stat()ed again within the interval
+        later = time.monotonic() + 61
+        with mock.patch.object(model_registry.time, 'monotonic', return_value=later):
+            self.assertIsNone(registry.peek())  # a check is due
+            loaded = registry.get()
+        self.assertNotEqual(loaded.version, first)
+        self.assertEqual(loaded.version, model_registry.file_version(path))
+        self.assertAlmostEqual(float(loaded.model.predict(self.ROW)[0]), 8.0)
+
+    def test_corrupt_replacement_keeps_last_good_model(self):
+        from .model_registry import ModelRegistry
+        path = self.write('model.pkl', self.WEIGHTS, mtime_ns=10 ** 18)
+        registry = ModelRegistry(path=path, check_interval=0)
+        good = registry.get()
+
+        with open(path, 'wb') as f:
+            f.write(b'not a pickle')
+        os.utime(path, ns=(10 ** 18 + 10 ** 9,) * 2)
+        with self.assertLogs('ipo_app.model_registry', 'ERROR'):
+            served = registry.get()
+        self.assertIs(served.model, good.model)
+        self.assertEqual(served.version, good.version)
+        # Not retried until the file changes again
+        with self.assertNoLogs('ipo_app.model_registry', 'ERROR'):
+            self.assertIs(registry.get().model, good.model)
+
+    def test_npy_and_joblib_loaders(self):
+        from .model_registry import LinearArrayModel, ModelRegistry, file_version, joblib
+        for name in ('model.npy', 'model.joblib') if joblib else ('model.npy',):
+            path = self.write(name, self.WEIGHTS)
+            loaded = ModelRegistry(path=path).get()
+            self.assertIsInstance(loaded.model, LinearArrayModel, name)
+            self.assertEqual(loaded.version, file_version(path))
+            self.assertAlmostEqual(float(loaded.model.predict(self.ROW)[0]), 4.0, msg=name)
+        # .npy weights are memory-mapped rather than copied into each worker
+        self.assertIsInstance(ModelRegistry(path=os.path.join(self.directory, 'model.npy')).get().model.coef_, np.memmap)
+
+
+class AsyncViewTests(IPOTestCase):
+    def test_detail_page_loads_similar_ipos_with_async_orm(self):
+        ipo = IPO.objects.create(company_name='Async Co', company_id='77', status='upcoming')
+        for score, name in ((70, 'Weaker'), (90, 'Closest')):
+            SimilarIPO.objects.create(
+                ipo=ipo, similar_ipo_name=name, similarity_score=score, similar_qib=1, similar_hni=1, similar_retail=1,
+                similar_issue_size=1, similar_gmp=0, similar_listing_gains_percentage=12, similar_sector='Finance',
+            )
+
+        response = self.client.get('/ipo/77/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertLess(body.index('Closest'), body.index('Weaker'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/ipo/77/').content, response.content)
+
+    def test_predict_runs_model_on_predict_executor(self):
+        threads = []
+
+        def score(features):
+            threads.append(threading.current_thread().name)
+            return score_matrix(features)
+
+        score_matrix = prediction.score_matrix
+        with mock.patch.object(prediction, 'score_matrix', score):
+            response = self.client.post('/api/predict/', {'qib_subscription': 10, 'gmp': 5}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('predicted_gain', response.json())
+        self.assertTrue(threads[0].startswith('ipo-predict'))
+
+    def test_predict_checks_the_model_file_off_the_event_loop(self):
+        threads = []
+        get = registry.get
+
+        def recording_get():
+            threads.append(threading.current_thread().name)
+            return get()
+
+        # A due stat() check, as after every IPO_MODEL_CHECK_INTERVAL
+        with mock.patch.object(registry, 'peek', return_value=None), mock.patch.object(registry, 'get', recording_get):
+            response = self.client.post('/api/predict/', {'qib_subscription': 12}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith('ipo-predict') for name in threads), threads)
+
+    def test_predict_rejects_bad_requests(self):
+        self.assertEqual(self.client.get('/api/predict/').status_code, 405)
+        response = self.client.post('/api/predict/', '{not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/predict/', {'qib_subscription': 'nan'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class PredictBatchAPITests(IPOTestCase):
+    def post(self, payload):
+        return self.client.post('/api/predict/batch/', payload, content_type='application/json')
+
+    def test_row_and_columnar_payloads_agree(self):
+        rows = [{'qib_subscription': 10, 'retail_subscription': 3}, {'qib_subscription': 50, 'gmp': 20}]
+        by_rows = self.post({'rows': rows})
+        self.assertEqual(by_rows.status_code, 200)
+        self.assertEqual(by_rows.json()['count'], 2)
+        by_columns = self.post({'columns': {'qib_subscription': [10, 50], 'retail_subscription': [3, 0], 'gmp': [0, 20]}})
+        self.assertEqual(by_columns.json()['results'], by_rows.json()['results'])
+        self.assertEqual(self.post(rows).json()['results'], by_rows.json()['results'])
+
+    def test_rejects_non_finite_values(self):
+        payloads = [
+            {'columns': {'qib_subscription': [10, None]}},
+            {'columns': {'qib_subscription': [10, 'nan']}},
+            {'rows': [{'qib_subscription': 'inf'}]},
+            {'rows': [{'gmp': '-Infinity'}]},
+            {'columns': {'qib_subscription': [1, 2], 'gmp': [1]}},
+        ]
+        for payload in payloads:
+            response = self.post(payload)
+            self.assertEqual(response.status_code, 400, payload)
+            self.assertIn('Invalid payload', response.json()['error'])
+
+
+class IPOWritePredictionTests(IPOTestCase):
+    def test_create_scores_in_the_same_write(self):
+        payload = {'company_name': 'Scored', 'qib_subscription': 10, 'nii_subscription': 20, 'gmp': 30}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/ipos/', payload, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        writes = [q['sql'] for q in queries.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT'))
+
+        ipo = IPO.objects.get(company_name='Scored')
+        self.assertEqual(ipo.prediction_model_version, registry.version)
+        self.assertIsNotNone(ipo.predicted_at)
+        # HNI demand and GMP are read from nii_subscription and gmp, not silently scored as 0
+        without = prediction.predict_listing_gain({'qib_subscription': 10})['predicted_gain']
+        self.assertNotEqual(float(ipo.predicted_gain), without)
+        self.assertEqual(float(ipo.predicted_gain), prediction.predict_listing_gain(payload)['predicted_gain'])
+
+    def test_update_rescores_and_clears_when_no_longer_scorable(self):
+        ipo = IPO.objects.create(company_name='Updated', company_id='51')
+        url = f'/api/ipos/{ipo.pk}/'
+        with CaptureQueriesContext(connection) as queries:
+            self.client.patch(url, {'qib_subscription': 40, 'gmp': 12}, content_type='application/json')
+        self.assertEqual(len([q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]), 1)
+        ipo.refresh_from_db()
+        self.assertEqual(float(ipo.predicted_gain), prediction.predict_listing_gain(ipo)['predicted_gain'])
+
+        self.client.patch(url, {'qib_subscription': 0}, content_type='application/json')
+        ipo.refresh_from_db()
+        self.assertIsNone(ipo.predicted_gain)
+        self.assertIsNone(ipo.prediction_confidence)
+        self.assertEqual(ipo.prediction_model_version, '')
+        self.assertIsNone(ipo.predicted_at)
+
+
+class UniqueRowsAPITests(IPOTestCase):
+    def post(self, url, payload):
+        return self.client.post(url, payload, content_type='application/json')
+
+    def test_duplicate_ipo_name_is_rejected(self):
+        self.assertEqual(self.post('/api/ipos/', {'company_name': 'Twice'}).status_code, 201)
+        response = self.post('/api/ipos/', {'company_name': 'Twice'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('company_name', response.json())
+        # Saving a row under its own name is not a duplicate
+        pk = IPO.objects.get(company_name='Twice').pk
+        response = self.client.patch(f'/api/ipos/{pk}/', {'company_name': 'Twice'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_duplicate_historical_listing_is_rejected(self):
+        payload = {
+            'company_name': 'Listed', 'listing_date': '2024-05-02', 'issue_size': 100, 'issue_price': 100,
+            'listing_price': 110, 'listing_gains_rs': 10, 'listing_gains_percent': 10,
+        }
+        self.assertEqual(self.post('/api/historical/', payload).status_code, 201)
+        response = self.post('/api/historical/', payload)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.json())
+        self.assertEqual(self.post('/api/historical/', dict(payload, listing_date='2025-05-02')).status_code, 201)
+
+
+class PredictionBatcherTests(IPOTestCase):
+    def record_batches(self):
+        sizes = []
+
+        def score(features):
+            sizes.append(len(features))
+            return score_matrix(features)
+
+        score_matrix = prediction.score_matrix
+        patcher = mock.patch.object(prediction, 'score_matrix', score)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return sizes
+
+    def test_coalesces_concurrent_rows_and_fans_results_back(self):
+        sizes = self.record_batches()
+        rows = prediction.build_matrix([{'qib_subscription': i} for i in range(10)])
+        batcher = PredictionBatcher(max_batch=4, max_wait=0.01, max_queue=100)
+
+        async def predict_all():
+            return await asyncio.gather(*(batcher.predict(row) for row in rows))
+
+        results = asyncio.run(predict_all())
+        self.assertEqual(sizes, [4, 4, 2])
+        expected, _, _ = prediction.score_matrix(rows)
+        self.assertEqual([gain for gain, _, _ in results], expected.tolist())
+
+    def test_rejects_rows_beyond_queue_depth(self):
+        row = prediction.build_matrix([{'qib_subscription': 1}])[0]
+        batcher = PredictionBatcher(max_batch=10, max_wait=0.01, max_queue=2)
+
+        async def predict_all():
+            return await asyncio.gather(*(batcher.predict(row) for _ in range(3)), return_exceptions=True)
+
+        results = asyncio.run(predict_all())
+        self.assertIsInstance(results[2], PredictionQueueFull)
+        self.assertEqual(results[0], results[1])
+
+    @override_settings(IPO_PREDICT_QUEUE_DEPTH=0)
+    async def test_predict_api_answers_503_when_queue_is_full(self):
+        response = await self.async_client.post('/api/predict/', {'qib_subscription': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+
+    @override_settings(IPO_PREDICT_BATCH_WAIT_MS=5000)
+    def test_wsgi_requests_skip_the_batch_wait(self):
+        sizes = self.record_batches()
+        start = time.perf_counter()
+        response = self.client.post('/api/predict/', {'qib_subscription': 1}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(sizes, [1])
+
+
+class PredictionCacheTests(IPOTestCase):
+    def count_model_calls(self, name='predict_matrix'):
+        calls = []
+        original = getattr(prediction, name)
+
+        def counted(features, *args):
+            calls.append(len(features))
+            return original(features, *args)
+
+        patcher = mock.patch.object(prediction, name, counted)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return calls
+
+    def test_predict_listing_gain_is_memoized_per_quantized_row_and_model_version(self):
+        calls = self.count_model_calls()
+        first = prediction.predict_listing_gain({'qib_subscription': 12.341, 'gmp': 20})
+        self.assertEqual(prediction.predict_listing_gain({'qib_subscription': 12.344, 'gmp': 20}), first)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(prediction_cache.stats()['hits'], 1)
+
+        prediction.predict_listing_gain({'qib_subscription': 12.36, 'gmp': 20})
+        self.assertEqual(len(calls), 2)
+
+        reloaded = LoadedModel(model=None, version='retrained')
+        with mock.patch.object(registry, 'get', return_value=reloaded):
+            self.assertEqual(prediction.predict_listing_gain({'qib_subscription': 12.341, 'gmp': 20})['model_version'], 'retrained')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(prediction_cache.stats()['entries'], 1)
+
+    def test_lru_and_ttl_eviction(self):
+        memo = PredictionCache(size=2, ttl=60, decimals=2, shared=False)
+        for i in range(3):
+            self.assertIsNone(memo.get([i], 'v1'))
+            memo.set([i], 'v1', (float(i), 70.0))
+        self.assertIsNone(memo.get([0], 'v1'))
+        self.assertEqual(memo.get([2], 'v1'), (2.0, 70.0))
+        self.assertEqual(memo.stats()['evictions'], 1)
+
+        with mock.patch('ipo_app.prediction_cache.time.monotonic', return_value=time.monotonic() + 61):
+            self.assertIsNone(memo.get([2], 'v1'))
+
+    def test_shared_through_django_cache(self):
+        first, second = (PredictionCache(size=10, ttl=60, decimals=2, shared=True) for _ in range(2))
+        first.get([1.0, 2.0], 'v1')
+        first.set([1.0, 2.0], 'v1', (5.0, 70.0))
+        self.assertEqual(second.get([1.0, 2.0], 'v1'), (5.0, 70.0))
+        self.assertEqual(second.stats()['shared_hits'], 1)
+
+    def test_predict_api_serves_repeated_rows_from_cache(self):
+        calls = self.count_model_calls('score_matrix')
+        payload = {'qib_subscription': 30, 'retail_subscription': 4}
+        responses = [self.client.post('/api/predict/', payload, content_type='application/json').json() for _ in range(2)]
+        self.assertEqual(responses[0], responses[1])
+        self.assertEqual(calls, [1])
+        self.assertEqual(self.client.get('/api/predict/model/').json()['prediction_cache']['hits'], 1)
+
+
+class HistoricalExportTests(IPOTestCase):
+    def setUp(self):
+        super().setUp()
+        for i, (year, sector) in enumerate([(2023, 'Finance'), (2024, 'Finance'), (2024, 'Energy')]):
+            HistoricalIPO.objects.create(
+                company_name=f'Export {i}', listing_date=date(year, 6, 1), sector=sector, issue_type='Mainline',
+                issue_size=100, issue_price=Decimal('100.50'), listing_price=110, listing_gains_rs=Decimal('9.50'),
+                listing_gains_percent=Decimal('9.45'),
+            )
+
+    def test_streams_filtered_ndjson(self):
+        response = self.client.get('/api/historical/export/', {'year': 2024, 'sector': 'Finance'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['company_name'] for row in rows], ['Export 1'])
+        self.assertEqual(rows[0]['listing_date'], '2024-06-01')
+        self.assertEqual(rows[0]['issue_price'], 100.5)
+
+    def test_csv_gzipped_when_accepted(self):
+        response = self.client.get('/api/historical/export/', {'format': 'csv'}, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        rows = list(csv.DictReader(gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()))
+        self.assertEqual([row['company_name'] for row in rows], ['Export 0', 'Export 1', 'Export 2'])
+        self.assertEqual(rows[0]['listing_gains_percent'], '9.45')
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/historical/export/', {'format': 'xml'}).status_code, 400)
+
+    async def test_streams_asynchronously_under_asgi(self):
+        response = await self.async_client.get('/api/historical/export/', {'year': 2024, 'min_gain': 'nan'})
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row['company_name'] for row in rows], ['Export 1', 'Export 2'])
+
+    def test_cursor_pagination_skips_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get('/api/historical/', {'pagination': 'cursor', 'page_size': 2}).json()
+        self.assertNotIn('count', first)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+        self.assertEqual([row['company_name'] for row in first['results']], ['Export 2', 'Export 1'])
+
+        rest = self.client.get(first['next']).json()
+        self.assertEqual([row['company_name'] for row in rest['results']], ['Export 0'])
+        self.assertIsNone(rest['next'])
+        self.assertIn('count', self.client.get('/api/historical/').json())
+
+
+class RequestMetricsTests(IPOTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics.reset()
+
+    def test_metrics_endpoint(self):
+        self.client.get('/api/historical/')
+        self.client.get('/ipo/past')
+        prediction.predict_listing_gain({'qib_subscription': 10})
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        body = response.content.decode()
+        self.assertIn('ipo_http_requests_total{view="historical-list",method="GET",status="200"} 1', body)
+        self.assertIn('ipo_http_request_db_queries_count{view="historical-list"} 1', body)
+        self.assertIn('# TYPE ipo_http_request_duration_seconds histogram', body)
+        self.assertIn('ipo_http_request_duration_seconds_bucket{view="ipo_past",method="GET",le="+Inf"} 1', body)
+        self.assertEqual(TEMPLATE_SECONDS.count(template='ipo_past.html'), 1)
+        self.assertEqual(PREDICT_SECONDS.count(phase='model_load'), 1)
+        self.assertEqual(PREDICT_SECONDS.count(phase='predict'), 1)
+
+    def test_slow_request_log(self):
+        with override_settings(IPO_SLOW_REQUEST_THRESHOLDS={'historical-list': 0}):
+            with self.assertLogs('ipo_app.metrics', 'WARNING') as logs:
+                self.client.get('/api/historical/')
+        self.assertIn('Slow request GET /api/historical/ (historical-list) -> 200', logs.output[0])
+        self.assertIn('queries in', logs.output[0])
+
+        with override_settings(IPO_SLOW_REQUEST_THRESHOLDS={'historical-list': None}):
+            with self.assertNoLogs('ipo_app.metrics', 'WARNING'):
+                self.client.get('/api/historical/')
+
+
+class SyntheticDataTests(IPOTestCase):
+    def test_generates_and_replaces_synthetic_rows_only(self):
+        HistoricalIPO.objects.create(
+            company_name='Real Listing', listing_date=date(2020, 1, 1), issue_size=100, issue_price=100,
+            listing_price=110, listing_gains_rs=10, listing_gains_percent=10,
+        )
+        # A real company whose name happens to start like the generated ones
+        IPO.objects.create(company_name='Synthetic Fibres Ltd', company_id='1234')
+        for _ in range(2):  # a rerun replaces the earlier synthetic rows instead of clashing with them
+            call_command('generate_synthetic_ipos', ipos=40, historical=300, similar=2, stdout=StringIO())
+
+        self.assertEqual(IPO.objects.count(), 41)
+        self.assertEqual(HistoricalIPO.objects.count(), 301)
+        self.assertEqual(SimilarIPO.objects.count(), 80)
+        self.assertGreater(HistoricalIPOStats.objects.count(), 2)
+        self.assertGreater(len(set(IPO.objects.values_list('status', flat=True))), 1)
+        self.assertFalse(IPO.objects.filter(status='upcoming', listing_price__isnull=False).exists())
+        self.assertEqual(set(HistoricalIPO.objects.values_list('issue_type', flat=True)), {'', 'Mainline', 'SME'})
+
+        call_command('generate_synthetic_ipos', clear=True, stdout=StringIO())
+        self.assertEqual(list(HistoricalIPO.objects.values_list('company_name', flat=True)), ['Real Listing'])
+        self.assertEqual(list(IPO.objects.values_list('company_name', flat=True)), ['Synthetic Fibres Ltd'])
+        # Only the real listing's buckets are left (its sector, issue type and the rollups)
+        self.assertEqual(set(HistoricalIPOStats.objects.values_list('year', flat=True)), {2020})
+        self.assertEqual(HistoricalIPOStats.objects.get(year=2020, sector='All', issue_type='All').ipo_count, 1)
+
+
+class SectorClassifierTests(TestCase):
+    def setUp(self):
+        self.classifier = SectorClassifier()
+
+    def test_keywords_match_whole_words_only(self):
+        self.assertEqual(self.classifier.classify('The company and its subsidiaries make cement bricks'), 'Unknown')
+        self.assertEqual(self.classifier.classify('Goods are scarce and credit is tight'), 'Finance')
+        self.assertEqual(self.classifier.classify('Our network of schools'), 'Education')
+
+    def test_phrases_and_listed_plurals(self):
+        self.assertEqual(self.classifier.classify('An IT services company building cloud computing platforms'), 'Technology')
+        self.assertEqual(self.classifier.classify('Maker of cars, bikes and other vehicles'), 'Automobiles')
+        self.assertEqual(self.classifier.scores('banks and banking'), {'Finance': 2})
+        self.assertEqual(self.classifier.classify(''), 'Unknown')
+
+    def test_ties_go_to_the_sector_listed_first(self):
+        self.assertEqual(self.classifier.classify('solar film'), 'Energy')
+        self.assertEqual(self.classifier.classify_many(['solar film', 'textile', 'solar film']), ['Energy', 'Textiles', 'Energy'])
+
+
+class FloatMatrixTests(IPOTestCase):
+    def test_reads_decimal_columns_as_floats_with_nulls_as_zero(self):
+        IPO.objects.create(company_name='Priced', issue_price=Decimal('120.50'), qib_subscription=Decimal('3.25'))
+        IPO.objects.create(company_name='Unpriced', qib_subscription=1)
+
+        matrix = float_matrix(IPO.objects.order_by('company_name'), ['issue_price', 'qib_subscription'])
+        self.assertEqual(matrix.dtype, np.float64)
+        self.assertEqual(matrix.tolist(), [[120.5, 3.25], [0.0, 1.0]])
+
+    def test_rescore_scores_rows_read_as_floats(self):
+        IPO.objects.create(company_name='Scored', issue_price=Decimal('100'), qib_subscription=Decimal('10'), gmp=Decimal('5'))
+        self.assertEqual(prediction.rescore_ipos(), 1)
+        expected = prediction.predict_listing_gain(IPO.objects.get())['predicted_gain']
+        self.assertEqual(float(IPO.objects.get().predicted_gain), expected)
+
+
+class SQLiteProfileTests(IPOTestCase):
+    def test_tuned_profile_puts_file_database_in_wal_mode(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(directory, 'tuned.sqlite3')}, alias='tuned')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+
+        pragmas = sqlite_pragmas(wrapper)
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+        self.assertEqual(pragmas['synchronous'], 1)  # NORMAL
+        self.assertEqual(pragmas['busy_timeout'], 5000)
+        self.assertEqual(pragmas['mmap_size'], 256 * 1024 * 1024)
+
+
+class LifecycleTests(IPOTestCase):
+    TODAY = date(2025, 3, 10)
+
+    def add(self, name, **dates):
+        return IPO.objects.create(company_name=name, company_id=name, status='upcoming', **dates)
+
+    def status(self, name):
+        return IPO.objects.get(company_name=name).status
+
+    def test_moves_statuses_by_dates_in_set_based_passes(self):
+        self.add('Later', open_date=date(2025, 3, 12), close_date=date(2025, 3, 14))
+        self.add('Opening', open_date=date(2025, 3, 10), close_date=date(2025, 3, 12))
+        self.add('Closed', open_date=date(2025, 3, 3), close_date=date(2025, 3, 5), listing_date=date(2025, 3, 11))
+        self.add('Listed', open_date=date(2025, 3, 1), close_date=date(2025, 3, 3), listing_date=date(2025, 3, 6))
+        self.add('Undated')
+        IPO.objects.create(company_name='Postponed', status='open', open_date=date(2025, 4, 1))
+
+        with self.assertNumQueries(4 + 2):  # one UPDATE per status, inside a transaction
+            passes = advance_statuses(self.TODAY, promote=False)
+        self.assertEqual(
+            {name: self.status(name) for name in ('Later', 'Opening', 'Closed', 'Listed', 'Undated', 'Postponed')},
+            {'Later': 'upcoming', 'Opening': 'open', 'Closed': 'closed', 'Listed': 'listed', 'Undated': 'upcoming', 'Postponed': 'upcoming'},
+        )
+        self.assertEqual({name: result['rows'] for name, result in passes.items()}, {'listed': 1, 'closed': 1, 'open': 1, 'upcoming': 1})
+        self.assertTrue(all(result['rows'] == 0 for result in advance_statuses(self.TODAY, promote=False).values()))
+
+    def test_promotes_listed_ipos_with_prices_once(self):
+        self.add(
+            'Debut', open_date=date(2025, 3, 1), close_date=date(2025, 3, 3), listing_date=date(2025, 3, 6),
+            issue_price=Decimal('200'), listing_price=Decimal('250'), issue_size=Decimal('500'), sector='Finance',
+        )
+        self.add('Unpriced', listing_date=date(2025, 3, 6), issue_price=Decimal('100'), issue_size=Decimal('50'))
+
+        self.assertEqual(advance_statuses(self.TODAY)['promote']['rows'], 1)
+        historical = HistoricalIPO.objects.get()
+        self.assertEqual((historical.company_name, historical.listing_gains_percent), ('Debut', Decimal('25.00')))
+        self.assertTrue(HistoricalIPOStats.objects.filter(year=2025, sector='Finance').exists())
+        self.assertEqual(advance_statuses(self.TODAY)['promote']['rows'], 0)
+
+    def test_command_reports_each_pass(self):
+        out = StringIO()
+        call_command('update_ipo_status', date='2025-03-10', stdout=out)
+        self.assertRegex(out.getvalue(), r'listed 0 \([\d.]+ ms\).*promote 0')
+
+
+class IPOListQueryTests(IPOTestCase):
+    def create_ipos(self, count):
+        start = IPO.objects.count()
+        for i in range(start, start + count):
+            with self.captureOnCommitCallbacks(execute=True):
+                ipo = IPO.objects.create(company_name=f'IPO {i}', open_date=date(2099, 1, 1))
+            SimilarIPO.objects.bulk_create([
+                SimilarIPO(
+                    ipo=ipo, similar_ipo_name=f'Hist {j}', similarity_score=90 - j, similar_qib=1, similar_hni=1,
+                    similar_retail=1, similar_issue_size=1, similar_gmp=0, similar_listing_gains_percentage=5,
+                    similar_sector='Finance',
+                )
+                for j in range(5)
+            ])
+
+    def list_queries(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/ipos/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self.create_ipos(2)
+        small, _ = self.list_queries({'upcoming': 1})
+        self.create_ipos(8)
+        full, body = self.list_queries({'upcoming': 1})
+
+        # COUNT, page, one prefetch for every similar_ipos list
+        self.assertEqual(small, 3)
+        self.assertEqual(full, small)
+        self.assertEqual(len(body['results']), 10)
+        similar = body['results'][0]['similar_ipos']
+        self.assertEqual([s['similar_ipo_name'] for s in similar], ['Hist 0', 'Hist 1', 'Hist 2'])
+
+    def test_sparse_fields_skip_nested_list(self):
+        self.create_ipos(4)
+        count, body = self.list_queries({'fields': 'id,company_name'})
+
+        self.assertEqual(count, 2)
+        self.assertEqual(set(body['results'][0]), {'id', 'company_name'})
+
+
+class UpsertTests(IPOTestCase):
+    def record(self, name, price='100'):
+        return {
+            'company_name': name, 'listing_date': date(2024, 1, 1),
+            'issue_size': Decimal('10'), 'issue_price': Decimal(price), 'listing_price': Decimal('110'),
+            'listing_gains_rs': Decimal('10'), 'listing_gains_percent': Decimal('10'),
+        }
+
+    def test_batches_writes(self):
+        records = [self.record(f'Company {i}') for i in range(200)]
+        with QueryCounter() as queries:
+            result = upsert(HistoricalIPO, records, ['company_name', 'listing_date'], chunk_size=500)
+        self.assertEqual(len(result['created']), 200)
+        # One key lookup plus a handful of multi-row INSERTs (SQLite caps
+        # parameters per statement), instead of two queries per row
+        self.assertLess(queries.count, 10)
+
+    def test_splits_new_changed_and_unchanged(self):
+        upsert(HistoricalIPO, [self.record('A'), self.record('B')], ['company_name', 'listing_date'])
+        result = upsert(
+            HistoricalIPO, [self.record('A'), self.record('B', price='90'), self.record('C')],
+            ['company_name', 'listing_date'],
+        )
+        self.assertEqual(result['created'], [('C', date(2024, 1, 1))])
+        self.assertEqual(result['updated'], [('B', date(2024, 1, 1))])
+        self.assertEqual(result['unchanged'], 1)
+        self.assertEqual(HistoricalIPO.objects.get(company_name='B').issue_price, Decimal('90'))
+
+
+class ResponseCacheTests(IPOTestCase):
+    def get(self, path, **headers):
+        return self.client.get(path, **headers)
+
+    def add_ipo(self, name):
+        # TestCase never commits, so run the on_commit version bump by hand
+        with self.captureOnCommitCallbacks(execute=True):
+            IPO.objects.create(
+                company_name=name, company_id=str(IPO.objects.count() + 1), open_date=date(2099, 1, 1), status='upcoming',
+            )
+
+    def test_serves_cached_response_until_dataset_changes(self):
+        self.add_ipo('First')
+        first = self.get('/api/ipos/')
+        with self.assertNumQueries(0):
+            second = self.get('/api/ipos/')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        self.add_ipo('Second')
+        third = self.get('/api/ipos/')
+        self.assertNotEqual(third['ETag'], first['ETag'])
+        self.assertEqual(third.json()['count'], 2)
+
+    def test_revalidation_returns_304(self):
+        self.add_ipo('First')
+        response = self.get('/ipo/upcomming')
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            revalidated = self.get('/ipo/upcomming', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+
+        self.add_ipo('Second')
+        self.assertEqual(self.get('/ipo/upcomming', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_writes_are_not_cached(self):
+        response = self.client.post('/api/ipos/', {'company_name': 'Posted'})
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('ETag', response)
+
+    def test_private_responses_are_not_shared(self):
+        from django.contrib.auth.models import User
+        self.add_ipo('First')
+        admin = User.objects.create_superuser('reviewer', 'reviewer@example.com', 'pw')
+        self.client.force_login(admin)
+        private = self.get('/api/ipos/', HTTP_ACCEPT='text/html')
+        self.assertContains(private, 'reviewer')
+        self.assertNotIn('ETag', private)
+        self.client.logout()
+
+        anonymous = self.get('/api/ipos/', HTTP_ACCEPT='text/html')
+        self.assertNotContains(anonymous, 'reviewer')
+        self.assertNotIn('ETag', anonymous)  # the browsable API embeds a CSRF token
+        self.assertIn('ETag', self.get('/api/ipos/'))
+
+    def test_fetch_ipo_data_bumps_version(self):
+        version = dataset_version()
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        with StubReportServer() as stub, self.captureOnCommitCallbacks(execute=True):
+            with override_settings(CHITTORGARH_API_BASE=stub.url, IPO_REPORT_CACHE_DIR=cache_dir):
+                call_command('fetch_ipo_data', years='2023', workers=1, stdout=StringIO())
+        self.assertGreater(dataset_version(), version)
+
+
+class RedisResponseCacheTests(ResponseCacheTests):
+    def setUp(self):
+        try:
+            import redis  # noqa: F401
+        except ImportError:
+            self.skipTest('redis package not installed')
+        self.redis = StubRedisServer().__enter__()
+        self.addCleanup(self.redis.__exit__)
+        settings = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': self.redis.url,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        super().setUp()
+
+    def test_responses_are_stored_in_redis(self):
+        self.add_ipo('First')
+        self.get('/api/ipos/')
+        self.assertTrue(any(b'response:' in key for key in self.redis.data))
+        self.assertIn('SET', self.redis.commands)
@@ -0,0 +1,219 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Count, F, FloatField, Max, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .arrays import float_matrix
+from .features import (
+    FEATURE_FIELDS, HISTORICAL_FEATURE_COLUMNS, TARGET_COLUMN, feature_default, feature_spec, feature_spec_hash,
+)
+from .model_registry import file_version
+from .models import HistoricalIPO
+
+try:
+    import joblib
+    import sklearn
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.linear_model import Ridge
+    from sklearn.model_selection import KFold, cross_validate
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+except ImportError:  # scikit-learn is only needed to train, not to serve
+    sklearn = None
+
+MODEL_KINDS = ['gbr', 'forest', 'linear']
+SCORING = {
+    'mae': 'neg_mean_absolute_error',
+    'rmse': 'neg_root_mean_squared_error',
+    'r2': 'r2',
+}
+
+
+def make_estimator(kind, seed=42):
+    if sklearn is None:
+        raise ImportError('Training needs scikit-learn: pip install scikit-learn')
+    if kind == 'gbr':
+        return GradientBoostingRegressor(random_state=seed)
+    if kind == 'forest':
+        return RandomForestRegressor(n_estimators=200, min_samples_leaf=2, random_state=seed)
+    if kind == 'linear':
+        return make_pipeline(StandardScaler(), Ridge(alpha=1.0))
+    raise ValueError(f'Unknown model {kind!r}')
+
+
+def _cast(column):
+    return Cast(column, FloatField())
+
+
+def data_hash(queryset=None):
+    """
+    Fingerprint of the training rows from one aggregate query: row count,
+    highest id, and per column both the plain sum and an id-weighted sum
+    (so values moving between rows change it too), plus the feature spec.
+    """
+    queryset = HistoricalIPO.objects.all() if queryset is None else queryset
+    aggregates = {'rows': Count('id'), 'max_id': Max('id')}
+    for column in HISTORICAL_FEATURE_COLUMNS + [TARGET_COLUMN]:
+        aggregates[f'sum_{column}'] = Sum(_cast(column))
+        aggregates[f'wsum_{column}'] = Sum(_cast(column) * F('id'), output_field=FloatField())
+    summary = queryset.aggregate(**aggregates)
+    payload = json.dumps({'spec': feature_spec_hash(), **summary}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _read_matrix(queryset):
+    values = float_matrix(queryset.order_by('pk'), HISTORICAL_FEATURE_COLUMNS + [TARGET_COLUMN])
+
+    features = np.empty((len(values), len(FEATURE_FIELDS)), dtype=np.float64)
+    for i, name in enumerate(FEATURE_FIELDS):
+        if i < len(HISTORICAL_FEATURE_COLUMNS):
+            features[:, i] = values[:, i]
+        else:
+            features[:, i] = feature_default(name)
+    return features, values[:, -1].copy()
+
+
+def design_matrix(queryset=None, cache_dir=None, use_cache=True):
+    """
+    (X, y, data_hash, cached) for the HistoricalIPO rows in `queryset`.
+    The matrix is read from the database once per distinct dataset and kept
+    as an .npz under IPO_TRAINING_CACHE_DIR keyed by data_hash.
+    """
+    queryset = HistoricalIPO.objects.all() if queryset is None else queryset
+    digest = data_hash(queryset)
+    cache_dir = os.fspath(cache_dir or settings.IPO_TRAINING_CACHE_DIR)
+    path = os.path.join(cache_dir, f'design-{digest}.npz')
+
+    if use_cache and os.path.exists(path):
+        with np.load(path) as data:
+            return data['X'], data['y'], digest, True
+
+    X, y = _read_matrix(queryset)
+    if use_cache:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp, X=X, y=y)
+        os.replace(tmp, path)
+    return X, y, digest, False
+
+
+def cross_validation(estimator, X, y, folds=5, n_jobs=-1, seed=42):
+    """Mean and std of MAE, RMSE and R² over shuffled K folds, fitted in parallel by joblib"""
+    scores = cross_validate(
+        estimator, X, y,
+        cv=KFold(n_splits=folds, shuffle=True, random_state=seed),
+        scoring=SCORING,
+        n_jobs=n_jobs,
+    )
+    metrics = {}
+    for name in SCORING:
+        values = scores[f'test_{name}']
+        if name != 'r2':
+            values = -values  # sklearn reports errors negated
+        metrics[name] = {'mean': round(float(values.mean()), 4), 'std': round(float(values.std()), 4)}
+    return metrics
+
+
+def linear_weights(estimator):
+    """Fold a StandardScaler + Ridge pipeline into the coef+intercept vector LinearArrayModel reads"""
+    scaler, ridge = estimator[0], estimator[-1]
+    coef = ridge.coef_ / scaler.scale_
+    intercept = ridge.intercept_ - float(np.dot(coef, scaler.mean_))
+    return np.append(coef, intercept)
+
+
+def save_model(estimator, path):
+    ext = os.path.splitext(path)[1].lower()
+    tmp = f'{path}.{os.getpid()}.tmp{ext}'
+    if ext == '.npy':
+        if not hasattr(estimator, 'steps') or not hasattr(estimator[-1], 'coef_'):
+            raise ValueError('.npy artifacts hold linear weights; train with --model linear')
+        np.save(tmp, linear_weights(estimator))
+    elif ext == '.joblib':
+        joblib.dump(estimator, tmp)
+    else:
+        with open(tmp, 'wb') as f:
+            pickle.dump(estimator, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)
+
+
+def metadata_path(model_path):
+    return os.path.splitext(os.fspath(model_path))[0] + '.json'
+
+
+def read_metadata(model_path):
+    try:
+        with open(metadata_path(model_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish(artifact, output):
+    """Copy a trained artifact and its metadata over the served model; the registry picks it up by mtime"""
+    for source, target in ((artifact, output), (metadata_path(artifact), metadata_path(output))):
+        tmp = f'{target}.{os.getpid()}.tmp'
+        shutil.copyfile(source, tmp)
+        os.replace(tmp, target)
+
+
+def train(kind='gbr', folds=5, n_jobs=-1, seed=42, output=None, artifact_dir=None, use_cache=True):
+    """
+    Build (or reuse) the design matrix, cross-validate, fit on every row and
+    write a versioned artifact with a JSON metadata sidecar to artifact_dir,
+    then publish it to `output` (IPO_MODEL_PATH by default). The artifact's
+    format follows the output extension: .pkl, .joblib or .npy (linear only).
+    Returns the metadata dict.
+    """
+    output = os.fspath(output or settings.IPO_MODEL_PATH)
+    artifact_dir = os.fspath(artifact_dir or settings.IPO_MODEL_ARTIFACT_DIR)
+    timings = {}
+
+    start = time.perf_counter()
+    X, y, digest, cached = design_matrix(use_cache=use_cache)
+    timings['design_matrix'] = round(time.perf_counter() - start, 4)
+    if len(y) < max(folds, 2) * 2:
+        raise ValueError(f'Need at least {max(folds, 2) * 2} historical IPOs to train with {folds} folds, found {len(y)}')
+
+    estimator = make_estimator(kind, seed)
+    start = time.perf_counter()
+    metrics = cross_validation(estimator, X, y, folds=folds, n_jobs=n_jobs, seed=seed)
+    timings['cross_validation'] = round(time.perf_counter() - start, 4)
+
+    start = time.perf_counter()
+    estimator.fit(X, y)
+    timings['fit'] = round(time.perf_counter() - start, 4)
+
+    trained_at = timezone.now()
+    os.makedirs(artifact_dir, exist_ok=True)
+    ext = os.path.splitext(output)[1] or '.pkl'
+    artifact = os.path.join(artifact_dir, f'ipo_model-{trained_at:%Y%m%d%H%M%S}-{digest[:8]}{ext}')
+    save_model(estimator, artifact)
+
+    metadata = {
+        'model_version': file_version(artifact),
+        'model': kind,
+        'params': estimator.get_params(deep=False) if kind != 'linear' else {'ridge_alpha': estimator[-1].alpha},
+        'artifact': os.path.basename(artifact),
+        'trained_at': trained_at.isoformat(),
+        'rows': int(len(y)),
+        'data_hash': digest,
+        'design_matrix_cached': cached,
+        'feature_spec': feature_spec(),
+        'feature_spec_hash': feature_spec_hash(),
+        'cv': {'folds': folds, 'n_jobs': n_jobs, 'seed': seed, 'metrics': metrics},
+        'training_seconds': timings,
+        'sklearn_version': sklearn.__version__,
+    }
+    with open(metadata_path(artifact), 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, indent=2, sort_keys=True, default=str)
+    publish(artifact, output)
+    return metadata
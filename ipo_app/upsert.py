@@ -0,0 +1,92 @@
+import hashlib
+import json
+
+from django.db import connections, DEFAULT_DB_ALIAS, transaction
+
+
+class QueryCounter:
+    """
+    Count the SQL statements run on a connection inside the block,
+    without turning on DEBUG query logging.
+
+        with QueryCounter() as counter:
+            ...
+        counter.count
+    """
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.connection = connections[using]
+        self.count = 0
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        self._wrapper.__exit__(*exc)
+
+
+def record_hash(record):
+    """Stable hash of an ingest record, used to skip rows that have not changed"""
+    payload = json.dumps(record, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def upsert(model, records, key_fields, chunk_size=500):
+    """
+    Insert or update `records` (dicts of field values) keyed on `key_fields`,
+    which must be covered by a unique constraint on the model.
+
+    Existing keys and their source_hash are loaded in one query; rows whose
+    hash is unchanged are skipped, the rest go through
+    bulk_create(update_conflicts=True) in chunks of `chunk_size`.
+    Returns {'created': [keys], 'updated': [keys], 'unchanged': int}.
+    """
+    result = {'created': [], 'updated': [], 'unchanged': 0}
+
+    # Last occurrence wins if a report lists the same key twice
+    batch = {}
+    for record in records:
+        batch[tuple(record[f] for f in key_fields)] = record
+    if not batch:
+        return result
+
+    lookup = {f'{key_fields[0]}__in': {key[0] for key in batch}}
+    existing = {
+        row[:-1]: row[-1]
+        for row in model.objects.filter(**lookup).values_list(*key_fields, 'source_hash')
+    }
+
+    objs = []
+    update_fields = set()
+    for key, record in batch.items():
+        digest = record_hash(record)
+        if key not in existing:
+            result['created'].append(key)
+        elif existing[key] != digest:
+            result['updated'].append(key)
+        else:
+            result['unchanged'] += 1
+            continue
+        objs.append(model(**record, source_hash=digest))
+        update_fields.update(record)
+
+    if objs:
+        update_fields = (update_fields - set(key_fields)) | {'source_hash'}
+        if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+            update_fields.add('updated_at')
+        with transaction.atomic():
+            model.objects.bulk_create(
+                objs,
+                batch_size=chunk_size,
+                update_conflicts=True,
+                unique_fields=key_fields,
+                update_fields=sorted(update_fields),
+            )
+    return result
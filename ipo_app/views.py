@@ -1,22 +1,49 @@
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
-from rest_framework import viewsets
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import viewsets, status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 import numpy as np
-import pickle
-import os
 from datetime import datetime, timedelta
-from .models import IPO, SimilarIPO, HistoricalIPO
-from .serializers import IPOSerializer, HistoricalIPOSerializer
-from django.db.models.functions import ExtractYear
+from .models import IPO, SimilarIPO, HistoricalIPO, HistoricalIPOStats
+from .serializers import IPOSerializer, HistoricalIPOSerializer, HistoricalIPOStatsSerializer, requested_fields
+from .similarity import DEFAULT_TOP_K
+from django.db.models import F, FloatField, Prefetch, Window
+from django.db.models.functions import Cast, RowNumber
+from .prediction import (
+    IPO_FEATURE_COLUMNS, aloaded_model, build_matrix, cleared_prediction_fields, score_matrix, predict_listing_gain,
+    prediction_fields, scorable,
+)
+from .model_registry import registry
+from .batching import PredictionQueueFull, batcher
+from .prediction_cache import prediction_cache
+from .training import read_metadata
+from .queries import PAST_IPO_COLUMNS, filter_historical, keyset_page, historical_years
+from .sectors import SECTOR_KEYWORDS
+from .dataset_cache import cached_response
+from .export import EXPORT_FORMATS, aiterate, export_stream
+from .pagination import OptionalCursorPagination
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, metrics
+from django.utils.decorators import method_decorator
+
+def top_similar_ipos(k):
+    """SimilarIPO rows ranked within each IPO, keeping the k best scores"""
+    # Ranked by hand rather than with a sliced Prefetch: on SQLite Django wraps a
+    # DecimalField window ORDER BY in CAST(... AS NUMERIC), which is invalid SQL
+    rank = Window(
+        RowNumber(),
+        partition_by=F('ipo_id'),
+        order_by=[Cast('similarity_score', FloatField()).desc(), F('id').asc()],
+    )
+    return SimilarIPO.objects.annotate(rank=rank).filter(rank__lte=k).order_by('-similarity_score', 'id')
 
-MODEL_PATH = os.path.join(os.path.dirname(__file__), 'ipo_model.pkl')
-try:
-    with open(MODEL_PATH, 'rb') as f:
-        ml_model = pickle.load(f)
-except:
-    ml_model = None
 
+@method_decorator(cached_response, name='dispatch')
 class IPOViewSet(viewsets.ModelViewSet):
     queryset = IPO.objects.all()
     serializer_class = IPOSerializer
@@ -26,77 +53,183 @@ class IPOViewSet(viewsets.ModelViewSet):
         upcoming = self.request.query_params.get('upcoming', None)
         if upcoming:
             queryset = queryset.filter(open_date__gte=datetime.now().date())
+
+        fields = requested_fields(self.request)
+        if fields:
+            model_fields = {f.attname for f in IPO._meta.concrete_fields}
+            queryset = queryset.only('id', *(fields & model_fields))
+        if fields is None or 'similar_ipos' in fields:
+            # One extra query for the whole page, limited to the top-k per IPO
+            queryset = queryset.prefetch_related(Prefetch(
+                'similar_ipos',
+                queryset=top_similar_ipos(DEFAULT_TOP_K),
+            ))
         return queryset
 
     def perform_create(self, serializer):
-        ipo = serializer.save()
-        if ipo.qib_subscription:
-            prediction = predict_listing_gain(ipo)
-            ipo.predicted_gain = prediction['predicted_gain']
-            ipo.prediction_confidence = prediction['confidence']
-            ipo.save()
+        serializer.save(**self.prediction_kwargs(serializer.validated_data))
 
+    def perform_update(self, serializer):
+        values = {name: getattr(serializer.instance, name) for name in IPO_FEATURE_COLUMNS}
+        values.update(serializer.validated_data)
+        serializer.save(**self.prediction_kwargs(values))
+
+    def prediction_kwargs(self, values):
+        # Score before saving so the row is written once with its prediction (or without an outdated one)
+        if not scorable(values):
+            return cleared_prediction_fields()
+        prediction = predict_listing_gain(values)
+        return prediction_fields(prediction['predicted_gain'], prediction['confidence'], prediction['model_version'])
+
+@method_decorator(cached_response, name='dispatch')
 class HistoricalIPOViewSet(viewsets.ModelViewSet):
     queryset = HistoricalIPO.objects.all()
     serializer_class = HistoricalIPOSerializer
+    pagination_class = OptionalCursorPagination
 
-@api_view(['POST'])
-def predict_api(request):
-    data = request.data
-    features = np.array([[
-        float(data.get('qib_subscription', 0)),
-        float(data.get('hni_subscription', 0)),
-        float(data.get('retail_subscription', 0)),
-        float(data.get('issue_size', 0)),
-        float(data.get('issue_price', 0)),
-        float(data.get('gmp', 0)),
-        float(data.get('market_sentiment', 19500))
-    ]])
-
-    if ml_model:
-        predicted_gain = ml_model.predict(features)[0]
-        confidence = 70.0
+@require_GET
+def historical_export(request):
+    """
+    Every matching HistoricalIPO streamed as NDJSON (default) or CSV with
+    ?format=csv, filtered like ipo_past (?year=, ?sector=, ?issue_type=,
+    ?min_gain=, ?max_gain=). Rows are read in chunks and written as they
+    come, gzipped when the client accepts it, so memory stays flat under
+    both WSGI and ASGI.
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400)
+    compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+    queryset = filter_historical(HistoricalIPO.objects.all(), request.GET)
+    chunks = export_stream(queryset, fmt, compress)
+    if isinstance(request, ASGIRequest):
+        # Django would otherwise gather a sync body into a list before sending it
+        chunks = aiterate(chunks)
+    response = StreamingHttpResponse(chunks, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="historical_ipos.{fmt}"'
+    response['Vary'] = 'Accept-Encoding'
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    return response
+
+@cached_response
+@api_view(['GET'])
+def historical_stats_api(request):
+    """
+    Precomputed listing-gain stats. Filter with ?year=, ?sector= and
+    ?issue_type=; 'All' selects the rollup across that dimension.
+    """
+    stats = HistoricalIPOStats.objects.all()
+    year = request.query_params.get('year')
+    if year:
+        if not year.isdigit():
+            return Response({'error': 'year must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        stats = stats.filter(year=int(year))
+    for name in ('sector', 'issue_type'):
+        value = request.query_params.get(name)
+        if value:
+            stats = stats.filter(**{name: value})
+    return Response(HistoricalIPOStatsSerializer(stats, many=True).data)
+
+def request_payload(request):
+    """JSON body, or the form fields when the request was not sent as JSON"""
+    if request.content_type == 'application/json':
+        return json.loads(request.body or b'{}')
+    return request.POST.dict()
+
+# Async (plain Django rather than DRF, which has no async views): under ASGI the
+# model runs on the predict executor while the event loop keeps serving, and
+# concurrent calls are scored together in micro-batches
+@csrf_exempt
+@require_POST
+async def predict_api(request):
+    try:
+        features = build_matrix([request_payload(request)])
+    except (TypeError, ValueError, AttributeError) as e:
+        return JsonResponse({'error': f'Invalid payload: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    version = (await aloaded_model()).version
+    cached = await prediction_cache.aget(features[0], version)
+    if cached is not None:
+        gain, confidence = cached
     else:
-        predicted_gain = (features[0][0]*0.3 + features[0][1]*0.2 + features[0][2]*0.1 + features[0][5]*0.4)*2.5
-        confidence = 60.0
+        try:
+            # Only ASGI requests share an event loop; under WSGI no other row could join the batch
+            gain, confidence, version = await batcher.predict(features[0], batch=isinstance(request, ASGIRequest))
+        except PredictionQueueFull:
+            response = JsonResponse({'error': 'Too many predictions queued, retry shortly'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = '1'
+            return response
+        await prediction_cache.aset(features[0], version, (gain, confidence))
 
-    return Response({
-        'predicted_gain': round(predicted_gain, 2),
+    return JsonResponse({
+        'predicted_gain': round(gain, 2),
         'confidence': confidence,
+        'model_version': version,
         'message': 'Prediction successful'
     })
 
-def predict_listing_gain(ipo):
+@api_view(['POST'])
+def predict_batch_api(request):
+    """
+    Score many feature rows with one model call.
+    Accepts {"rows": [{...}, ...]}, a bare list of rows, or a columnar
+    payload {"columns": {"qib_subscription": [...], ...}}.
+    """
+    data = request.data
     try:
-        features = np.array([[
-            float(ipo.qib_subscription),
-            float(ipo.hni_subscription),
-            float(ipo.retail_subscription),
-            float(ipo.issue_size),
-            float(ipo.issue_price),
-            float(ipo.gmp),
-            19500
-        ]])
-        if ml_model:
-            gain = ml_model.predict(features)[0]
-            return {'predicted_gain': gain, 'confidence': 70}
+        if isinstance(data, list):
+            features = build_matrix(data)
+        elif 'columns' in data:
+            features = build_matrix(columns=data['columns'])
         else:
-            gain = (ipo.qib_subscription*0.3 + ipo.hni_subscription*0.2 + ipo.retail_subscription*0.1 + ipo.gmp*0.4)*2.5
-            return {'predicted_gain': round(gain, 2), 'confidence': 60}
-    except:
-        return {'predicted_gain': 0, 'confidence': 0}
+            features = build_matrix(data.get('rows', []))
+    except (TypeError, ValueError, AttributeError) as e:
+        return Response({'error': f'Invalid payload: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    gains, confidence, version = score_matrix(features)
+
+    return Response({
+        'count': len(gains),
+        'model_version': version,
+        'results': [
+            {'predicted_gain': gain, 'confidence': confidence}
+            for gain in np.round(gains, 2).tolist()
+        ],
+        'message': 'Prediction successful'
+    })
 
+@api_view(['GET'])
+def model_info_api(request):
+    loaded = registry.get()
+    info = {
+        'model_version': loaded.version,
+        'path': loaded.path,
+        'loaded_at': loaded.loaded_at,
+    }
+    # train_model writes metrics and the feature spec next to the model it publishes
+    metadata = read_metadata(loaded.path) if loaded.path else None
+    if metadata and metadata.get('model_version') == loaded.version:
+        info['metadata'] = metadata
+    info['prediction_cache'] = prediction_cache.stats()
+    return Response(info)
+
+@require_GET
+def prometheus_metrics(request):
+    """Request latency, SQL, template and prediction timings of this process, in the Prometheus text format"""
+    return HttpResponse(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@cached_response
 def home(request):
     # upcoming_ipos = IPO.objects.filter(status='upcoming')
     return render(request, 'home.html')
 
 from datetime import date   # <--- using 'date', not 'datetime'
 
-def ipo_upcomming(request):
-    upcoming_ipos = IPO.objects.filter(status='upcoming')
+@cached_response
+async def ipo_upcomming(request):
     today = date.today()
     ipo_list = []
-    for ipo in upcoming_ipos:
+    async for ipo in IPO.objects.filter(status='upcoming'):
         if ipo.open_date:
             days_remaining = (ipo.open_date - today).days
         else:
@@ -107,20 +240,36 @@ def ipo_upcomming(request):
         })
     return render(request, 'ipo_upcomming.html', {'upcoming_ipos': ipo_list})
 
+PAST_IPO_PAGE_SIZE = 50
 
+@cached_response
 def ipo_past(request):
-    past_ipos = HistoricalIPO.objects.filter()
-    years = (
-        HistoricalIPO.objects
-        .exclude(listing_date__isnull=True)
-        .annotate(year=ExtractYear('listing_date'))
-        .values_list('year', flat=True)
-        .distinct()
-        .order_by('-year')
-    )
-    return render(request, 'ipo_past.html', {'past_ipos': past_ipos,"years":years})
+    params = request.GET
+    offset = params.get('offset', '')
+    past_ipos = filter_historical(HistoricalIPO.objects.only(*PAST_IPO_COLUMNS), params)
+    rows, next_cursor = keyset_page(past_ipos, params.get('after'), PAST_IPO_PAGE_SIZE)
+    context = {
+        'past_ipos': rows,
+        'next_cursor': next_cursor,
+        'offset': int(offset) if offset.isdigit() else 0,
+    }
+
+    # Infinite scroll asks for the next page of rows only
+    if params.get('partial'):
+        response = render(request, 'partials/ipo_past_rows.html', context)
+        response['X-Next-Cursor'] = next_cursor or ''
+        return response
+
+    context.update({
+        'years': historical_years(),
+        'sectors': list(SECTOR_KEYWORDS) + ['Unknown'],
+        'filters': params,
+    })
+    return render(request, 'ipo_past.html', context)
 
-def ipo_detail(request, company_id):
-    ipo = IPO.objects.get(company_id=company_id)
-    similar_ipos = ipo.similar_ipos.all()
+@cached_response
+async def ipo_detail(request, company_id):
+    ipo = await IPO.objects.aget(company_id=company_id)
+    # Loaded here: the template must not run queries from the event loop
+    similar_ipos = [s async for s in ipo.similar_ipos.order_by('-similarity_score')]
     return render(request, 'ipo_detail.html', {'ipo': ipo, 'similar_ipos': similar_ipos})
@@ -13,6 +13,12 @@ urlpatterns = [
     path('ipo/upcomming', views.ipo_upcomming, name='ipo_upcomming'),
     path('ipo/past', views.ipo_past, name='ipo_past'),
     path('ipo/<int:company_id>/', views.ipo_detail, name='ipo_detail'),
+    # Before the router, which would otherwise read 'stats' as historical IPO ids
+    path('api/historical/stats/', views.historical_stats_api, name='historical_stats_api'),
+    path('api/historical/export/', views.historical_export, name='historical_export'),
     path('api/', include(router.urls)),
     path('api/predict/', views.predict_api, name='predict_api'),
+    path('api/predict/batch/', views.predict_batch_api, name='predict_batch_api'),
+    path('api/predict/model/', views.model_info_api, name='model_info_api'),
+    path('metrics', views.prometheus_metrics, name='metrics'),
 ]
\ No newline at end of file